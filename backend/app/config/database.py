@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -9,6 +10,16 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def utc_now() -> datetime:
+    """Data/hora atual em UTC, com microssegundos.
+
+    Usada como default de ``created_at`` nas tabelas paginadas por essa
+    coluna: o ``CURRENT_TIMESTAMP`` do SQLite grava só segundos, num formato
+    que não se compara com o valor do cursor.
+    """
+    return datetime.now(timezone.utc)
+
+
 def get_db():
     """Dependency to get database session"""
     db = SessionLocal()
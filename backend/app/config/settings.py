@@ -24,6 +24,56 @@ class Settings(BaseSettings):
     # File uploads
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes gravados por vez
+    
+    # Importação de extratos (linhas inseridas por lote)
+    STATEMENT_IMPORT_BATCH_SIZE: int = 1000
+    
+    # Conciliação bancária
+    RECONCILIATION_DATE_TOLERANCE_DAYS: int = 3
+    RECONCILIATION_AMOUNT_TOLERANCE_CENTS: int = 50
+    
+    # Cache de KPIs do dashboard
+    KPI_CACHE_TTL: int = 60  # segundos
+    KPI_CACHE_MAXSIZE: int = 1024  # empresas x meses
+    
+    # Cache da projeção de impostos (invalidado quando receitas são pagas)
+    TAX_PROJECTION_CACHE_TTL: int = 6 * 60 * 60  # segundos
+    TAX_PROJECTION_CACHE_MAXSIZE: int = 1024  # empresas x meses x parâmetros
+    
+    # Cache da DRE por mês fechado (descartado só por lançamentos retroativos no mês)
+    DRE_CACHE_TTL: int = 30 * 24 * 60 * 60  # segundos
+    DRE_CACHE_MAXSIZE: int = 50000  # empresas x meses
+    
+    # Cache de contas, categorias e centros de custo
+    REFERENCE_CACHE_TTL: int = 300  # segundos
+    REFERENCE_CACHE_MAXSIZE: int = 1024  # empresas
+    
+    # Stream SSE do dashboard
+    SSE_KEEPALIVE_SECONDS: int = 15
+    
+    # Criação de transações em lote
+    BULK_MAX_ITEMS: int = 5000
+    
+    # Exportação de transações (linhas lidas por lote do cursor no servidor)
+    EXPORT_BATCH_SIZE: int = 1000
+    
+    # Arquivos contábeis (SPED/DRE) gerados em segundo plano
+    ACCOUNTING_EXPORT_DIR: str = "exports"
+    
+    # Relatórios (DRE, orçado x realizado)
+    REPORT_MAX_MONTHS: int = 36
+    
+    # Histórico de saldos (dias por consulta)
+    BALANCE_HISTORY_MAX_DAYS: int = 731
+    
+    # Jobs em segundo plano
+    SCHEDULER_ENABLED: bool = True
+    OVERDUE_SWEEP_INTERVAL_SECONDS: int = 3600
+    RECURRENCE_INTERVAL_SECONDS: int = 3600
+    RECURRENCE_HORIZON_DAYS: int = 30  # gera ocorrências até hoje + N dias
+    RECURRENCE_BATCH_SIZE: int = 1000
+    BALANCE_SNAPSHOT_INTERVAL_SECONDS: int = 86400  # snapshots do dia anterior (substitui os existentes)
     
     class Config:
         env_file = ".env"
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fingestor.backend.app.config.settings import settings
@@ -6,12 +7,31 @@ from fingestor.backend.app.config.database import engine, Base
 # Importar todos os modelos para que sejam registrados
 from .models import user, company, plan, customer, supplier, financial, invoice, billing, sales, integrations
 
+from .utils.balances import JOB_NAME as BALANCE_SNAPSHOT_JOB, run_balance_snapshots
+from .utils.overdue import JOB_NAME as OVERDUE_JOB, run_overdue_sweep
+from .utils.recurrences import JOB_NAME as RECURRENCE_JOB, run_materialize_recurrences
+from .utils.scheduler import scheduler
+
 # Criar as tabelas no banco de dados
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Jobs periódicos rodam no próprio processo da API
+    if settings.SCHEDULER_ENABLED:
+        scheduler.add_job(RECURRENCE_JOB, settings.RECURRENCE_INTERVAL_SECONDS, run_materialize_recurrences)
+        scheduler.add_job(OVERDUE_JOB, settings.OVERDUE_SWEEP_INTERVAL_SECONDS, run_overdue_sweep)
+        scheduler.add_job(BALANCE_SNAPSHOT_JOB, settings.BALANCE_SNAPSHOT_INTERVAL_SECONDS, run_balance_snapshots)
+        scheduler.start()
+    yield
+    await scheduler.stop()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -21,6 +41,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor"],
 )
 
 @app.get("/")
@@ -31,6 +52,10 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/jobs")
+async def jobs_health():
+    return scheduler.metrics()
+
 # Incluir routers
 from .routers import auth, customers, dashboard, suppliers, financial
 
@@ -1,10 +1,10 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Enum, ForeignKey, Numeric, Date
+from sqlalchemy import Column, String, Boolean, DateTime, Enum, ForeignKey, Numeric, Date, Integer, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
 import enum
-from ..config.database import Base
+from ..config.database import Base, utc_now
 
 
 class AccountType(str, enum.Enum):
@@ -23,6 +23,10 @@ class TransactionStatus(str, enum.Enum):
     OVERDUE = "overdue"
 
 
+# Status de transações ainda em aberto (a receber / a pagar)
+OPEN_STATUSES = (TransactionStatus.PENDING, TransactionStatus.OVERDUE)
+
+
 class CategoryType(str, enum.Enum):
     INCOME = "income"
     EXPENSE = "expense"
@@ -75,6 +79,25 @@ class CostCenter(Base):
 
 class FinancialTransaction(Base):
     __tablename__ = "financial_transactions"
+    __table_args__ = (
+        # Toda consulta é filtrada por empresa; a segunda coluna atende aos
+        # filtros e ordenações da listagem, dashboard e relatórios
+        Index("ix_financial_transactions_company_due_date", "company_id", "due_date", "id"),
+        Index("ix_financial_transactions_company_status_due_date", "company_id", "status", "due_date"),
+        Index("ix_financial_transactions_company_type_due_date", "company_id", "type", "due_date"),
+        Index("ix_financial_transactions_company_status_payment_date", "company_id", "status", "payment_date"),
+        Index("ix_financial_transactions_company_account", "company_id", "account_id", "due_date"),
+        Index("ix_financial_transactions_company_category", "company_id", "category_id"),
+        Index("ix_financial_transactions_company_cost_center", "company_id", "cost_center_id"),
+        Index("ix_financial_transactions_company_amount", "company_id", "amount"),
+        Index("ix_financial_transactions_company_created_at", "company_id", "created_at"),
+        # Uma transação por ocorrência de recorrência (torna a geração idempotente)
+        Index("ux_financial_transactions_recurrence_due_date", "recurrence_id", "due_date", unique=True),
+        # Varredura de vencidas (sem empresa) feita pelo job de atraso
+        Index("ix_financial_transactions_status_due_date", "status", "due_date"),
+        # Varredura curta de pagamentos de uma conta a partir de um snapshot de saldo
+        Index("ix_financial_transactions_account_status_payment_date", "account_id", "status", "payment_date"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
@@ -89,7 +112,7 @@ class FinancialTransaction(Base):
     cost_center_id = Column(UUID(as_uuid=True), ForeignKey("cost_centers.id"), nullable=True)
     is_recurring = Column(Boolean, default=False)
     recurrence_id = Column(UUID(as_uuid=True), ForeignKey("recurrences.id"), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utc_now, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
@@ -99,3 +122,73 @@ class FinancialTransaction(Base):
     cost_center = relationship("CostCenter", back_populates="transactions")
     recurrence = relationship("Recurrence", back_populates="transactions")
 
+
+
+class FinancialMonthlyRollup(Base):
+    """Totais mensais de transações por empresa, tipo e status.
+
+    Mantido incrementalmente pelas rotas de transações (ver ``utils.ledger``).
+    O mês de referência é o da data de pagamento para transações pagas e o do
+    vencimento para as demais.
+    """
+    __tablename__ = "financial_monthly_rollups"
+
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), primary_key=True)
+    period = Column(String(7), primary_key=True)  # YYYY-MM
+    type = Column(Enum(TransactionType), primary_key=True)
+    status = Column(Enum(TransactionStatus), primary_key=True)
+    total_amount = Column(Numeric(15, 2), nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class CostCenterMonthlyRollup(Base):
+    """Totais mensais pagos por centro de custo, categoria e tipo (realizado do orçamento).
+
+    Mantido incrementalmente pelo ledger junto com ``FinancialMonthlyRollup``;
+    só entram transações pagas com centro de custo e categoria, no mês da data
+    de pagamento.
+    """
+    __tablename__ = "cost_center_monthly_rollups"
+
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), primary_key=True)
+    period = Column(String(7), primary_key=True)  # YYYY-MM
+    cost_center_id = Column(UUID(as_uuid=True), ForeignKey("cost_centers.id", ondelete="CASCADE"), primary_key=True)
+    category_id = Column(UUID(as_uuid=True), ForeignKey("financial_categories.id", ondelete="CASCADE"), primary_key=True)
+    type = Column(Enum(TransactionType), primary_key=True)
+    total_amount = Column(Numeric(15, 2), nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class Budget(Base):
+    """Valor orçado para um centro de custo e categoria em um mês"""
+    __tablename__ = "budgets"
+    __table_args__ = (
+        Index("ux_budgets_company_cell", "company_id", "cost_center_id", "category_id", "month", unique=True),
+        Index("ix_budgets_company_month", "company_id", "month"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
+    cost_center_id = Column(UUID(as_uuid=True), ForeignKey("cost_centers.id", ondelete="CASCADE"), nullable=False)
+    category_id = Column(UUID(as_uuid=True), ForeignKey("financial_categories.id", ondelete="CASCADE"), nullable=False)
+    month = Column(String(7), nullable=False)  # YYYY-MM
+    amount = Column(Numeric(15, 2), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class AccountBalanceSnapshot(Base):
+    """Saldo de uma conta ao final de um dia.
+
+    Ponto de partida das consultas de saldo em uma data (ver ``utils.balances``);
+    pagamentos retroativos e ajustes manuais deslocam os snapshots posteriores.
+    """
+    __tablename__ = "account_balance_snapshots"
+
+    account_id = Column(UUID(as_uuid=True), ForeignKey("financial_accounts.id", ondelete="CASCADE"), primary_key=True)
+    snapshot_date = Column(Date, primary_key=True)
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
+    balance = Column(Numeric(15, 2), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
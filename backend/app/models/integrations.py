@@ -1,17 +1,25 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Numeric, Enum, Date, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Numeric, Enum, Date, JSON, Index
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
 import enum
-from ..config.database import Base
+from ..config.database import Base, utc_now
 
 
 class ReconciliationStatus(str, enum.Enum):
     PENDING = "pending"
+    PROCESSING = "processing"
+    IMPORTED = "imported"  # Extrato lido, aguardando conciliação
     COMPLETED = "completed"
     FAILED = "failed"
 
 
+class MatchStatus(str, enum.Enum):
+    MATCHED = "matched"
+    UNMATCHED = "unmatched"
+
+
 class FileType(str, enum.Enum):
     OFX = "ofx"
     XLSX = "xlsx"
@@ -22,6 +30,13 @@ class ExportType(str, enum.Enum):
     DRE = "dre"
 
 
+class ExportStatus(str, enum.Enum):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
 class TaxRegime(str, enum.Enum):
     SIMPLES_NACIONAL = "simples_nacional"
     LUCRO_PRESUMIDO = "lucro_presumido"
@@ -38,6 +53,8 @@ class BankReconciliation(Base):
     status = Column(Enum(ReconciliationStatus), default=ReconciliationStatus.PENDING)
     reconciled_transactions = Column(JSON, nullable=True)
     unreconciled_transactions = Column(JSON, nullable=True)
+    line_count = Column(Integer, nullable=False, default=0)
+    error_message = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -46,6 +63,46 @@ class BankReconciliation(Base):
     account = relationship("FinancialAccount")
 
 
+class BankStatementLine(Base):
+    """Linha normalizada de um extrato importado (área de preparo da conciliação)"""
+    __tablename__ = "bank_statement_lines"
+    __table_args__ = (
+        Index("ix_bank_statement_lines_reconciliation_line", "reconciliation_id", "line_number", unique=True),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    reconciliation_id = Column(String(36), ForeignKey("bank_reconciliations.id", ondelete="CASCADE"), nullable=False)
+    company_id = Column(String(36), ForeignKey("companies.id"), nullable=False)
+    account_id = Column(String(36), ForeignKey("financial_accounts.id"), nullable=False)
+    line_number = Column(Integer, nullable=False)
+    posted_date = Column(Date, nullable=False)
+    amount = Column(Numeric(15, 2), nullable=False)  # Positivo: crédito; negativo: débito
+    description = Column(String, nullable=True)
+    fit_id = Column(String, nullable=True)  # Identificador da transação no banco (OFX FITID)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ReconciliationMatch(Base):
+    """Resultado da conciliação de uma linha do extrato (uma linha por linha do extrato)"""
+    __tablename__ = "reconciliation_matches"
+    __table_args__ = (
+        Index("ix_reconciliation_matches_reconciliation", "reconciliation_id", "status", "line_number"),
+        Index("ix_reconciliation_matches_transaction", "transaction_id"),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    reconciliation_id = Column(String(36), ForeignKey("bank_reconciliations.id", ondelete="CASCADE"), nullable=False)
+    company_id = Column(String(36), ForeignKey("companies.id"), nullable=False)
+    line_id = Column(String(36), ForeignKey("bank_statement_lines.id", ondelete="CASCADE"), nullable=False)
+    line_number = Column(Integer, nullable=False)
+    transaction_id = Column(UUID(as_uuid=True), ForeignKey("financial_transactions.id", ondelete="SET NULL"), nullable=True)
+    status = Column(Enum(MatchStatus), nullable=False)
+    score = Column(Float, nullable=True)
+    exact = Column(Boolean, nullable=False, default=False)
+    candidates = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class AccountingIntegration(Base):
     __tablename__ = "accounting_integrations"
 
@@ -56,6 +113,9 @@ class AccountingIntegration(Base):
     start_date = Column(Date, nullable=False)
     end_date = Column(Date, nullable=False)
     file_url = Column(String, nullable=False)
+    status = Column(Enum(ExportStatus), nullable=False, default=ExportStatus.PENDING)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    error_message = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -66,13 +126,17 @@ class AccountingIntegration(Base):
 
 class TaxSimulation(Base):
     __tablename__ = "tax_simulations"
+    __table_args__ = (
+        # Listagem paginada por cursor, mais recentes primeiro: (created_at, id) DESC
+        Index("ix_tax_simulations_company_created_at", "company_id", "created_at", "id"),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     company_id = Column(String(36), ForeignKey("companies.id"), nullable=False)
     revenue = Column(Numeric(15, 2), nullable=False)
     tax_regime = Column(Enum(TaxRegime), nullable=False)
     simulated_taxes = Column(JSON, nullable=False)  # Detalhes dos impostos simulados
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utc_now, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
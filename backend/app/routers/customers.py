@@ -1,5 +1,5 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from ..routers.auth import get_current_user_dev_bypass
 from sqlalchemy.orm import Session
 from uuid import UUID
@@ -7,6 +7,7 @@ from ..config.database import get_db
 from ..models.user import User
 from ..models.customer import Customer
 from ..schemas.customer import CustomerCreate, CustomerUpdate, Customer as CustomerSchema
+from ..utils.pagination import keyset_paginate, set_page_headers
 from ..utils.security import get_current_active_user
 
 router = APIRouter()
@@ -14,17 +15,20 @@ router = APIRouter()
 
 @router.get("/", response_model=List[CustomerSchema])
 async def list_customers(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Lista clientes da empresa do usuário logado"""
-    customers = db.query(Customer).filter(
+    """Lista clientes da empresa do usuário logado, ordenados por nome (paginação por cursor)"""
+    query = db.query(Customer).filter(
         Customer.company_id == current_user.company_id
-    ).offset(skip).limit(limit).all()
+    )
+    page = keyset_paginate(query, [Customer.name, Customer.id], cursor, limit)
+    set_page_headers(response, page)
     
-    return customers
+    return page.items
 
 
 @router.get("/{customer_id}", response_model=CustomerSchema)
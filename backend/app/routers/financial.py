@@ -1,38 +1,93 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from uuid import UUID
+import os
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from sqlalchemy import case, func, insert
+from sqlalchemy.orm import Session, sessionmaker
+from uuid import UUID, uuid4
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime
 from ..config.database import get_db
+from ..config.settings import settings
 from ..models.user import User
 from ..models.financial import (
     FinancialAccount, FinancialTransaction, FinancialCategory, 
-    CostCenter, TransactionStatus
+    CostCenter, TransactionStatus, AccountBalanceSnapshot, Budget
+)
+from ..models.integrations import (
+    TaxSimulation, TaxRegime, BankReconciliation, BankStatementLine, ReconciliationStatus,
+    ReconciliationMatch, MatchStatus, AccountingIntegration, ExportStatus
 )
-from ..models.integrations import TaxSimulation, TaxRegime
 from ..schemas.financial import (
     FinancialAccountCreate, FinancialAccountUpdate, FinancialAccount as FinancialAccountSchema,
+    AccountBalance,
     FinancialTransactionCreate, FinancialTransactionUpdate, FinancialTransaction as FinancialTransactionSchema,
+    FinancialTransactionFilters, ExportFormat, FinancialTransactionBulkCreate, FinancialTransactionBulkResult,
+    FinancialTransactionBulkPay, FinancialTransactionBulkStatus, BulkUpdateResult,
     FinancialCategoryCreate, FinancialCategoryUpdate, FinancialCategory as FinancialCategorySchema,
     CostCenterCreate, CostCenterUpdate, CostCenter as CostCenterSchema,
-    TaxSimulationCreate, TaxSimulation as TaxSimulationSchema
+    TaxSimulationCreate, TaxSimulation as TaxSimulationSchema,
+    TaxSimulationBatchCreate, TaxSimulationBatch,
+    BankStatementImport, BankStatementLine as BankStatementLineSchema,
+    ReconciliationMatch as ReconciliationMatchSchema, ReconciliationSummary, TransactionReconciliation,
+    AccountingExportCreate, AccountingExport, DreCompare,
+    BudgetBulkUpsert, Budget as BudgetSchema
 )
+from ..utils.accounting import EXPORT_EXTENSIONS, export_path, run_accounting_export
+from ..utils.balances import account_balance_as_of, balance_history, shift_balance_snapshots
+from ..utils.broadcast import kpi_broadcaster
+from ..utils.export import EXPORT_COLUMNS, EXPORT_MEDIA_TYPES, stream_export
+from ..utils.ledger import transaction_state, record_transaction_changes
+from ..utils.pagination import keyset_paginate, set_page_headers
+from ..utils.reconciliation import run_reconciliation
+from ..utils.reference import accounts_cache, categories_cache, cost_centers_cache, reference_response
+from ..utils.reports import budget_vs_actual, dre_report, month_range
 from ..utils.security import get_current_active_user
+from ..utils.statements import STATEMENTS_SUBDIR, statement_file_type, save_upload, run_statement_import
+from ..utils.taxes import (
+    calculate_simples_nacional, calculate_lucro_presumido, simulate_tax_grid, grid_simulation_records,
+    cached_tax_projection
+)
+from ..utils.transactions import (
+    filter_transactions, transaction_sort_key, parse_expand, transaction_load_options,
+    validate_transaction_batch, insert_transactions, bulk_update_transactions, check_transaction_references
+)
 
 router = APIRouter()
 
 # Rotas para Contas Financeiras
 @router.get("/accounts/", response_model=List[FinancialAccountSchema])
 async def list_accounts(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Lista contas financeiras da empresa"""
-    accounts = db.query(FinancialAccount).filter(
-        FinancialAccount.company_id == current_user.company_id
-    ).all()
-    return accounts
+    """Lista contas financeiras da empresa (em cache, com ETag)"""
+    def load():
+        return db.query(FinancialAccount).filter(
+            FinancialAccount.company_id == current_user.company_id
+        ).order_by(FinancialAccount.name, FinancialAccount.id).all()
+    
+    return reference_response(request, accounts_cache, current_user.company_id, load, FinancialAccountSchema)
+
+
+@router.get("/accounts/balance-history")
+async def get_balance_history(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Retorna o saldo diário de todas as contas no intervalo, em formato colunar"""
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (to_date - from_date).days + 1 > settings.BALANCE_HISTORY_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range exceeds {settings.BALANCE_HISTORY_MAX_DAYS} days"
+        )
+    
+    return balance_history(db, current_user.company_id, from_date, to_date)
 
 
 @router.post("/accounts/", response_model=FinancialAccountSchema)
@@ -43,7 +98,7 @@ async def create_account(
 ):
     """Cria nova conta financeira"""
     db_account = FinancialAccount(
-        **account_data.dict(),
+        **account_data.dict(exclude={"company_id"}),
         company_id=current_user.company_id
     )
     
@@ -70,16 +125,45 @@ async def update_account(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
+    previous_balance = Decimal(str(account.balance or 0))
     update_data = account_data.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(account, field, value)
     
+    # Ajuste manual de saldo vale para todo o histórico de snapshots
+    if update_data.get("balance") is not None:
+        shift_balance_snapshots(db, account.company_id, account.id, None, Decimal(update_data["balance"]) - previous_balance)
+    
     db.commit()
     db.refresh(account)
     
     return account
 
 
+@router.get("/accounts/{account_id}/balance", response_model=AccountBalance)
+async def get_account_balance(
+    account_id: UUID,
+    as_of: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Retorna o saldo da conta, atual ou ao final da data ``as_of``"""
+    account = db.query(FinancialAccount).filter(
+        FinancialAccount.id == account_id,
+        FinancialAccount.company_id == current_user.company_id
+    ).first()
+    
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    if as_of is None:
+        balance = Decimal(str(account.balance or 0))
+    else:
+        balance = account_balance_as_of(db, account, as_of)
+    
+    return AccountBalance(account_id=account.id, as_of=as_of, balance=balance)
+
+
 @router.delete("/accounts/{account_id}")
 async def delete_account(
     account_id: UUID,
@@ -95,6 +179,9 @@ async def delete_account(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
+    db.query(AccountBalanceSnapshot).filter(
+        AccountBalanceSnapshot.account_id == account.id
+    ).delete(synchronize_session=False)
     db.delete(account)
     db.commit()
     
@@ -104,17 +191,70 @@ async def delete_account(
 # Rotas para Transações Financeiras
 @router.get("/transactions/", response_model=List[FinancialTransactionSchema])
 async def list_transactions(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    filters: FinancialTransactionFilters = Depends(),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    expand: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Lista transações financeiras da empresa"""
-    transactions = db.query(FinancialTransaction).filter(
+    """Lista transações financeiras da empresa com filtros e paginação por cursor"""
+    query = db.query(FinancialTransaction).options(
+        *transaction_load_options(parse_expand(expand))
+    ).filter(
         FinancialTransaction.company_id == current_user.company_id
-    ).offset(skip).limit(limit).all()
+    )
+    query = filter_transactions(query, filters)
+    columns, descending = transaction_sort_key(filters.sort)
+    page = keyset_paginate(query, columns, cursor, limit, descending=descending)
+    set_page_headers(response, page)
     
-    return transactions
+    return page.items
+
+
+@router.get("/transactions/export")
+async def export_transactions(
+    format: ExportFormat = ExportFormat.CSV,
+    filters: FinancialTransactionFilters = Depends(),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Exporta as transações filtradas em CSV ou NDJSON, via streaming"""
+    query = db.query(*EXPORT_COLUMNS).filter(
+        FinancialTransaction.company_id == current_user.company_id
+    )
+    query = filter_transactions(query, filters)
+    columns, descending = transaction_sort_key(filters.sort)
+    query = query.order_by(*[c.desc() if descending else c.asc() for c in columns])
+    
+    filename = f"transacoes-{datetime.now():%Y%m%d}.{format.value}"
+    return StreamingResponse(
+        stream_export(db.get_bind(), query.statement, format, settings.EXPORT_BATCH_SIZE),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/transactions/{transaction_id}", response_model=FinancialTransactionSchema)
+async def get_transaction(
+    transaction_id: UUID,
+    expand: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Retorna uma transação financeira específica"""
+    transaction = db.query(FinancialTransaction).options(
+        *transaction_load_options(parse_expand(expand))
+    ).filter(
+        FinancialTransaction.id == transaction_id,
+        FinancialTransaction.company_id == current_user.company_id
+    ).first()
+    
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    
+    return transaction
 
 
 @router.post("/transactions/", response_model=FinancialTransactionSchema)
@@ -124,18 +264,108 @@ async def create_transaction(
     current_user: User = Depends(get_current_active_user)
 ):
     """Cria nova transação financeira"""
+    check_transaction_references(db, current_user.company_id, transaction_data.dict())
     db_transaction = FinancialTransaction(
-        **transaction_data.dict(),
+        **transaction_data.dict(exclude={"company_id"}),
         company_id=current_user.company_id
     )
     
     db.add(db_transaction)
+    db.flush()
+    record_transaction_changes(db, [(None, transaction_state(db_transaction))])
     db.commit()
     db.refresh(db_transaction)
+    kpi_broadcaster.publish(current_user.company_id)
     
     return db_transaction
 
 
+def _check_bulk_size(items: list) -> None:
+    if len(items) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.BULK_MAX_ITEMS} items"
+        )
+
+
+@router.post("/transactions/bulk", response_model=FinancialTransactionBulkResult)
+async def bulk_create_transactions(
+    bulk_data: FinancialTransactionBulkCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Cria transações financeiras em lote, em uma única transação de banco"""
+    _check_bulk_size(bulk_data.items)
+    
+    rows, errors = validate_transaction_batch(db, current_user.company_id, bulk_data.items)
+    
+    if errors and not bulk_data.partial:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=[error.dict() for error in errors]
+        )
+    
+    insert_transactions(db, rows)
+    db.commit()
+    if rows:
+        kpi_broadcaster.publish(current_user.company_id)
+    
+    return FinancialTransactionBulkResult(
+        created_ids=[row["id"] for row in rows],
+        errors=errors
+    )
+
+
+@router.post("/transactions/bulk-pay", response_model=BulkUpdateResult)
+async def bulk_pay_transactions(
+    pay_data: FinancialTransactionBulkPay,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Marca várias transações como pagas em uma única atualização (as já pagas são mantidas)"""
+    _check_bulk_size(pay_data.ids)
+    
+    values = {
+        "status": TransactionStatus.PAID,
+        "payment_date": pay_data.payment_date or datetime.now().date()
+    }
+    matched, affected = bulk_update_transactions(
+        db, current_user.company_id, pay_data.ids, values, skip_status=TransactionStatus.PAID
+    )
+    db.commit()
+    if affected:
+        kpi_broadcaster.publish(current_user.company_id)
+    
+    return BulkUpdateResult(requested=len(set(pay_data.ids)), matched=matched, affected=affected)
+
+
+@router.post("/transactions/bulk-status", response_model=BulkUpdateResult)
+async def bulk_update_transaction_status(
+    status_data: FinancialTransactionBulkStatus,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Altera o status de várias transações em uma única atualização (as já pagas mantêm a data de pagamento)"""
+    _check_bulk_size(status_data.ids)
+    
+    # Transações pagas aqui recebem a data de hoje (as já pagas mantêm a sua);
+    # as demais perdem a data de pagamento
+    paying = status_data.status == TransactionStatus.PAID
+    values = {
+        "status": status_data.status,
+        "payment_date": datetime.now().date() if paying else None
+    }
+    matched, affected = bulk_update_transactions(
+        db, current_user.company_id, status_data.ids, values,
+        skip_status=TransactionStatus.PAID if paying else None
+    )
+    db.commit()
+    if affected:
+        kpi_broadcaster.publish(current_user.company_id)
+    
+    return BulkUpdateResult(requested=len(set(status_data.ids)), matched=matched, affected=affected)
+
+
 @router.put("/transactions/{transaction_id}", response_model=FinancialTransactionSchema)
 async def update_transaction(
     transaction_id: UUID,
@@ -152,12 +382,16 @@ async def update_transaction(
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    before = transaction_state(transaction)
     update_data = transaction_data.dict(exclude_unset=True)
+    check_transaction_references(db, current_user.company_id, update_data)
     for field, value in update_data.items():
         setattr(transaction, field, value)
     
+    record_transaction_changes(db, [(before, transaction_state(transaction))])
     db.commit()
     db.refresh(transaction)
+    kpi_broadcaster.publish(current_user.company_id)
     
     return transaction
 
@@ -177,8 +411,10 @@ async def delete_transaction(
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    record_transaction_changes(db, [(transaction_state(transaction), None)])
     db.delete(transaction)
     db.commit()
+    kpi_broadcaster.publish(current_user.company_id)
     
     return {"message": "Transaction deleted successfully"}
 
@@ -198,11 +434,14 @@ async def pay_transaction(
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    before = transaction_state(transaction)
     transaction.status = TransactionStatus.PAID
     transaction.payment_date = datetime.now().date()
     
+    record_transaction_changes(db, [(before, transaction_state(transaction))])
     db.commit()
     db.refresh(transaction)
+    kpi_broadcaster.publish(current_user.company_id)
     
     return transaction
 
@@ -210,14 +449,17 @@ async def pay_transaction(
 # Rotas para Categorias
 @router.get("/categories/", response_model=List[FinancialCategorySchema])
 async def list_categories(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Lista categorias financeiras da empresa"""
-    categories = db.query(FinancialCategory).filter(
-        FinancialCategory.company_id == current_user.company_id
-    ).all()
-    return categories
+    """Lista categorias financeiras da empresa (em cache, com ETag)"""
+    def load():
+        return db.query(FinancialCategory).filter(
+            FinancialCategory.company_id == current_user.company_id
+        ).order_by(FinancialCategory.name, FinancialCategory.id).all()
+    
+    return reference_response(request, categories_cache, current_user.company_id, load, FinancialCategorySchema)
 
 
 @router.post("/categories/", response_model=FinancialCategorySchema)
@@ -228,7 +470,7 @@ async def create_category(
 ):
     """Cria nova categoria financeira"""
     db_category = FinancialCategory(
-        **category_data.dict(),
+        **category_data.dict(exclude={"company_id"}),
         company_id=current_user.company_id
     )
     
@@ -239,17 +481,73 @@ async def create_category(
     return db_category
 
 
+@router.put("/categories/{category_id}", response_model=FinancialCategorySchema)
+async def update_category(
+    category_id: UUID,
+    category_data: FinancialCategoryUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Atualiza categoria financeira"""
+    category = db.query(FinancialCategory).filter(
+        FinancialCategory.id == category_id,
+        FinancialCategory.company_id == current_user.company_id
+    ).first()
+    
+    if not category:
+        raise HTTPException(status_code=404, detail="Category not found")
+    
+    update_data = category_data.dict(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(category, field, value)
+    
+    db.commit()
+    db.refresh(category)
+    
+    return category
+
+
+@router.delete("/categories/{category_id}")
+async def delete_category(
+    category_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Deleta categoria financeira"""
+    category = db.query(FinancialCategory).filter(
+        FinancialCategory.id == category_id,
+        FinancialCategory.company_id == current_user.company_id
+    ).first()
+    
+    if not category:
+        raise HTTPException(status_code=404, detail="Category not found")
+    
+    in_use = db.query(FinancialTransaction.id).filter(
+        FinancialTransaction.category_id == category.id
+    ).first()
+    if in_use:
+        raise HTTPException(status_code=400, detail="Category is used by transactions")
+    
+    db.delete(category)
+    db.commit()
+    
+    return {"message": "Category deleted successfully"}
+
+
 # Rotas para Centros de Custo
 @router.get("/cost_centers/", response_model=List[CostCenterSchema])
 async def list_cost_centers(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Lista centros de custo da empresa"""
-    cost_centers = db.query(CostCenter).filter(
-        CostCenter.company_id == current_user.company_id
-    ).all()
-    return cost_centers
+    """Lista centros de custo da empresa (em cache, com ETag)"""
+    def load():
+        return db.query(CostCenter).filter(
+            CostCenter.company_id == current_user.company_id
+        ).order_by(CostCenter.name, CostCenter.id).all()
+    
+    return reference_response(request, cost_centers_cache, current_user.company_id, load, CostCenterSchema)
 
 
 @router.post("/cost_centers/", response_model=CostCenterSchema)
@@ -260,7 +558,7 @@ async def create_cost_center(
 ):
     """Cria novo centro de custo"""
     db_cost_center = CostCenter(
-        **cost_center_data.dict(),
+        **cost_center_data.dict(exclude={"company_id"}),
         company_id=current_user.company_id
     )
     
@@ -271,6 +569,59 @@ async def create_cost_center(
     return db_cost_center
 
 
+@router.put("/cost_centers/{cost_center_id}", response_model=CostCenterSchema)
+async def update_cost_center(
+    cost_center_id: UUID,
+    cost_center_data: CostCenterUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Atualiza centro de custo"""
+    cost_center = db.query(CostCenter).filter(
+        CostCenter.id == cost_center_id,
+        CostCenter.company_id == current_user.company_id
+    ).first()
+    
+    if not cost_center:
+        raise HTTPException(status_code=404, detail="Cost center not found")
+    
+    update_data = cost_center_data.dict(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(cost_center, field, value)
+    
+    db.commit()
+    db.refresh(cost_center)
+    
+    return cost_center
+
+
+@router.delete("/cost_centers/{cost_center_id}")
+async def delete_cost_center(
+    cost_center_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Deleta centro de custo"""
+    cost_center = db.query(CostCenter).filter(
+        CostCenter.id == cost_center_id,
+        CostCenter.company_id == current_user.company_id
+    ).first()
+    
+    if not cost_center:
+        raise HTTPException(status_code=404, detail="Cost center not found")
+    
+    in_use = db.query(FinancialTransaction.id).filter(
+        FinancialTransaction.cost_center_id == cost_center.id
+    ).first()
+    if in_use:
+        raise HTTPException(status_code=400, detail="Cost center is used by transactions")
+    
+    db.delete(cost_center)
+    db.commit()
+    
+    return {"message": "Cost center deleted successfully"}
+
+
 # Simulação de Impostos
 @router.post("/taxes/simulate", response_model=TaxSimulationSchema)
 async def simulate_taxes(
@@ -279,85 +630,21 @@ async def simulate_taxes(
     current_user: User = Depends(get_current_active_user)
 ):
     """Simula impostos para regime tributário"""
-    
-    def calculate_simples_nacional(revenue: Decimal) -> dict:
-        """Calcula impostos do Simples Nacional"""
-        # Tabela simplificada do Simples Nacional 2024
-        if revenue <= 180000:
-            rate = Decimal('0.06')  # 6%
-        elif revenue <= 360000:
-            rate = Decimal('0.112')  # 11.2%
-        elif revenue <= 720000:
-            rate = Decimal('0.135')  # 13.5%
-        elif revenue <= 1800000:
-            rate = Decimal('0.16')  # 16%
-        elif revenue <= 3600000:
-            rate = Decimal('0.21')  # 21%
+    try:
+        if simulation_data.tax_regime == "simples_nacional":
+            simulated_taxes = calculate_simples_nacional(
+                simulation_data.revenue, simulation_data.annex, simulation_data.year
+            )
         else:
-            rate = Decimal('0.33')  # 33%
-        
-        total_tax = revenue * rate
-        
-        return {
-            "regime": "Simples Nacional",
-            "annual_revenue": float(revenue),
-            "tax_rate": float(rate * 100),
-            "total_tax": float(total_tax),
-            "net_income": float(revenue - total_tax),
-            "monthly_tax": float(total_tax / 12),
-            "breakdown": {
-                "simples_nacional": float(total_tax)
-            }
-        }
-    
-    def calculate_lucro_presumido(revenue: Decimal) -> dict:
-        """Calcula impostos do Lucro Presumido"""
-        # Presunção de lucro de 8% para comércio e 32% para serviços
-        presumed_profit_rate = Decimal('0.32')  # Assumindo serviços
-        presumed_profit = revenue * presumed_profit_rate
-        
-        # IRPJ: 15% sobre o lucro presumido + 10% sobre o que exceder R$ 240.000
-        irpj_base = min(presumed_profit, Decimal('240000'))
-        irpj = irpj_base * Decimal('0.15')
-        
-        if presumed_profit > 240000:
-            irpj += (presumed_profit - Decimal('240000')) * Decimal('0.10')
-        
-        # CSLL: 9% sobre o lucro presumido
-        csll = presumed_profit * Decimal('0.09')
-        
-        # PIS: 0.65% sobre o faturamento
-        pis = revenue * Decimal('0.0065')
-        
-        # COFINS: 3% sobre o faturamento
-        cofins = revenue * Decimal('0.03')
-        
-        total_tax = irpj + csll + pis + cofins
-        
-        return {
-            "regime": "Lucro Presumido",
-            "annual_revenue": float(revenue),
-            "presumed_profit": float(presumed_profit),
-            "total_tax": float(total_tax),
-            "net_income": float(revenue - total_tax),
-            "monthly_tax": float(total_tax / 12),
-            "breakdown": {
-                "irpj": float(irpj),
-                "csll": float(csll),
-                "pis": float(pis),
-                "cofins": float(cofins)
-            }
-        }
-    
-    # Calcular impostos baseado no regime
-    if simulation_data.tax_regime == "simples_nacional":
-        simulated_taxes = calculate_simples_nacional(simulation_data.revenue)
-    else:
-        simulated_taxes = calculate_lucro_presumido(simulation_data.revenue)
+            simulated_taxes = calculate_lucro_presumido(
+                simulation_data.revenue, simulation_data.activity, simulation_data.year
+            )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     
     # Salvar simulação no banco
     db_simulation = TaxSimulation(
-        company_id=current_user.company_id,
+        company_id=str(current_user.company_id),
         revenue=simulation_data.revenue,
         tax_regime=TaxRegime(simulation_data.tax_regime),
         simulated_taxes=simulated_taxes
@@ -370,17 +657,475 @@ async def simulate_taxes(
     return db_simulation
 
 
+@router.post("/taxes/simulate/batch", response_model=TaxSimulationBatch)
+async def simulate_taxes_batch(
+    batch_data: TaxSimulationBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Simula os dois regimes para uma grade de receitas e calcula o ponto de equilíbrio"""
+    try:
+        payload = simulate_tax_grid(
+            batch_data.revenues, batch_data.annex, batch_data.activity, batch_data.year
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    if not batch_data.ephemeral:
+        db.execute(insert(TaxSimulation), [
+            {
+                "id": str(uuid4()),
+                "company_id": str(current_user.company_id),
+                "revenue": Decimal(str(revenue)),
+                "tax_regime": TaxRegime(regime),
+                "simulated_taxes": simulated_taxes
+            }
+            for revenue, regime, simulated_taxes in grid_simulation_records(payload)
+        ])
+        db.commit()
+    
+    return payload
+
+
+@router.get("/taxes/projection")
+async def get_tax_projection(
+    months: int = Query(12, ge=1, le=60),
+    annex: str = "III",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Projeta o Simples Nacional mês a mês pela RBT12 das receitas pagas"""
+    try:
+        return cached_tax_projection(db, current_user.company_id, months, annex)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
 @router.get("/taxes/simulations/", response_model=List[TaxSimulationSchema])
 async def list_tax_simulations(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Lista simulações de impostos da empresa, mais recentes primeiro (paginação por cursor)"""
+    query = db.query(TaxSimulation).filter(
+        TaxSimulation.company_id == str(current_user.company_id)
+    )
+    page = keyset_paginate(
+        query, [TaxSimulation.created_at, TaxSimulation.id], cursor, limit, descending=True
+    )
+    set_page_headers(response, page)
+    
+    return page.items
+
+
+
+# Extratos bancários
+def _get_statement_import(db: Session, import_id: UUID, company_id) -> BankReconciliation:
+    statement_import = db.query(BankReconciliation).filter(
+        BankReconciliation.id == str(import_id),
+        BankReconciliation.company_id == str(company_id)
+    ).first()
+    
+    if not statement_import:
+        raise HTTPException(status_code=404, detail="Statement import not found")
+    return statement_import
+
+
+@router.post("/statements/", response_model=BankStatementImport, status_code=status.HTTP_202_ACCEPTED)
+async def upload_statement(
+    background_tasks: BackgroundTasks,
+    account_id: UUID = Form(...),
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Recebe um extrato OFX ou XLSX e agenda a importação das linhas"""
+    file_type = statement_file_type(file.filename)
+    account = db.query(FinancialAccount).filter(
+        FinancialAccount.id == account_id,
+        FinancialAccount.company_id == current_user.company_id
+    ).first()
+    
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    path = await save_upload(
+        file,
+        os.path.join(settings.UPLOAD_DIR, STATEMENTS_SUBDIR),
+        settings.MAX_FILE_SIZE,
+        settings.UPLOAD_CHUNK_SIZE
+    )
+    statement_import = BankReconciliation(
+        company_id=str(current_user.company_id),
+        account_id=str(account.id),
+        file_type=file_type,
+        file_url=path
+    )
+    db.add(statement_import)
+    db.commit()
+    db.refresh(statement_import)
+    
+    background_tasks.add_task(
+        run_statement_import,
+        statement_import.id,
+        settings.STATEMENT_IMPORT_BATCH_SIZE,
+        sessionmaker(bind=db.get_bind())
+    )
+    return statement_import
+
+
+@router.get("/statements/{import_id}", response_model=BankStatementImport)
+async def get_statement_import(
+    import_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Situação da importação de um extrato"""
+    return _get_statement_import(db, import_id, current_user.company_id)
+
+
+@router.post("/statements/{import_id}/reconcile", response_model=BankStatementImport, status_code=status.HTTP_202_ACCEPTED)
+async def reconcile_statement(
+    import_id: UUID,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Agenda a conciliação das linhas importadas com as transações em aberto da conta"""
+    statement_import = _get_statement_import(db, import_id, current_user.company_id)
+    
+    if statement_import.status not in (ReconciliationStatus.IMPORTED, ReconciliationStatus.COMPLETED):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Statement import is {statement_import.status.value}"
+        )
+    
+    statement_import.status = ReconciliationStatus.PROCESSING
+    db.commit()
+    db.refresh(statement_import)
+    
+    background_tasks.add_task(
+        run_reconciliation,
+        statement_import.id,
+        settings.RECONCILIATION_DATE_TOLERANCE_DAYS,
+        settings.RECONCILIATION_AMOUNT_TOLERANCE_CENTS,
+        settings.STATEMENT_IMPORT_BATCH_SIZE,
+        sessionmaker(bind=db.get_bind())
+    )
+    return statement_import
+
+
+@router.get("/statements/{import_id}/lines", response_model=List[BankStatementLineSchema])
+async def list_statement_lines(
+    import_id: UUID,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Linhas importadas do extrato, na ordem do arquivo (paginação por cursor)"""
+    statement_import = _get_statement_import(db, import_id, current_user.company_id)
+    query = db.query(BankStatementLine).filter(
+        BankStatementLine.reconciliation_id == statement_import.id
+    )
+    page = keyset_paginate(query, [BankStatementLine.line_number], cursor, limit)
+    set_page_headers(response, page)
+    
+    return page.items
+
+
+@router.get("/statements/{import_id}/summary", response_model=ReconciliationSummary)
+async def get_reconciliation_summary(
+    import_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Totais da conciliação por situação, numa única consulta agregada"""
+    statement_import = _get_statement_import(db, import_id, current_user.company_id)
+    rows = db.query(
+        ReconciliationMatch.status,
+        func.count(),
+        func.sum(case((ReconciliationMatch.exact, 1), else_=0))
+    ).filter(
+        ReconciliationMatch.reconciliation_id == statement_import.id
+    ).group_by(ReconciliationMatch.status).all()
+    
+    counts = {match_status: 0 for match_status in MatchStatus}
+    counts.update({match_status: count for match_status, count, _ in rows})
+    
+    return ReconciliationSummary(
+        id=statement_import.id,
+        status=statement_import.status,
+        line_count=statement_import.line_count,
+        counts=counts,
+        exact=sum(exact or 0 for _, _, exact in rows)
+    )
+
+
+@router.get("/statements/{import_id}/matches", response_model=List[ReconciliationMatchSchema])
+async def list_reconciliation_matches(
+    import_id: UUID,
+    response: Response,
+    match_status: Optional[MatchStatus] = Query(None, alias="status"),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Resultado da conciliação por linha do extrato (paginação por cursor)"""
+    statement_import = _get_statement_import(db, import_id, current_user.company_id)
+    query = db.query(ReconciliationMatch).filter(
+        ReconciliationMatch.reconciliation_id == statement_import.id
+    )
+    if match_status:
+        query = query.filter(ReconciliationMatch.status == match_status)
+    page = keyset_paginate(query, [ReconciliationMatch.line_number], cursor, limit)
+    set_page_headers(response, page)
+    
+    return page.items
+
+
+@router.get("/transactions/{transaction_id}/reconciliation", response_model=TransactionReconciliation)
+async def get_transaction_reconciliation(
+    transaction_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Indica se a transação foi conciliada com alguma linha de extrato"""
+    transaction = db.query(FinancialTransaction.id).filter(
+        FinancialTransaction.id == transaction_id,
+        FinancialTransaction.company_id == current_user.company_id
+    ).first()
+    
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    
+    match = db.query(ReconciliationMatch).filter(
+        ReconciliationMatch.transaction_id == transaction_id
+    ).order_by(ReconciliationMatch.created_at.desc()).first()
+    
+    if not match:
+        return TransactionReconciliation(transaction_id=transaction_id, status=MatchStatus.UNMATCHED)
+    return TransactionReconciliation(
+        transaction_id=transaction_id,
+        status=match.status,
+        reconciliation_id=match.reconciliation_id,
+        line_id=match.line_id,
+        score=match.score
+    )
+
+
+# Exportação contábil (SPED/DRE)
+def _get_accounting_export(db: Session, export_id: UUID, company_id) -> AccountingIntegration:
+    accounting_export = db.query(AccountingIntegration).filter(
+        AccountingIntegration.id == str(export_id),
+        AccountingIntegration.company_id == str(company_id)
+    ).first()
+    
+    if not accounting_export:
+        raise HTTPException(status_code=404, detail="Accounting export not found")
+    return accounting_export
+
+
+@router.post("/accounting/exports/", response_model=AccountingExport, status_code=status.HTTP_202_ACCEPTED)
+async def create_accounting_export(
+    export_data: AccountingExportCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Lista simulações de impostos da empresa"""
-    simulations = db.query(TaxSimulation).filter(
-        TaxSimulation.company_id == current_user.company_id
-    ).offset(skip).limit(limit).all()
+    """Agenda a geração de um arquivo SPED ou DRE do período"""
+    accounting_export = AccountingIntegration(
+        company_id=str(current_user.company_id),
+        accountant_id=current_user.id,
+        export_type=export_data.export_type,
+        start_date=export_data.start_date,
+        end_date=export_data.end_date,
+        file_url=export_path(settings.ACCOUNTING_EXPORT_DIR, export_data.export_type)
+    )
+    db.add(accounting_export)
+    db.commit()
+    db.refresh(accounting_export)
     
-    return simulations
+    background_tasks.add_task(
+        run_accounting_export,
+        accounting_export.id,
+        settings.EXPORT_BATCH_SIZE,
+        sessionmaker(bind=db.get_bind())
+    )
+    return accounting_export
+
+
+@router.get("/accounting/exports/{export_id}", response_model=AccountingExport)
+async def get_accounting_export(
+    export_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Situação de uma exportação contábil"""
+    return _get_accounting_export(db, export_id, current_user.company_id)
+
+
+@router.get("/accounting/exports/{export_id}/download")
+async def download_accounting_export(
+    export_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Baixa o arquivo de uma exportação concluída"""
+    accounting_export = _get_accounting_export(db, export_id, current_user.company_id)
+    
+    if accounting_export.status != ExportStatus.COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Accounting export is {accounting_export.status.value}"
+        )
+    
+    filename = (
+        f"{accounting_export.export_type.value}-{accounting_export.start_date.isoformat()}"
+        f"-{accounting_export.end_date.isoformat()}{EXPORT_EXTENSIONS[accounting_export.export_type]}"
+    )
+    return FileResponse(accounting_export.file_url, filename=filename)
+
+
+# Relatórios
+def _report_months(start: date, end: date) -> List[str]:
+    """Meses do período de um relatório, validando ordem e tamanho"""
+    if end < start:
+        raise HTTPException(status_code=400, detail="'to' must be on or after 'from'")
+    months = month_range(start, end)
+    if len(months) > settings.REPORT_MAX_MONTHS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Period must span at most {settings.REPORT_MAX_MONTHS} months"
+        )
+    return months
+
 
+@router.get("/reports/dre")
+async def get_dre_report(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    compare: Optional[DreCompare] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """DRE das transações pagas por categoria e centro de custo (meses inteiros)"""
+    _report_months(start, end)
+    return dre_report(db, current_user.company_id, start, end, compare)
+
+
+@router.get("/reports/budget-vs-actual")
+async def get_budget_vs_actual(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    cost_center_id: Optional[UUID] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Orçado x realizado por centro de custo e categoria, a partir dos agregados mensais"""
+    months = _report_months(start, end)
+    # Payload colunar já serializável: dispensa o jsonable_encoder
+    return JSONResponse(budget_vs_actual(db, current_user.company_id, months, cost_center_id))
+
+
+# Orçamentos
+@router.get("/budgets/", response_model=List[BudgetSchema])
+async def list_budgets(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    cost_center_id: Optional[UUID] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Lista valores orçados dos meses do período"""
+    months = _report_months(start, end)
+    query = db.query(Budget).filter(
+        Budget.company_id == current_user.company_id,
+        Budget.month.between(months[0], months[-1])
+    )
+    if cost_center_id:
+        query = query.filter(Budget.cost_center_id == cost_center_id)
+    
+    return query.order_by(Budget.cost_center_id, Budget.category_id, Budget.month).all()
+
+
+@router.put("/budgets/", response_model=List[BudgetSchema])
+async def upsert_budgets(
+    budget_data: BudgetBulkUpsert,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Grava valores orçados em lote, atualizando as células já existentes"""
+    _check_bulk_size(budget_data.items)
+    company_id = current_user.company_id
+    
+    cost_center_ids = {item.cost_center_id for item in budget_data.items}
+    category_ids = {item.category_id for item in budget_data.items}
+    owned_cost_centers = {
+        row.id for row in db.query(CostCenter.id).filter(
+            CostCenter.company_id == company_id, CostCenter.id.in_(cost_center_ids)
+        )
+    }
+    owned_categories = {
+        row.id for row in db.query(FinancialCategory.id).filter(
+            FinancialCategory.company_id == company_id, FinancialCategory.id.in_(category_ids)
+        )
+    }
+    if cost_center_ids - owned_cost_centers:
+        raise HTTPException(status_code=404, detail="Cost center not found")
+    if category_ids - owned_categories:
+        raise HTTPException(status_code=404, detail="Category not found")
+    
+    months = [item.month for item in budget_data.items]
+    existing = {
+        (budget.cost_center_id, budget.category_id, budget.month): budget
+        for budget in db.query(Budget).filter(
+            Budget.company_id == company_id,
+            Budget.cost_center_id.in_(cost_center_ids),
+            Budget.month.between(min(months), max(months))
+        )
+    } if budget_data.items else {}
+    
+    budgets = []
+    for item in budget_data.items:
+        budget = existing.get((item.cost_center_id, item.category_id, item.month))
+        if budget is None:
+            budget = existing[(item.cost_center_id, item.category_id, item.month)] = Budget(
+                company_id=company_id, **item.dict()
+            )
+            db.add(budget)
+        else:
+            budget.amount = item.amount
+        budgets.append(budget)
+    
+    db.commit()
+    for budget in budgets:
+        db.refresh(budget)
+    
+    return budgets
+
+
+@router.delete("/budgets/{budget_id}")
+async def delete_budget(
+    budget_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Remove um valor orçado"""
+    budget = db.query(Budget).filter(
+        Budget.id == budget_id,
+        Budget.company_id == current_user.company_id
+    ).first()
+    
+    if not budget:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    
+    db.delete(budget)
+    db.commit()
+    
+    return {"message": "Budget deleted successfully"}
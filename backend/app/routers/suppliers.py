@@ -1,11 +1,12 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from uuid import UUID
 from ..config.database import get_db
 from ..models.user import User
 from ..models.supplier import Supplier
 from ..schemas.supplier import SupplierCreate, SupplierUpdate, Supplier as SupplierSchema
+from ..utils.pagination import keyset_paginate, set_page_headers
 from ..utils.security import get_current_active_user
 
 router = APIRouter()
@@ -13,17 +14,20 @@ router = APIRouter()
 
 @router.get("/", response_model=List[SupplierSchema])
 async def list_suppliers(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Lista fornecedores da empresa do usuário logado"""
-    suppliers = db.query(Supplier).filter(
+    """Lista fornecedores da empresa do usuário logado, ordenados por nome (paginação por cursor)"""
+    query = db.query(Supplier).filter(
         Supplier.company_id == current_user.company_id
-    ).offset(skip).limit(limit).all()
+    )
+    page = keyset_paginate(query, [Supplier.name, Supplier.id], cursor, limit)
+    set_page_headers(response, page)
     
-    return suppliers
+    return page.items
 
 
 @router.get("/{supplier_id}", response_model=SupplierSchema)
@@ -1,9 +1,11 @@
 from pydantic import BaseModel, validator
-from typing import Optional
+from typing import Any, Dict, List, Optional
+import enum
 from datetime import datetime, date
 from uuid import UUID
 from decimal import Decimal
 from ..models.financial import AccountType, TransactionType, TransactionStatus, CategoryType
+from ..models.integrations import ExportStatus, ExportType, FileType, MatchStatus, ReconciliationStatus
 
 
 class FinancialAccountBase(BaseModel):
@@ -36,6 +38,12 @@ class FinancialAccount(FinancialAccountInDB):
     pass
 
 
+class AccountBalance(BaseModel):
+    account_id: UUID
+    as_of: Optional[date] = None  # None: saldo atual
+    balance: Decimal
+
+
 class FinancialCategoryBase(BaseModel):
     name: str
     type: CategoryType
@@ -147,6 +155,73 @@ class FinancialTransaction(FinancialTransactionInDB):
     cost_center: Optional[CostCenter] = None
 
 
+class FinancialTransactionBulkCreate(BaseModel):
+    """Lote de transações; cada item é validado como ``FinancialTransactionBase`` e criado como pendente"""
+    items: List[Dict[str, Any]]
+    partial: bool = False  # grava os itens válidos mesmo se houver erros
+
+
+class BulkItemError(BaseModel):
+    index: int
+    errors: List[str]
+
+
+class FinancialTransactionBulkResult(BaseModel):
+    created_ids: List[UUID]
+    errors: List[BulkItemError]
+
+
+class FinancialTransactionBulkPay(BaseModel):
+    ids: List[UUID]
+    payment_date: Optional[date] = None  # padrão: hoje
+
+
+class FinancialTransactionBulkStatus(BaseModel):
+    ids: List[UUID]
+    status: TransactionStatus
+
+
+class BulkUpdateResult(BaseModel):
+    requested: int  # ids distintos recebidos
+    matched: int  # ids encontrados na empresa
+    affected: int  # linhas efetivamente alteradas
+
+
+class TransactionSort(str, enum.Enum):
+    DUE_DATE = "due_date"
+    DUE_DATE_DESC = "-due_date"
+    AMOUNT = "amount"
+    AMOUNT_DESC = "-amount"
+    CREATED_AT = "created_at"
+    CREATED_AT_DESC = "-created_at"
+
+
+class ExportFormat(str, enum.Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class DreCompare(str, enum.Enum):
+    PREVIOUS = "previous"  # Período anterior de mesmo tamanho
+    YOY = "yoy"  # Mesmo período do ano anterior
+
+
+class FinancialTransactionFilters(BaseModel):
+    """Filtros e ordenação da listagem de transações (query string)"""
+    status: Optional[TransactionStatus] = None
+    type: Optional[TransactionType] = None
+    due_from: Optional[date] = None
+    due_to: Optional[date] = None
+    paid_from: Optional[date] = None
+    paid_to: Optional[date] = None
+    account_id: Optional[UUID] = None
+    category_id: Optional[UUID] = None
+    cost_center_id: Optional[UUID] = None
+    min_amount: Optional[Decimal] = None
+    max_amount: Optional[Decimal] = None
+    sort: TransactionSort = TransactionSort.DUE_DATE
+
+
 class TaxSimulationBase(BaseModel):
     revenue: Decimal
     tax_regime: str  # 'simples_nacional' ou 'lucro_presumido'
@@ -166,6 +241,49 @@ class TaxSimulationBase(BaseModel):
 
 class TaxSimulationCreate(TaxSimulationBase):
     company_id: UUID
+    annex: str = "III"  # anexo do Simples Nacional
+    activity: str = "services"  # presunção do Lucro Presumido: services ou commerce
+    year: Optional[int] = None  # ano da tabela (padrão: atual)
+
+
+# Pontos de receita aceitos por simulação em lote
+TAX_GRID_MAX_POINTS = 1000
+
+
+class TaxSimulationBatchCreate(BaseModel):
+    revenues: List[Decimal]
+    annex: str = "III"
+    activity: str = "services"
+    year: Optional[int] = None
+    ephemeral: bool = False  # não grava as simulações
+    
+    @validator('revenues')
+    def validate_revenues(cls, v):
+        if not v:
+            raise ValueError('At least one revenue is required')
+        if len(v) > TAX_GRID_MAX_POINTS:
+            raise ValueError(f'At most {TAX_GRID_MAX_POINTS} revenues are allowed')
+        if any(revenue <= 0 for revenue in v):
+            raise ValueError('Revenue must be greater than zero')
+        return v
+
+
+class TaxBreakeven(BaseModel):
+    revenue: float
+    cheaper_below: str
+    cheaper_above: str
+
+
+class TaxSimulationBatch(BaseModel):
+    """Resultado colunar: cada lista é alinhada com ``revenue``"""
+    table_version: int
+    annex: str
+    activity: str
+    revenue: List[float]
+    simples_nacional: Dict[str, List[Optional[float]]]
+    lucro_presumido: Dict[str, Any]
+    best_regime: List[str]
+    breakeven: List[TaxBreakeven]
 
 
 class TaxSimulationInDB(TaxSimulationBase):
@@ -182,3 +300,122 @@ class TaxSimulationInDB(TaxSimulationBase):
 class TaxSimulation(TaxSimulationInDB):
     pass
 
+
+
+class BankStatementImport(BaseModel):
+    id: UUID
+    account_id: UUID
+    file_type: FileType
+    status: ReconciliationStatus
+    line_count: int
+    error_message: Optional[str]
+    created_at: datetime
+    updated_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+
+class BankStatementLine(BaseModel):
+    id: UUID
+    line_number: int
+    posted_date: date
+    amount: Decimal
+    description: Optional[str]
+    fit_id: Optional[str]
+    
+    class Config:
+        from_attributes = True
+
+
+class ReconciliationMatch(BaseModel):
+    id: UUID
+    line_id: UUID
+    line_number: int
+    transaction_id: Optional[UUID]
+    status: MatchStatus
+    score: Optional[float]
+    exact: bool
+    candidates: int
+    
+    class Config:
+        from_attributes = True
+
+
+class ReconciliationSummary(BaseModel):
+    id: UUID
+    status: ReconciliationStatus
+    line_count: int
+    counts: Dict[MatchStatus, int]
+    exact: int
+
+
+class TransactionReconciliation(BaseModel):
+    transaction_id: UUID
+    status: MatchStatus
+    reconciliation_id: Optional[UUID] = None
+    line_id: Optional[UUID] = None
+    score: Optional[float] = None
+
+
+class AccountingExportCreate(BaseModel):
+    export_type: ExportType
+    start_date: date
+    end_date: date
+    
+    @validator('end_date')
+    def validate_period(cls, v, values):
+        if 'start_date' in values and v < values['start_date']:
+            raise ValueError('end_date must be on or after start_date')
+        return v
+
+
+class AccountingExport(BaseModel):
+    id: UUID
+    export_type: ExportType
+    start_date: date
+    end_date: date
+    status: ExportStatus
+    transaction_count: int
+    error_message: Optional[str]
+    created_at: datetime
+    updated_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+
+class BudgetBase(BaseModel):
+    cost_center_id: UUID
+    category_id: UUID
+    month: str  # YYYY-MM
+    amount: Decimal
+    
+    @validator('month')
+    def validate_month(cls, v):
+        try:
+            month = datetime.strptime(v, '%Y-%m')
+        except ValueError:
+            raise ValueError('Month must be in YYYY-MM format')
+        # strptime aceita "2026-1": grava sempre a chave com zero à esquerda
+        return month.strftime('%Y-%m')
+    
+    @validator('amount')
+    def validate_amount(cls, v):
+        if v < 0:
+            raise ValueError('Amount must not be negative')
+        return v
+
+
+class BudgetBulkUpsert(BaseModel):
+    """Valores orçados; células já existentes (centro de custo, categoria, mês) são atualizadas"""
+    items: List[BudgetBase]
+
+
+class Budget(BudgetBase):
+    id: UUID
+    created_at: datetime
+    updated_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
@@ -0,0 +1,245 @@
+import csv
+import logging
+import os
+import uuid
+from collections import Counter, defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, Optional, TextIO
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, sessionmaker
+from ..config.database import SessionLocal
+from ..models.company import Company
+from ..models.financial import (
+    FinancialAccount, FinancialCategory, FinancialTransaction, CostCenter, TransactionStatus, TransactionType
+)
+from ..models.integrations import AccountingIntegration, ExportStatus, ExportType
+
+logger = logging.getLogger(__name__)
+
+EXPORT_EXTENSIONS = {
+    ExportType.SPED: ".txt",
+    ExportType.DRE: ".csv",
+}
+
+UNCATEGORIZED = "Sem categoria"
+
+# Colunas lidas do cursor, na ordem dos lançamentos
+_TRANSACTION_COLUMNS = (
+    FinancialTransaction.id,
+    FinancialTransaction.payment_date,
+    FinancialTransaction.type,
+    FinancialTransaction.amount,
+    FinancialTransaction.description,
+    FinancialTransaction.account_id,
+    FinancialTransaction.category_id,
+    FinancialTransaction.cost_center_id,
+)
+
+
+def export_path(directory: str, export_type: ExportType) -> str:
+    """Caminho do arquivo de uma nova exportação"""
+    return os.path.join(directory, f"{export_type.value}-{uuid.uuid4()}{EXPORT_EXTENSIONS[export_type]}")
+
+
+def _sped_date(value: date) -> str:
+    return value.strftime("%d%m%Y")
+
+
+def _sped_amount(value) -> str:
+    return f"{Decimal(str(value)):.2f}".replace(".", ",")
+
+
+def _sped_text(value) -> str:
+    # "|" é o separador de campos do leiaute
+    return " ".join(str(value or "").replace("|", " ").split())
+
+
+class SpedWriter:
+    """Escreve registros SPED (``|REG|campo|...|``) contando linhas por bloco e por registro.
+
+    As contagens dos registros de encerramento (``x990``, ``9900``, ``9999``)
+    são acumuladas enquanto as linhas são gravadas, numa única passada.
+    """
+
+    def __init__(self, output: TextIO):
+        self.output = output
+        self.block_lines = Counter()
+        self.record_lines = Counter()
+
+    def record(self, register: str, *fields) -> None:
+        self.output.write("|" + "|".join((register,) + tuple(_sped_text(field) for field in fields)) + "|\n")
+        self.block_lines[register[0]] += 1
+        self.record_lines[register] += 1
+
+    def open_block(self, block: str, has_data: bool = True) -> None:
+        self.record(f"{block}001", "0" if has_data else "1")
+
+    def close_block(self, block: str) -> None:
+        # A contagem inclui o próprio registro de encerramento
+        self.record(f"{block}990", self.block_lines[block] + 1)
+
+    def close_file(self) -> int:
+        """Escreve o bloco 9 (linhas por registro) e retorna o total de linhas do arquivo"""
+        self.open_block("9")
+        registers = sorted(set(self.record_lines) | {"9900", "9990", "9999"})
+        counts = dict(self.record_lines, **{"9900": len(registers), "9990": 1, "9999": 1})
+        for register in registers:
+            self.record("9900", register, counts[register])
+        # O 9990 conta o bloco 9 inteiro, incluindo ele mesmo e o 9999
+        self.record("9990", self.block_lines["9"] + 2)
+        total = sum(self.record_lines.values()) + 1
+        self.record("9999", total)
+        return total
+
+
+def _stream_transactions(connection: Connection, company_id, start: date, end: date, batch_size: int) -> Iterable[tuple]:
+    """Transações pagas no período, lidas em lotes de um cursor no servidor"""
+    statement = select(*_TRANSACTION_COLUMNS).where(
+        FinancialTransaction.company_id == company_id,
+        FinancialTransaction.status == TransactionStatus.PAID,
+        FinancialTransaction.payment_date.between(start, end),
+    ).order_by(FinancialTransaction.payment_date, FinancialTransaction.id)
+    result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(statement)
+    for rows in result.partitions():
+        yield from rows
+
+
+def write_sped(output: TextIO, db: Session, connection: Connection, export: AccountingIntegration, batch_size: int) -> int:
+    """Gera a escrituração no leiaute SPED (ECD), um lançamento ``I200`` por transação paga.
+
+    Contas financeiras e categorias formam o plano de contas (``I050``) e os
+    centros de custo os registros ``I100``. Cada lançamento tem duas partidas
+    (``I250``): receitas debitam a conta financeira e creditam a categoria;
+    despesas, o inverso.
+
+    Returns:
+        Quantidade de transações exportadas
+    """
+    company_id = uuid.UUID(export.company_id)
+    company = db.get(Company, export.company_id)
+    accounts = db.query(FinancialAccount).filter(FinancialAccount.company_id == company_id).all()
+    categories = db.query(FinancialCategory).filter(FinancialCategory.company_id == company_id).all()
+    cost_centers = db.query(CostCenter).filter(CostCenter.company_id == company_id).all()
+
+    sped = SpedWriter(output)
+    sped.record(
+        "0000", "LECD", _sped_date(export.start_date), _sped_date(export.end_date),
+        company.name if company else "", company.cnpj if company else ""
+    )
+    sped.open_block("0")
+    sped.close_block("0")
+
+    start = _sped_date(export.start_date)
+    sped.open_block("I")
+    for account in accounts:
+        # 01: ativo; 04: contas de resultado
+        sped.record("I050", start, "01", "A", 1, account.id, "", account.name)
+    sped.record("I050", start, "04", "A", 1, UNCATEGORIZED, "", UNCATEGORIZED)
+    for category in categories:
+        sped.record("I050", start, "04", "A", 1, category.id, "", category.name)
+    for cost_center in cost_centers:
+        sped.record("I100", start, cost_center.id, cost_center.name)
+
+    number = 0
+    for number, (transaction_id, payment_date, type, amount, description, account_id, category_id, cost_center_id) in enumerate(
+        _stream_transactions(connection, company_id, export.start_date, export.end_date, batch_size), start=1
+    ):
+        value = _sped_amount(amount)
+        category_code = category_id or UNCATEGORIZED
+        debit, credit = (account_id, category_code) if type == TransactionType.INCOME else (category_code, account_id)
+        sped.record("I200", number, _sped_date(payment_date), value, "N")
+        sped.record("I250", debit, cost_center_id or "", value, "D", transaction_id, "", description)
+        sped.record("I250", credit, cost_center_id or "", value, "C", transaction_id, "", description)
+    sped.close_block("I")
+
+    sped.close_file()
+    return number
+
+
+def write_dre(output: TextIO, db: Session, connection: Connection, export: AccountingIntegration, batch_size: int) -> int:
+    """Gera a DRE do período (receitas e despesas pagas por categoria) em CSV.
+
+    Os totais por categoria são somados durante a leitura do cursor; a
+    memória usada depende só do número de categorias.
+
+    Returns:
+        Quantidade de transações exportadas
+    """
+    company_id = uuid.UUID(export.company_id)
+    names = dict(
+        db.query(FinancialCategory.id, FinancialCategory.name).filter(FinancialCategory.company_id == company_id).all()
+    )
+    totals: Dict[TransactionType, Dict] = {TransactionType.INCOME: defaultdict(Decimal), TransactionType.EXPENSE: defaultdict(Decimal)}
+
+    count = 0
+    for _, _, type, amount, _, _, category_id, _ in _stream_transactions(
+        connection, company_id, export.start_date, export.end_date, batch_size
+    ):
+        totals[type][category_id] += Decimal(str(amount))
+        count += 1
+
+    writer = csv.writer(output, delimiter=";")
+    writer.writerow(["grupo", "categoria", "valor"])
+    sections = (
+        (TransactionType.INCOME, "Receitas", "Total de receitas"),
+        (TransactionType.EXPENSE, "Despesas", "Total de despesas"),
+    )
+    for type, group, label in sections:
+        for category_id, amount in sorted(totals[type].items(), key=lambda item: names.get(item[0], UNCATEGORIZED)):
+            writer.writerow([group, names.get(category_id, UNCATEGORIZED), _sped_amount(amount)])
+        writer.writerow([group, label, _sped_amount(sum(totals[type].values(), Decimal("0")))])
+
+    result = sum(totals[TransactionType.INCOME].values(), Decimal("0")) - sum(totals[TransactionType.EXPENSE].values(), Decimal("0"))
+    writer.writerow(["Resultado", "Resultado do período", _sped_amount(result)])
+    return count
+
+
+EXPORT_WRITERS: Dict[ExportType, Callable] = {
+    ExportType.SPED: write_sped,
+    ExportType.DRE: write_dre,
+}
+
+
+def run_accounting_export(
+    export_id: str,
+    batch_size: int,
+    session_factory: sessionmaker = SessionLocal
+) -> Optional[str]:
+    """Tarefa em segundo plano: gera o arquivo da exportação contábil.
+
+    O arquivo é escrito em disco à medida que o cursor é lido e só recebe o
+    nome final (``file_url``) quando completo.
+
+    Returns:
+        Caminho do arquivo gerado, ou ``None`` se a exportação não foi executada
+    """
+    db = session_factory()
+    try:
+        export = db.get(AccountingIntegration, export_id)
+        if export is None or export.status != ExportStatus.PENDING:
+            return None
+        export.status = ExportStatus.PROCESSING
+        db.commit()
+
+        partial = f"{export.file_url}.partial"
+        try:
+            os.makedirs(os.path.dirname(export.file_url) or ".", exist_ok=True)
+            with db.get_bind().connect() as connection, open(partial, "w", encoding="utf-8", newline="") as output:
+                export.transaction_count = EXPORT_WRITERS[export.export_type](output, db, connection, export, batch_size)
+            os.replace(partial, export.file_url)
+            export.status = ExportStatus.COMPLETED
+            db.commit()
+            return export.file_url
+        except Exception as error:
+            logger.exception("Exportação contábil %s falhou", export_id)
+            db.rollback()
+            if os.path.exists(partial):
+                os.remove(partial)
+            export.status = ExportStatus.FAILED
+            export.error_message = str(error) or error.__class__.__name__
+            db.commit()
+            return None
+    finally:
+        db.close()
@@ -0,0 +1,279 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Optional
+import numpy as np
+from sqlalchemy import Date, case, cast, delete, func, insert, literal, select, true, update
+from sqlalchemy.orm import Session, sessionmaker
+from ..config.database import SessionLocal
+from ..models.financial import (
+    AccountBalanceSnapshot, FinancialAccount, FinancialTransaction, TransactionStatus, TransactionType
+)
+from .scheduler import job_lock
+
+JOB_NAME = "balance_snapshots"
+
+_t = FinancialTransaction
+
+# Valor com sinal no saldo: receitas somam, despesas subtraem
+signed_amount = case((_t.type == TransactionType.INCOME, _t.amount), else_=-_t.amount)
+
+# Data em que um pagamento entra no saldo (mesma regra de ``ledger.reference_date``)
+payment_reference_date = func.coalesce(_t.payment_date, _t.due_date)
+
+
+def _paid_sum(db: Session, account_id, after: Optional[date], until: Optional[date]) -> Decimal:
+    """Soma com sinal dos pagamentos da conta no intervalo (after, until]"""
+    query = db.query(func.coalesce(func.sum(signed_amount), 0)).filter(
+        _t.account_id == account_id,
+        _t.status == TransactionStatus.PAID
+    )
+    if after is not None:
+        query = query.filter(payment_reference_date > after)
+    if until is not None:
+        query = query.filter(payment_reference_date <= until)
+    return Decimal(str(query.scalar()))
+
+
+def account_balance_as_of(db: Session, account: FinancialAccount, as_of: date) -> Decimal:
+    """Saldo da conta ao final do dia ``as_of``.
+
+    Parte do snapshot mais recente até ``as_of`` e soma apenas os pagamentos
+    posteriores a ele. Sem snapshot anterior, parte do saldo atual e desconta
+    os pagamentos feitos depois de ``as_of``.
+
+    Args:
+        db: Sessão do banco de dados
+        account: Conta financeira
+        as_of: Data de referência
+
+    Returns:
+        Saldo na data
+    """
+    snapshot = db.query(AccountBalanceSnapshot).filter(
+        AccountBalanceSnapshot.account_id == account.id,
+        AccountBalanceSnapshot.snapshot_date <= as_of
+    ).order_by(AccountBalanceSnapshot.snapshot_date.desc()).first()
+
+    if snapshot is not None:
+        balance = Decimal(str(snapshot.balance))
+        if snapshot.snapshot_date == as_of:
+            return balance
+        return balance + _paid_sum(db, account.id, snapshot.snapshot_date, as_of)
+
+    return Decimal(str(account.balance or 0)) - _paid_sum(db, account.id, as_of, None)
+
+
+def apply_balance_deltas(db: Session, deltas: dict) -> None:
+    """Soma deltas ao saldo das contas e aos snapshots afetados.
+
+    Os UPDATEs filtram também pela empresa da transação, de modo que uma
+    conta de outra empresa nunca é alterada.
+
+    Args:
+        db: Sessão do banco de dados
+        deltas: ``{(company_id, account_id, data do pagamento): valor}``
+    """
+    totals = {}
+    for (company_id, account_id, paid_on), amount in deltas.items():
+        totals[(company_id, account_id)] = totals.get((company_id, account_id), Decimal('0')) + amount
+        shift_balance_snapshots(db, company_id, account_id, paid_on, amount)
+
+    for (company_id, account_id), amount in totals.items():
+        if amount:
+            db.execute(
+                update(FinancialAccount)
+                .where(FinancialAccount.id == account_id, FinancialAccount.company_id == company_id)
+                .values(balance=func.coalesce(FinancialAccount.balance, 0) + amount)
+                .execution_options(synchronize_session=False)
+            )
+
+
+def shift_balance_snapshots(db: Session, company_id, account_id, since: Optional[date], amount: Decimal) -> None:
+    """Desloca os snapshots da conta a partir de ``since`` (todos, se ``None``)"""
+    if not amount:
+        return
+    stmt = update(AccountBalanceSnapshot).where(
+        AccountBalanceSnapshot.account_id == account_id,
+        AccountBalanceSnapshot.company_id == company_id
+    )
+    if since is not None:
+        stmt = stmt.where(AccountBalanceSnapshot.snapshot_date >= since)
+    db.execute(
+        stmt.values(balance=AccountBalanceSnapshot.balance + amount)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def take_balance_snapshots(db: Session, snapshot_date: Optional[date] = None, company_id=None) -> int:
+    """Grava o saldo de cada conta ao final de ``snapshot_date`` (padrão: ontem).
+
+    Um único INSERT ... SELECT para todas as contas; snapshots existentes na
+    mesma data são substituídos. Não faz commit.
+
+    Returns:
+        Número de snapshots gravados
+    """
+    snapshot_date = snapshot_date or date.today() - timedelta(days=1)
+    table = AccountBalanceSnapshot.__table__
+    accounts = FinancialAccount
+
+    paid_after = (
+        select(func.coalesce(func.sum(signed_amount), 0))
+        .where(
+            _t.account_id == accounts.id,
+            _t.status == TransactionStatus.PAID,
+            payment_reference_date > snapshot_date
+        )
+        .scalar_subquery()
+    )
+    source = select(
+        accounts.id,
+        literal(snapshot_date, type_=table.c.snapshot_date.type),
+        accounts.company_id,
+        func.coalesce(accounts.balance, 0) - paid_after,
+    )
+
+    clear = delete(table).where(table.c.snapshot_date == snapshot_date)
+    if company_id is not None:
+        source = source.where(accounts.company_id == company_id)
+        clear = clear.where(table.c.company_id == company_id)
+
+    db.execute(clear)
+    result = db.execute(
+        insert(table).from_select(["account_id", "snapshot_date", "company_id", "balance"], source)
+    )
+    return result.rowcount
+
+
+def run_balance_snapshots(session_factory: sessionmaker = SessionLocal) -> Optional[int]:
+    """Job do agendador: grava os snapshots de ontem se nenhum outro worker estiver nisso"""
+    db = session_factory()
+    try:
+        with job_lock(db, JOB_NAME) as acquired:
+            if not acquired:
+                return None
+            rows = take_balance_snapshots(db)
+            db.commit()
+            return rows
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _to_cents(value) -> int:
+    return int((Decimal(str(value or 0)) * 100).to_integral_value())
+
+
+def _cumulative_window(db: Session, company_id, account_index: dict, start: date, end: date) -> np.ndarray:
+    """Deltas acumulados por dia calculados no banco (generate_series + SUM OVER)"""
+    days = select(
+        cast(func.generate_series(start, end, timedelta(days=1)), Date).label("day")
+    ).subquery()
+    daily = (
+        select(
+            _t.account_id,
+            payment_reference_date.label("day"),
+            func.sum(signed_amount).label("delta")
+        )
+        .where(
+            _t.company_id == company_id,
+            _t.status == TransactionStatus.PAID,
+            payment_reference_date >= start,
+            payment_reference_date <= end
+        )
+        .group_by(_t.account_id, payment_reference_date)
+        .subquery()
+    )
+    running = func.sum(func.coalesce(daily.c.delta, 0)).over(
+        partition_by=FinancialAccount.id, order_by=days.c.day
+    )
+    query = (
+        select(FinancialAccount.id, days.c.day, running)
+        .select_from(FinancialAccount)
+        .join(days, true())
+        .outerjoin(daily, (daily.c.account_id == FinancialAccount.id) & (daily.c.day == days.c.day))
+        .where(FinancialAccount.company_id == company_id)
+    )
+
+    cumulative = np.zeros((len(account_index), (end - start).days + 1), dtype=np.int64)
+    for account_id, day, total in db.execute(query):
+        cumulative[account_index[account_id], (day - start).days] = _to_cents(total)
+    return cumulative
+
+
+def _cumulative_numpy(db: Session, company_id, account_index: dict, start: date, end: date) -> np.ndarray:
+    """Deltas diários agrupados no banco e acumulados em memória (cumsum)"""
+    rows = db.query(
+        _t.account_id, payment_reference_date, func.sum(signed_amount)
+    ).filter(
+        _t.company_id == company_id,
+        _t.status == TransactionStatus.PAID,
+        payment_reference_date >= start,
+        payment_reference_date <= end
+    ).group_by(_t.account_id, payment_reference_date)
+
+    deltas = np.zeros((len(account_index), (end - start).days + 1), dtype=np.int64)
+    for account_id, day, total in rows:
+        deltas[account_index[account_id], (day - start).days] = _to_cents(total)
+    return np.cumsum(deltas, axis=1)
+
+
+def balance_history(db: Session, company_id, start: date, end: date) -> dict:
+    """Saldo diário de todas as contas da empresa entre ``start`` e ``end``.
+
+    O saldo de abertura de cada conta sai de uma única consulta agrupada
+    (saldo atual menos pagamentos a partir de ``start``); os saldos diários são
+    a abertura mais os deltas acumulados, calculados com função de janela no
+    Postgres e com ``numpy.cumsum`` nos demais bancos. Valores em centavos
+    inteiros durante o cálculo, para não acumular erro de ponto flutuante.
+
+    Args:
+        db: Sessão do banco de dados
+        company_id: ID da empresa
+        start: Primeiro dia da série
+        end: Último dia da série
+
+    Returns:
+        Payload colunar: ``dates``, ``accounts`` e ``balances`` (uma lista de
+        saldos por conta, alinhada com ``dates``)
+    """
+    accounts = db.query(
+        FinancialAccount.id, FinancialAccount.name, FinancialAccount.balance
+    ).filter(
+        FinancialAccount.company_id == company_id
+    ).order_by(FinancialAccount.name, FinancialAccount.id).all()
+
+    dates = [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+    payload = {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "dates": dates,
+        "accounts": [{"id": str(account.id), "name": account.name} for account in accounts],
+        "balances": [],
+    }
+    if not accounts:
+        return payload
+
+    account_index = {account.id: position for position, account in enumerate(accounts)}
+    paid_since_start = dict(
+        db.query(_t.account_id, func.sum(signed_amount)).filter(
+            _t.company_id == company_id,
+            _t.status == TransactionStatus.PAID,
+            payment_reference_date >= start
+        ).group_by(_t.account_id).all()
+    )
+    opening = np.array(
+        [_to_cents(account.balance) - _to_cents(paid_since_start.get(account.id)) for account in accounts],
+        dtype=np.int64
+    )
+
+    if db.get_bind().dialect.name == "postgresql":
+        cumulative = _cumulative_window(db, company_id, account_index, start, end)
+    else:
+        cumulative = _cumulative_numpy(db, company_id, account_index, start, end)
+
+    balances = (opening[:, None] + cumulative) / 100
+    payload["balances"] = balances.round(2).tolist()
+    return payload
@@ -0,0 +1,123 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import Dict, Optional, Set, Tuple
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from .kpis import cached_dashboard_kpis
+
+# Eventos enfileirados por assinante antes de descartar e reenviar o snapshot
+SUBSCRIBER_QUEUE_SIZE = 32
+
+
+def diff_payload(previous: dict, current: dict) -> dict:
+    """Retorna apenas as folhas de ``current`` que mudaram em relação a ``previous``"""
+    changes = {}
+    for key, value in current.items():
+        old = previous.get(key) if isinstance(previous, dict) else None
+        if isinstance(value, dict) and isinstance(old, dict):
+            nested = diff_payload(old, value)
+            if nested:
+                changes[key] = nested
+        elif value != old:
+            changes[key] = value
+    return changes
+
+
+def format_sse(event: str, payload) -> str:
+    """Formata uma mensagem Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+class KpiBroadcaster:
+    """Distribui atualizações de KPIs para os assinantes de cada empresa.
+
+    Cada alteração de uma empresa gera um único cálculo de KPIs, cujo delta em
+    relação ao último payload é entregue a todos os assinantes da empresa.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._last: Dict[str, dict] = {}
+        self._sources: Dict[str, tuple] = {}
+        self._pending: Set[str] = set()
+        self._stale: Set[str] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, company_id, snapshot: dict, bind) -> asyncio.Queue:
+        """Registra um assinante; ``bind`` é usado para recalcular os KPIs"""
+        company = str(company_id)
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[company].add(queue)
+        self._last[company] = snapshot
+        self._sources[company] = (company_id, bind)
+        return queue
+
+    def unsubscribe(self, company_id, queue: asyncio.Queue) -> None:
+        company = str(company_id)
+        subscribers = self._subscribers.get(company)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            self._subscribers.pop(company, None)
+            self._last.pop(company, None)
+            self._sources.pop(company, None)
+
+    def subscriber_count(self, company_id) -> int:
+        return len(self._subscribers.get(str(company_id), ()))
+
+    def publish(self, company_id) -> None:
+        """Sinaliza que os dados da empresa mudaram (pode ser chamado de qualquer thread)"""
+        company = str(company_id)
+        loop = self._loop
+        if loop is None or loop.is_closed() or company not in self._subscribers:
+            return
+        loop.call_soon_threadsafe(self._schedule_refresh, company)
+
+    def _schedule_refresh(self, company: str) -> None:
+        # Alterações durante um recálculo geram no máximo mais um recálculo
+        if company in self._pending:
+            self._stale.add(company)
+            return
+        self._pending.add(company)
+        asyncio.ensure_future(self._refresh(company))
+
+    async def _refresh(self, company: str) -> None:
+        try:
+            source = self._sources.get(company)
+            if source is None:
+                return
+            payload = await run_in_threadpool(self._compute, *source)
+            if company in self._subscribers:
+                delta = diff_payload(self._last.get(company, {}), payload)
+                self._last[company] = payload
+                if delta:
+                    self._dispatch(company, ("kpis-delta", delta), payload)
+        finally:
+            self._pending.discard(company)
+            if company in self._stale:
+                self._stale.discard(company)
+                self._schedule_refresh(company)
+
+    @staticmethod
+    def _compute(company_id, bind) -> dict:
+        db = sessionmaker(autocommit=False, autoflush=False, bind=bind)()
+        try:
+            return cached_dashboard_kpis(db, company_id)
+        finally:
+            db.close()
+
+    def _dispatch(self, company: str, message: Tuple[str, dict], snapshot: dict) -> None:
+        for queue in list(self._subscribers.get(company, ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Assinante lento: descarta os deltas e reenvia o estado completo
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("kpis", snapshot))
+
+
+kpi_broadcaster = KpiBroadcaster()
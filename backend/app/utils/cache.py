@@ -0,0 +1,176 @@
+import threading
+from itertools import chain
+from typing import Callable, Dict, Hashable, List, Tuple
+from cachetools import TTLCache
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Chaves em Session.info com as empresas (e os meses) alterados na transação corrente
+_TOUCHED_KEY = "cache_touched_companies"
+_TOUCHED_PERIODS_KEY = "cache_touched_periods"
+
+_MISSING = object()
+
+_registry: List["CompanyCache"] = []
+
+
+def company_key(company_id, *parts: Hashable) -> Tuple:
+    """Monta a chave de cache de uma empresa"""
+    return (str(company_id),) + parts
+
+
+class CompanyCache:
+    """Cache em memória, por empresa, com TTL e limite de tamanho.
+
+    As chaves começam sempre pelo ID da empresa (ver ``company_key``). Quando
+    uma transação de banco que grava algum dos ``models`` observados é
+    confirmada, todas as entradas da empresa afetada são descartadas.
+
+    Caches por mês usam chaves ``company_key(company_id, "YYYY-MM", ...)`` e
+    observam ``period_models``: só as entradas dos meses marcados com
+    ``touch_period`` são descartadas.
+
+    Cada invalidação também incrementa uma versão da empresa e do mês, mesmo
+    sem entradas a descartar: quem calcula um valor lê a versão antes da
+    consulta e grava com ``set_if_version``, que recusa o valor se a
+    empresa ou o mês foram alterados nesse meio tempo.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, models: tuple = (), period_models: tuple = ()):
+        self.name = name
+        self.models = tuple(models)
+        self.period_models = tuple(period_models)
+        self._data = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._versions: Dict[Tuple, int] = {}
+        _registry.append(self)
+
+    def get(self, key: Tuple, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key: Tuple, value) -> None:
+        with self._lock:
+            self._data[key] = value
+
+    def period_version(self, company_id, period: str) -> Tuple[int, int]:
+        """Versão atual da empresa e do mês (muda a cada invalidação)"""
+        company = str(company_id)
+        with self._lock:
+            return self._versions.get((company,), 0), self._versions.get((company, period), 0)
+
+    def set_if_version(self, key: Tuple, value, version: Tuple[int, int]) -> bool:
+        """Grava o valor de uma chave por mês só se a versão ainda for ``version``"""
+        with self._lock:
+            if self.period_version(key[0], key[1]) != version:
+                return False
+            self._data[key] = value
+            return True
+
+    def get_or_compute(self, key: Tuple, compute: Callable[[], object]):
+        """Retorna o valor em cache ou calcula e armazena"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def invalidate_company(self, company_id) -> None:
+        company = str(company_id)
+        with self._lock:
+            self._versions[(company,)] = self._versions.get((company,), 0) + 1
+            stale = [key for key in list(self._data.keys()) if key[0] == company]
+            for key in stale:
+                self._data.pop(key, None)
+            if stale:
+                self.invalidations += 1
+
+    def invalidate_period(self, company_id, period: str) -> None:
+        company = str(company_id)
+        with self._lock:
+            self._versions[(company, period)] = self._versions.get((company, period), 0) + 1
+            stale = [key for key in list(self._data.keys()) if key[0] == company and key[1:2] == (period,)]
+            for key in stale:
+                self._data.pop(key, None)
+            if stale:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self._data.maxsize,
+                "ttl": self._data.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+def cache_stats() -> List[dict]:
+    """Estatísticas de todos os caches registrados"""
+    return [cache.stats() for cache in _registry]
+
+
+def touch_company(session: Session, model, company_id) -> None:
+    """Marca que a transação corrente gravou ``model`` da empresa.
+
+    Gravações feitas pelo ORM são detectadas automaticamente; use esta função
+    para UPDATE/INSERT em massa executados direto no Core.
+    """
+    session.info.setdefault(_TOUCHED_KEY, set()).add((model, str(company_id)))
+
+
+def touch_period(session: Session, model, company_id, period: str) -> None:
+    """Marca que a transação corrente alterou ``model`` da empresa no mês ``period`` (YYYY-MM)"""
+    session.info.setdefault(_TOUCHED_PERIODS_KEY, set()).add((model, str(company_id), period))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_touched_companies(session, flush_context):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        company_id = getattr(instance, "company_id", None)
+        if company_id is not None:
+            touch_company(session, type(instance), company_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_touched_companies(session):
+    touched = session.info.pop(_TOUCHED_KEY, None) or set()
+    touched_periods = session.info.pop(_TOUCHED_PERIODS_KEY, None) or set()
+    if not touched and not touched_periods:
+        return
+    for cache in _registry:
+        if cache.models:
+            companies = {company_id for model, company_id in touched if issubclass(model, cache.models)}
+            for company_id in companies:
+                cache.invalidate_company(company_id)
+        if cache.period_models:
+            periods = {
+                (company_id, period) for model, company_id, period in touched_periods
+                if issubclass(model, cache.period_models)
+            }
+            for company_id, period in periods:
+                cache.invalidate_period(company_id, period)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_touched_companies(session):
+    session.info.pop(_TOUCHED_KEY, None)
+    session.info.pop(_TOUCHED_PERIODS_KEY, None)
@@ -0,0 +1,88 @@
+import csv
+import enum
+import io
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+from ..models.financial import FinancialTransaction
+from ..schemas.financial import ExportFormat
+
+# Colunas exportadas, na ordem do arquivo
+EXPORT_COLUMNS = (
+    FinancialTransaction.id,
+    FinancialTransaction.due_date,
+    FinancialTransaction.payment_date,
+    FinancialTransaction.type,
+    FinancialTransaction.status,
+    FinancialTransaction.description,
+    FinancialTransaction.amount,
+    FinancialTransaction.account_id,
+    FinancialTransaction.category_id,
+    FinancialTransaction.cost_center_id,
+    FinancialTransaction.created_at,
+)
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+
+def _plain_value(value):
+    """Converte um valor do banco para texto/JSON sem passar por schemas"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def _encode_csv(header, batches) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_plain_value(v) for v in row] for row in rows)
+        yield buffer.getvalue()
+
+
+def _encode_ndjson(header, batches) -> Iterator[str]:
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(header, map(_plain_value, row))), ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+
+def stream_export(bind: Engine, statement: Select, export_format: ExportFormat, batch_size: int) -> Iterator[str]:
+    """Gera o arquivo de exportação lendo a consulta em lotes de um cursor no servidor.
+
+    Abre a própria conexão a partir de ``bind``, pois o gerador é consumido
+    depois que a sessão da requisição já foi encerrada. Cada lote é codificado
+    direto das tuplas do banco, de modo que a memória usada não depende do
+    número de linhas exportadas.
+
+    Args:
+        bind: Engine do banco de dados
+        statement: SELECT das colunas exportadas, já filtrado e ordenado
+        export_format: Formato do arquivo (CSV ou NDJSON)
+        batch_size: Linhas lidas do cursor por vez
+
+    Yields:
+        Trechos do arquivo, um por lote
+    """
+    encode = _encode_csv if export_format == ExportFormat.CSV else _encode_ndjson
+    with bind.connect() as connection:
+        result = connection.execution_options(
+            stream_results=True, yield_per=batch_size
+        ).execute(statement)
+        yield from encode(list(result.keys()), result.partitions())
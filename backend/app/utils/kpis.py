@@ -0,0 +1,247 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import func, case, and_, select
+from sqlalchemy.orm import Session
+from ..config.settings import settings
+from ..models.financial import FinancialTransaction, TransactionType, TransactionStatus, OPEN_STATUSES
+from ..models.customer import Customer
+from ..models.supplier import Supplier
+from ..models.invoice import Invoice
+from ..models.billing import Billing
+from .cache import CompanyCache, company_key
+from .periods import Granularity, add_months, period_key_expression, period_keys
+
+# KPIs por empresa e mês, descartados quando a empresa grava algum dos modelos
+kpi_cache = CompanyCache(
+    "dashboard_kpis",
+    maxsize=settings.KPI_CACHE_MAXSIZE,
+    ttl=settings.KPI_CACHE_TTL,
+    models=(FinancialTransaction, Customer, Supplier, Invoice, Billing)
+)
+
+
+def _conditional_sum(*conditions):
+    """Soma os valores das transações que atendem a todas as condições"""
+    return func.coalesce(
+        func.sum(case((and_(*conditions), FinancialTransaction.amount), else_=0)),
+        0
+    )
+
+
+def _count_for_company(model, company_id):
+    """Subconsulta escalar com o total de registros da empresa"""
+    return (
+        select(func.count(model.id))
+        .where(model.company_id == company_id)
+        .scalar_subquery()
+    )
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return Decimal('0')
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def calculate_variation(current, previous) -> float:
+    """Calcula a variação percentual entre dois períodos"""
+    if previous == 0:
+        return 100 if current > 0 else 0
+    return float((current - previous) / previous * 100)
+
+
+def compute_dashboard_kpis(db: Session, company_id, now: Optional[datetime] = None) -> dict:
+    """Calcula os KPIs do dashboard em uma única consulta.
+
+    Receitas, despesas, contas a receber/pagar e a projeção de 30 dias são
+    obtidas com agregações condicionais (tipo x status x período) em uma só
+    varredura de ``financial_transactions``; os contadores vêm como
+    subconsultas escalares na mesma instrução.
+
+    Args:
+        db: Sessão do banco de dados
+        company_id: Empresa dona dos dados
+        now: Data de referência (padrão: agora)
+
+    Returns:
+        Dict no formato da resposta de ``/dashboard/kpis``
+    """
+    now = now or datetime.now()
+
+    # Período atual (mês atual)
+    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end_of_month = (start_of_month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    # Período anterior (mês anterior)
+    start_of_prev_month = (start_of_month - timedelta(days=1)).replace(day=1)
+    end_of_prev_month = start_of_month - timedelta(days=1)
+
+    # Fluxo de caixa projetado (próximos 30 dias)
+    next_30_days = (now + timedelta(days=30)).date()
+
+    t = FinancialTransaction
+    income = t.type == TransactionType.INCOME
+    expense = t.type == TransactionType.EXPENSE
+    paid = t.status == TransactionStatus.PAID
+    pending = t.status.in_(OPEN_STATUSES)
+    current_period = t.payment_date.between(start_of_month.date(), end_of_month.date())
+    prev_period = t.payment_date.between(start_of_prev_month.date(), end_of_prev_month.date())
+    next_period = t.due_date <= next_30_days
+
+    # Clientes e fornecedores usam company_id String(36)
+    tenant = str(company_id)
+
+    query = (
+        select(
+            _conditional_sum(income, paid, current_period).label("current_income"),
+            _conditional_sum(income, paid, prev_period).label("prev_income"),
+            _conditional_sum(expense, paid, current_period).label("current_expenses"),
+            _conditional_sum(expense, paid, prev_period).label("prev_expenses"),
+            _conditional_sum(income, pending).label("accounts_receivable"),
+            _conditional_sum(expense, pending).label("accounts_payable"),
+            _conditional_sum(income, pending, next_period).label("projected_income"),
+            _conditional_sum(expense, pending, next_period).label("projected_expenses"),
+            _count_for_company(Customer, tenant).label("total_customers"),
+            _count_for_company(Supplier, tenant).label("total_suppliers"),
+            _count_for_company(Invoice, company_id).label("total_invoices"),
+            _count_for_company(Billing, company_id).label("total_billings"),
+        )
+        .select_from(t)
+        .where(
+            t.company_id == company_id,
+            t.status.in_((TransactionStatus.PAID,) + OPEN_STATUSES)
+        )
+    )
+    row = db.execute(query).one()
+
+    current_income = _to_decimal(row.current_income)
+    prev_income = _to_decimal(row.prev_income)
+    current_expenses = _to_decimal(row.current_expenses)
+    prev_expenses = _to_decimal(row.prev_expenses)
+    accounts_receivable = _to_decimal(row.accounts_receivable)
+    accounts_payable = _to_decimal(row.accounts_payable)
+    projected_cash_flow = _to_decimal(row.projected_income) - _to_decimal(row.projected_expenses)
+
+    # Lucro líquido
+    current_profit = current_income - current_expenses
+    prev_profit = prev_income - prev_expenses
+
+    # Margem líquida
+    current_margin = (current_profit / current_income * 100) if current_income > 0 else Decimal('0')
+    prev_margin = (prev_profit / prev_income * 100) if prev_income > 0 else Decimal('0')
+
+    return {
+        "financial_kpis": {
+            "revenue": {
+                "current": float(current_income),
+                "previous": float(prev_income),
+                "variation": calculate_variation(current_income, prev_income)
+            },
+            "expenses": {
+                "current": float(current_expenses),
+                "previous": float(prev_expenses),
+                "variation": calculate_variation(current_expenses, prev_expenses)
+            },
+            "profit": {
+                "current": float(current_profit),
+                "previous": float(prev_profit),
+                "variation": calculate_variation(current_profit, prev_profit)
+            },
+            "margin": {
+                "current": float(current_margin),
+                "previous": float(prev_margin),
+                "variation": float(current_margin - prev_margin)
+            },
+            "accounts_receivable": float(accounts_receivable),
+            "accounts_payable": float(accounts_payable),
+            "projected_cash_flow": float(projected_cash_flow)
+        },
+        "counters": {
+            "customers": row.total_customers or 0,
+            "suppliers": row.total_suppliers or 0,
+            "invoices": row.total_invoices or 0,
+            "billings": row.total_billings or 0
+        },
+        "period": {
+            "current_month": start_of_month.strftime("%Y-%m"),
+            "previous_month": start_of_prev_month.strftime("%Y-%m")
+        }
+    }
+
+
+def cached_dashboard_kpis(db: Session, company_id) -> dict:
+    """Retorna os KPIs do dashboard usando o cache por empresa e mês"""
+    now = datetime.now()
+    key = company_key(company_id, now.strftime("%Y-%m"))
+    return kpi_cache.get_or_compute(key, lambda: compute_dashboard_kpis(db, company_id, now))
+
+
+def compute_timeseries(
+    db: Session,
+    company_id,
+    months: int,
+    granularity: Granularity,
+    today: Optional[date] = None
+) -> dict:
+    """Série de receitas, despesas, lucro e margem dos últimos meses.
+
+    Os valores pagos são agrupados por período de ``payment_date`` em uma
+    única consulta; períodos sem movimento são preenchidos com zero em memória.
+
+    Args:
+        db: Sessão do banco de dados
+        company_id: Empresa dona dos dados
+        months: Quantidade de meses, incluindo o mês atual
+        granularity: Agrupamento por dia, semana ou mês
+        today: Data de referência (padrão: hoje)
+
+    Returns:
+        Dict com as chaves dos períodos e uma lista de valores por série
+    """
+    today = today or date.today()
+    start = add_months(today.replace(day=1), -(months - 1))
+    end = add_months(today.replace(day=1), 1) - timedelta(days=1)
+
+    t = FinancialTransaction
+    bucket = period_key_expression(db.get_bind().dialect.name, t.payment_date, granularity).label("bucket")
+    query = (
+        select(bucket, t.type, func.sum(t.amount))
+        .where(
+            t.company_id == company_id,
+            t.status == TransactionStatus.PAID,
+            t.payment_date >= start,
+            t.payment_date <= end
+        )
+        .group_by(bucket, t.type)
+    )
+
+    keys = period_keys(start, end, granularity)
+    index = {key: position for position, key in enumerate(keys)}
+    income = [0.0] * len(keys)
+    expense = [0.0] * len(keys)
+
+    for key, transaction_type, total in db.execute(query):
+        position = index.get(key)
+        if position is None:
+            continue
+        if TransactionType(transaction_type) == TransactionType.INCOME:
+            income[position] = float(total or 0)
+        else:
+            expense[position] = float(total or 0)
+
+    profit = [i - e for i, e in zip(income, expense)]
+    margin = [(p / i * 100) if i > 0 else 0.0 for p, i in zip(profit, income)]
+
+    return {
+        "granularity": granularity.value,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "periods": keys,
+        "income": income,
+        "expense": expense,
+        "profit": profit,
+        "margin": margin
+    }
@@ -0,0 +1,311 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from ..models.financial import (
+    FinancialAccount, FinancialTransaction, FinancialMonthlyRollup, CostCenterMonthlyRollup,
+    TransactionStatus, TransactionType
+)
+from .balances import apply_balance_deltas
+from .cache import touch_company, touch_period
+from .periods import month_key, period_key_expression
+
+
+class PaidIncome:
+    """Marcador para ``CompanyCache``: as receitas pagas da empresa mudaram.
+
+    Caches que dependem só dessas receitas (ex.: projeção de impostos) observam
+    este marcador em vez de ``FinancialTransaction``.
+    """
+
+
+class PaidTransactions:
+    """Marcador para caches por mês (``touch_period``): transações pagas do mês mudaram"""
+
+
+class TransactionState(NamedTuple):
+    """Fotografia dos campos de uma transação relevantes para os agregados"""
+    company_id: object
+    account_id: object
+    type: TransactionType
+    status: TransactionStatus
+    amount: Decimal
+    due_date: date
+    payment_date: Optional[date]
+    category_id: object = None
+    cost_center_id: object = None
+
+
+TransactionChange = Tuple[Optional[TransactionState], Optional[TransactionState]]
+
+
+def transaction_state(transaction: FinancialTransaction) -> TransactionState:
+    """Captura o estado atual de uma transação"""
+    return TransactionState(
+        company_id=transaction.company_id,
+        account_id=transaction.account_id,
+        type=TransactionType(transaction.type),
+        status=TransactionStatus(transaction.status or TransactionStatus.PENDING),
+        amount=Decimal(transaction.amount),
+        due_date=transaction.due_date,
+        payment_date=transaction.payment_date,
+        category_id=transaction.category_id,
+        cost_center_id=transaction.cost_center_id,
+    )
+
+
+def reference_date(state: TransactionState) -> date:
+    """Data que define o mês da transação nos agregados"""
+    if state.status == TransactionStatus.PAID and state.payment_date:
+        return state.payment_date
+    return state.due_date
+
+
+def rollup_key(state: TransactionState) -> tuple:
+    return (state.company_id, month_key(reference_date(state)), state.type, state.status)
+
+
+def cost_center_rollup_key(state: TransactionState) -> Optional[tuple]:
+    """Chave do realizado por centro de custo; ``None`` se a transação não entra nele"""
+    if state.status != TransactionStatus.PAID or state.cost_center_id is None or state.category_id is None:
+        return None
+    return (state.company_id, month_key(reference_date(state)), state.cost_center_id, state.category_id, state.type)
+
+
+def balance_effect(state: TransactionState) -> Decimal:
+    """Efeito da transação no saldo da conta: só transações pagas contam"""
+    if state.status != TransactionStatus.PAID:
+        return Decimal('0')
+    return state.amount if state.type == TransactionType.INCOME else -state.amount
+
+
+def record_transaction_changes(db: Session, changes: Iterable[TransactionChange]) -> None:
+    """Aplica aos agregados e saldos o efeito de transações criadas, alteradas ou removidas.
+
+    Além dos agregados mensais, mantém ``FinancialAccount.balance`` e os
+    snapshots de saldo sempre que uma transação paga entra, sai ou muda, e
+    marca os meses dessas transações pagas para os caches por mês.
+
+    Deve ser chamado na mesma transação de banco que alterou as linhas, antes
+    do commit.
+
+    Args:
+        db: Sessão do banco de dados
+        changes: Pares (estado anterior, estado novo); ``None`` indica que a
+            transação não existia antes ou deixou de existir
+    """
+    deltas: Dict[tuple, list] = defaultdict(lambda: [Decimal('0'), 0])
+    cost_center_deltas: Dict[tuple, list] = defaultdict(lambda: [Decimal('0'), 0])
+    balance_deltas: Dict[tuple, Decimal] = defaultdict(Decimal)
+    balance_companies = set()
+    paid_periods = set()
+
+    for before, after in changes:
+        if before == after:
+            continue
+        # Meses com transações pagas alteradas (inclui troca de categoria ou centro de custo)
+        for state in (before, after):
+            if state is not None and state.status == TransactionStatus.PAID:
+                paid_periods.add((state.company_id, month_key(reference_date(state))))
+        if before is not None:
+            delta = deltas[rollup_key(before)]
+            delta[0] -= before.amount
+            delta[1] -= 1
+            cost_center_key = cost_center_rollup_key(before)
+            if cost_center_key:
+                delta = cost_center_deltas[cost_center_key]
+                delta[0] -= before.amount
+                delta[1] -= 1
+            effect = balance_effect(before)
+            if effect:
+                balance_deltas[(before.company_id, before.account_id, reference_date(before))] -= effect
+                balance_companies.add(before.company_id)
+        if after is not None:
+            delta = deltas[rollup_key(after)]
+            delta[0] += after.amount
+            delta[1] += 1
+            cost_center_key = cost_center_rollup_key(after)
+            if cost_center_key:
+                delta = cost_center_deltas[cost_center_key]
+                delta[0] += after.amount
+                delta[1] += 1
+            effect = balance_effect(after)
+            if effect:
+                balance_deltas[(after.company_id, after.account_id, reference_date(after))] += effect
+                balance_companies.add(after.company_id)
+
+    rows = [
+        {
+            "company_id": key[0],
+            "period": key[1],
+            "type": key[2],
+            "status": key[3],
+            "total_amount": amount,
+            "transaction_count": count,
+        }
+        for key, (amount, count) in deltas.items()
+        if amount or count
+    ]
+    if rows:
+        _apply_rollup_deltas(db, FinancialMonthlyRollup.__table__, _ROLLUP_KEYS, rows)
+        for company_id in {
+            row["company_id"] for row in rows
+            if row["type"] == TransactionType.INCOME and row["status"] == TransactionStatus.PAID
+        }:
+            touch_company(db, PaidIncome, company_id)
+
+    cost_center_rows = [
+        dict(zip(_COST_CENTER_ROLLUP_KEYS, key), total_amount=amount, transaction_count=count)
+        for key, (amount, count) in cost_center_deltas.items()
+        if amount or count
+    ]
+    if cost_center_rows:
+        _apply_rollup_deltas(db, CostCenterMonthlyRollup.__table__, _COST_CENTER_ROLLUP_KEYS, cost_center_rows)
+
+    for company_id, period in paid_periods:
+        touch_period(db, PaidTransactions, company_id, period)
+
+    balance_deltas = {key: amount for key, amount in balance_deltas.items() if amount}
+    if balance_deltas:
+        apply_balance_deltas(db, balance_deltas)
+        # UPDATE direto no Core não passa pelo flush do ORM
+        for company_id in balance_companies:
+            touch_company(db, FinancialAccount, company_id)
+
+
+# Colunas da chave de cada tabela de agregados, na ordem das chaves dos deltas
+_ROLLUP_KEYS = ("company_id", "period", "type", "status")
+_COST_CENTER_ROLLUP_KEYS = ("company_id", "period", "cost_center_id", "category_id", "type")
+
+
+def _apply_rollup_deltas(db: Session, table, key_columns: Tuple[str, ...], rows: list) -> None:
+    """Soma os deltas às linhas de uma tabela de agregados (upsert pela chave)"""
+    dialect_name = db.get_bind().dialect.name
+
+    if dialect_name in ("postgresql", "sqlite"):
+        if dialect_name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        stmt = dialect_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[column] for column in key_columns],
+            set_={
+                "total_amount": table.c.total_amount + stmt.excluded.total_amount,
+                "transaction_count": table.c.transaction_count + stmt.excluded.transaction_count,
+                "updated_at": func.now(),
+            }
+        )
+        db.execute(stmt)
+        return
+
+    for row in rows:
+        result = db.execute(
+            update(table)
+            .where(*[table.c[column] == row[column] for column in key_columns])
+            .values(
+                total_amount=table.c.total_amount + row["total_amount"],
+                transaction_count=table.c.transaction_count + row["transaction_count"],
+            )
+        )
+        if result.rowcount == 0:
+            db.execute(insert(table).values(**row))
+
+
+def rebuild_monthly_rollups(db: Session, company_id=None) -> int:
+    """Recalcula ``financial_monthly_rollups`` a partir das transações.
+
+    Usado em cargas retroativas ou para corrigir divergências. Não faz commit.
+
+    Args:
+        db: Sessão do banco de dados
+        company_id: Restringe a reconstrução a uma empresa (padrão: todas)
+
+    Returns:
+        Número de linhas de agregado geradas
+    """
+    t = FinancialTransaction
+    table = FinancialMonthlyRollup.__table__
+    dialect_name = db.get_bind().dialect.name
+
+    ref_date = case(
+        ((t.status == TransactionStatus.PAID) & t.payment_date.isnot(None), t.payment_date),
+        else_=t.due_date
+    )
+    period = period_key_expression(dialect_name, ref_date)
+
+    source = (
+        select(
+            t.company_id,
+            period.label("period"),
+            t.type,
+            t.status,
+            func.sum(t.amount),
+            func.count(t.id),
+        )
+        .group_by(t.company_id, period, t.type, t.status)
+    )
+
+    clear = delete(table)
+    if company_id is not None:
+        source = source.where(t.company_id == company_id)
+        clear = clear.where(table.c.company_id == company_id)
+
+    db.execute(clear)
+    result = db.execute(
+        insert(table).from_select(
+            ["company_id", "period", "type", "status", "total_amount", "transaction_count"],
+            source
+        )
+    )
+    return result.rowcount
+
+
+def rebuild_cost_center_rollups(db: Session, company_id=None) -> int:
+    """Recalcula ``cost_center_monthly_rollups`` a partir das transações pagas.
+
+    Não faz commit.
+
+    Args:
+        db: Sessão do banco de dados
+        company_id: Restringe a reconstrução a uma empresa (padrão: todas)
+
+    Returns:
+        Número de linhas de agregado geradas
+    """
+    t = FinancialTransaction
+    table = CostCenterMonthlyRollup.__table__
+    # Mesmo mês de ``reference_date`` para transações pagas
+    period = period_key_expression(db.get_bind().dialect.name, func.coalesce(t.payment_date, t.due_date))
+
+    source = (
+        select(
+            t.company_id,
+            period.label("period"),
+            t.cost_center_id,
+            t.category_id,
+            t.type,
+            func.sum(t.amount),
+            func.count(t.id),
+        )
+        .where(
+            t.status == TransactionStatus.PAID,
+            t.cost_center_id.isnot(None),
+            t.category_id.isnot(None),
+        )
+        .group_by(t.company_id, period, t.cost_center_id, t.category_id, t.type)
+    )
+
+    clear = delete(table)
+    if company_id is not None:
+        source = source.where(t.company_id == company_id)
+        clear = clear.where(table.c.company_id == company_id)
+
+    db.execute(clear)
+    result = db.execute(
+        insert(table).from_select(_COST_CENTER_ROLLUP_KEYS + ("total_amount", "transaction_count"), source)
+    )
+    return result.rowcount
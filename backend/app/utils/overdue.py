@@ -0,0 +1,85 @@
+from datetime import date
+from typing import Optional, Set, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, sessionmaker
+from ..config.database import SessionLocal
+from ..models.financial import FinancialTransaction, TransactionStatus
+from .broadcast import kpi_broadcaster
+from .cache import touch_company
+from .ledger import TransactionState, record_transaction_changes
+from .scheduler import job_lock
+
+JOB_NAME = "overdue_sweep"
+
+_table = FinancialTransaction.__table__
+
+# Colunas na ordem de ``TransactionState``
+_STATE_COLUMNS = (
+    _table.c.company_id, _table.c.account_id, _table.c.type, _table.c.status, _table.c.amount,
+    _table.c.due_date, _table.c.payment_date, _table.c.category_id, _table.c.cost_center_id,
+)
+
+_ID_CHUNK_SIZE = 500
+
+
+def sweep_overdue(db: Session, today: Optional[date] = None) -> Tuple[int, Set]:
+    """Marca como vencidas todas as transações pendentes com vencimento passado.
+
+    Um único UPDATE para todas as empresas (índice ``status, due_date``); com
+    RETURNING as linhas alteradas voltam na mesma instrução para ajustar os
+    agregados. Sem RETURNING, as linhas são lidas antes e atualizadas por id.
+    Não faz commit.
+
+    Args:
+        db: Sessão do banco de dados
+        today: Data de referência (padrão: hoje)
+
+    Returns:
+        Tupla (linhas alteradas, empresas afetadas)
+    """
+    today = today or date.today()
+    overdue = (_table.c.status == TransactionStatus.PENDING) & (_table.c.due_date < today)
+    stmt = update(_table).values(status=TransactionStatus.OVERDUE)
+
+    if db.get_bind().dialect.update_returning:
+        rows = db.execute(stmt.where(overdue).returning(*_STATE_COLUMNS)).all()
+    else:
+        selected = db.execute(
+            select(_table.c.id, *_STATE_COLUMNS).where(overdue).with_for_update()
+        ).all()
+        ids = [row[0] for row in selected]
+        for start in range(0, len(ids), _ID_CHUNK_SIZE):
+            db.execute(stmt.where(_table.c.id.in_(ids[start:start + _ID_CHUNK_SIZE])))
+        rows = [row[1:] for row in selected]
+
+    changes = []
+    companies = set()
+    for row in rows:
+        after = TransactionState(*row)._replace(status=TransactionStatus.OVERDUE)
+        changes.append((after._replace(status=TransactionStatus.PENDING), after))
+        companies.add(after.company_id)
+
+    record_transaction_changes(db, changes)
+    for company_id in companies:
+        touch_company(db, FinancialTransaction, company_id)
+    return len(rows), companies
+
+
+def run_overdue_sweep(session_factory: sessionmaker = SessionLocal) -> Optional[int]:
+    """Job do agendador: executa a varredura se nenhum outro worker estiver nela"""
+    db = session_factory()
+    try:
+        with job_lock(db, JOB_NAME) as acquired:
+            if not acquired:
+                return None
+            changed, companies = sweep_overdue(db)
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    for company_id in companies:
+        kpi_broadcaster.publish(company_id)
+    return changed
@@ -0,0 +1,149 @@
+import base64
+import binascii
+import enum
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, NamedTuple, Optional, Sequence
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+NEXT = "next"
+PREV = "prev"
+
+
+class Page(NamedTuple):
+    items: List
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def _decode_value(column, raw):
+    if raw is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(raw)
+    if python_type is date:
+        return date.fromisoformat(raw)
+    if python_type is uuid.UUID:
+        return uuid.UUID(raw)
+    if python_type is Decimal:
+        return Decimal(raw)
+    return python_type(raw)
+
+
+def encode_cursor(values: Sequence, direction: str) -> str:
+    """Gera um cursor opaco a partir dos valores da chave de ordenação"""
+    payload = json.dumps({"k": [_encode_value(v) for v in values], "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> tuple:
+    """Decodifica um cursor, retornando (valores da chave, direção)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        raw_values = payload["k"]
+        direction = payload["d"]
+        if direction not in (NEXT, PREV) or len(raw_values) != len(columns):
+            raise ValueError("cursor mismatch")
+        values = tuple(_decode_value(column, raw) for column, raw in zip(columns, raw_values))
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return values, direction
+
+
+def keyset_query(
+    query: Query,
+    columns: Sequence,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False
+) -> tuple:
+    """Aplica filtro de cursor, ORDER BY e LIMIT de uma página keyset.
+
+    Returns:
+        Tupla (consulta, direção do cursor)
+    """
+    direction = NEXT
+    key = tuple_(*columns)
+    if cursor:
+        values, direction = decode_cursor(cursor, columns)
+        # Avança na ordem da listagem (NEXT) ou volta na ordem inversa (PREV)
+        after = (direction == NEXT) != descending
+        query = query.filter(key > tuple_(*values) if after else key < tuple_(*values))
+
+    reverse = (direction == PREV) != descending
+    query = query.order_by(*[c.desc() if reverse else c.asc() for c in columns])
+    return query.limit(limit + 1), direction
+
+
+def keyset_paginate(
+    query: Query,
+    columns: Sequence,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False
+) -> Page:
+    """Pagina uma consulta por chave (keyset) em vez de OFFSET.
+
+    A ordenação usa ``columns`` (a última deve ser única, ex.: ``id``) e o
+    cursor guarda os valores da chave da borda da página, de modo que o custo
+    de cada página não depende da sua profundidade.
+
+    Args:
+        query: Consulta já filtrada, sem ORDER BY/LIMIT
+        columns: Colunas da chave de ordenação
+        cursor: Cursor recebido do cliente (``None`` para a primeira página)
+        limit: Tamanho da página
+        descending: Ordena a chave de forma decrescente
+
+    Returns:
+        Page com os itens e os cursores da próxima e da página anterior
+    """
+    query, direction = keyset_query(query, columns, cursor, limit, descending)
+    rows = query.all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == PREV:
+        rows.reverse()
+
+    if not rows:
+        return Page(items=[], next_cursor=None, prev_cursor=None)
+
+    def key_of(item):
+        return [getattr(item, column.key) for column in columns]
+
+    if direction == NEXT:
+        next_cursor = encode_cursor(key_of(rows[-1]), NEXT) if has_more else None
+        prev_cursor = encode_cursor(key_of(rows[0]), PREV) if cursor else None
+    else:
+        next_cursor = encode_cursor(key_of(rows[-1]), NEXT)
+        prev_cursor = encode_cursor(key_of(rows[0]), PREV) if has_more else None
+
+    return Page(items=rows, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
+def set_page_headers(response: Response, page: Page) -> None:
+    """Expõe os cursores da página nos cabeçalhos da resposta"""
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if page.prev_cursor:
+        response.headers["X-Prev-Cursor"] = page.prev_cursor
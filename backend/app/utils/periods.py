@@ -0,0 +1,70 @@
+import enum
+from datetime import date, timedelta
+from typing import List
+from sqlalchemy import Integer, cast, func
+
+
+class Granularity(str, enum.Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+def add_months(value: date, months: int) -> date:
+    """Soma meses a uma data, mantendo o dia 1"""
+    month_index = value.year * 12 + value.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def month_key(value: date) -> str:
+    """Retorna a chave do mês (YYYY-MM) de uma data"""
+    return value.strftime("%Y-%m")
+
+
+def period_start(value: date, granularity: Granularity) -> date:
+    """Primeiro dia do período (dia, semana ISO ou mês) que contém a data"""
+    if granularity == Granularity.MONTH:
+        return value.replace(day=1)
+    if granularity == Granularity.WEEK:
+        return value - timedelta(days=value.weekday())
+    return value
+
+
+def period_key(value: date, granularity: Granularity) -> str:
+    """Chave do período: YYYY-MM para mês, YYYY-MM-DD do início para dia/semana"""
+    if granularity == Granularity.MONTH:
+        return month_key(value)
+    return period_start(value, granularity).isoformat()
+
+
+def period_keys(start: date, end: date, granularity: Granularity) -> List[str]:
+    """Lista ordenada das chaves de todos os períodos entre duas datas"""
+    keys = []
+    current = period_start(start, granularity)
+    while current <= end:
+        keys.append(period_key(current, granularity))
+        if granularity == Granularity.MONTH:
+            current = add_months(current, 1)
+        elif granularity == Granularity.WEEK:
+            current += timedelta(days=7)
+        else:
+            current += timedelta(days=1)
+    return keys
+
+
+def period_key_expression(dialect_name: str, column, granularity: Granularity = Granularity.MONTH):
+    """Expressão SQL equivalente a ``period_key`` para uma coluna de data"""
+    if dialect_name == "sqlite":
+        if granularity == Granularity.MONTH:
+            return func.strftime("%Y-%m", column)
+        if granularity == Granularity.WEEK:
+            # Recua até a segunda-feira: %w vai de 0 (domingo) a 6
+            days_back = (cast(func.strftime("%w", column), Integer) + 6) % 7
+            return func.date(column, func.printf("-%d days", days_back))
+        return func.strftime("%Y-%m-%d", column)
+
+    if granularity == Granularity.MONTH:
+        return func.to_char(column, "YYYY-MM")
+    if granularity == Granularity.WEEK:
+        return func.to_char(func.date_trunc("week", column), "YYYY-MM-DD")
+    return func.to_char(column, "YYYY-MM-DD")
@@ -0,0 +1,274 @@
+import logging
+import re
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+from ..config.database import SessionLocal
+from ..models.financial import FinancialTransaction, TransactionType, OPEN_STATUSES
+from ..models.integrations import (
+    BankReconciliation, BankStatementLine, MatchStatus, ReconciliationMatch, ReconciliationStatus
+)
+
+# Candidatos avaliados por linha quando há muitos lançamentos iguais
+MAX_CANDIDATES = 50
+
+# Pesos da pontuação: valor, data e descrição
+_AMOUNT_WEIGHT = 0.5
+_DATE_WEIGHT = 0.35
+_TEXT_WEIGHT = 0.15
+
+_WORD = re.compile(r"\w+")
+
+logger = logging.getLogger(__name__)
+
+
+class StatementEntry(NamedTuple):
+    id: str
+    line_number: int
+    posted_date: date
+    cents: int  # Positivo: crédito; negativo: débito
+    description: Optional[str]
+
+
+class CandidateTransaction(NamedTuple):
+    id: uuid.UUID
+    due_date: date
+    cents: int  # Receitas positivas, despesas negativas (mesmo sinal do extrato)
+    description: Optional[str]
+
+
+class Match(NamedTuple):
+    line: StatementEntry
+    transaction: CandidateTransaction
+    score: float
+    exact: bool
+    candidates: int
+
+
+def _to_cents(value) -> int:
+    return int((Decimal(str(value or 0)) * 100).to_integral_value())
+
+
+def _words(text: Optional[str]) -> frozenset:
+    return frozenset(_WORD.findall((text or "").lower()))
+
+
+class TransactionIndex:
+    """Transações candidatas indexadas por valor em centavos.
+
+    Cada valor aponta para as transações ordenadas por vencimento, de modo que
+    a busca de uma linha do extrato é uma consulta ao dicionário (valor exato)
+    ou um ``bisect`` nas chaves ordenadas (tolerância de valor), seguida de um
+    ``bisect`` nas datas — sem comparar cada linha com cada transação.
+    """
+
+    def __init__(self, transactions: Sequence[CandidateTransaction]):
+        buckets = defaultdict(list)
+        for transaction in sorted(transactions, key=lambda t: (t.cents, t.due_date, str(t.id))):
+            buckets[transaction.cents].append(transaction)
+        self.buckets: Dict[int, List[CandidateTransaction]] = dict(buckets)
+        self.dates = {cents: [t.due_date.toordinal() for t in bucket] for cents, bucket in self.buckets.items()}
+        self.keys = sorted(self.buckets)
+        self.used = set()
+
+    def candidates(self, cents: int, posted_date: date, date_tolerance: int, amount_tolerance: int) -> List[CandidateTransaction]:
+        """Transações ainda livres no valor (± tolerância) e na janela de datas"""
+        if amount_tolerance:
+            keys = self.keys[bisect_left(self.keys, cents - amount_tolerance):bisect_right(self.keys, cents + amount_tolerance)]
+        else:
+            keys = [cents] if cents in self.buckets else []
+
+        day = posted_date.toordinal()
+        found = []
+        for key in keys:
+            dates = self.dates[key]
+            bucket = self.buckets[key]
+            for index in range(bisect_left(dates, day - date_tolerance), bisect_right(dates, day + date_tolerance)):
+                if bucket[index].id not in self.used:
+                    found.append(bucket[index])
+                    if len(found) >= MAX_CANDIDATES:
+                        return found
+        return found
+
+
+def _score(line: StatementEntry, transaction: CandidateTransaction, line_words: frozenset, date_tolerance: int, amount_tolerance: int) -> float:
+    amount_score = 1 - abs(line.cents - transaction.cents) / (amount_tolerance + 1)
+    date_score = 1 - abs((line.posted_date - transaction.due_date).days) / (date_tolerance + 1)
+    transaction_words = _words(transaction.description)
+    union = line_words | transaction_words
+    text_score = len(line_words & transaction_words) / len(union) if union else 0
+    return _AMOUNT_WEIGHT * amount_score + _DATE_WEIGHT * date_score + _TEXT_WEIGHT * text_score
+
+
+def match_statement_lines(
+    lines: Sequence[StatementEntry],
+    transactions: Sequence[CandidateTransaction],
+    date_tolerance: int,
+    amount_tolerance: int
+) -> Tuple[List[Match], List[StatementEntry]]:
+    """Associa linhas do extrato a transações em aberto (cada transação no máximo uma vez).
+
+    A primeira passada aceita só valores exatos; a segunda tenta as linhas
+    restantes com a tolerância de valor. Havendo mais de um candidato, vence
+    a maior pontuação (valor, distância de datas e palavras em comum na
+    descrição).
+
+    Args:
+        lines: Linhas do extrato, na ordem do arquivo
+        transactions: Transações candidatas
+        date_tolerance: Dias de diferença aceitos entre lançamento e vencimento
+        amount_tolerance: Centavos de diferença aceitos na segunda passada
+
+    Returns:
+        Tupla (associações, linhas sem correspondência)
+    """
+    index = TransactionIndex(transactions)
+    matches = {}
+    passes = (0, amount_tolerance) if amount_tolerance else (0,)
+
+    for tolerance in passes:
+        for line in lines:
+            if line.id in matches:
+                continue
+            candidates = index.candidates(line.cents, line.posted_date, date_tolerance, tolerance)
+            if not candidates:
+                continue
+            line_words = _words(line.description)
+            score, _, best = max(
+                (
+                    _score(line, transaction, line_words, date_tolerance, amount_tolerance),
+                    -abs((line.posted_date - transaction.due_date).days),
+                    transaction,
+                )
+                for transaction in candidates
+            )
+            index.used.add(best.id)
+            matches[line.id] = Match(
+                line=line,
+                transaction=best,
+                score=round(score, 4),
+                exact=best.cents == line.cents,
+                candidates=len(candidates),
+            )
+
+    ordered = [matches[line.id] for line in lines if line.id in matches]
+    unmatched = [line for line in lines if line.id not in matches]
+    return ordered, unmatched
+
+
+def _load_lines(db: Session, reconciliation: BankReconciliation) -> List[StatementEntry]:
+    table = BankStatementLine.__table__
+    rows = db.execute(
+        select(table.c.id, table.c.line_number, table.c.posted_date, table.c.amount, table.c.description)
+        .where(table.c.reconciliation_id == reconciliation.id)
+        .order_by(table.c.line_number)
+    )
+    return [
+        StatementEntry(id, line_number, posted_date, _to_cents(amount), description)
+        for id, line_number, posted_date, amount, description in rows
+    ]
+
+
+def _load_candidates(db: Session, reconciliation: BankReconciliation, start: date, end: date) -> List[CandidateTransaction]:
+    """Transações em aberto da conta na janela de vencimentos, numa única consulta"""
+    table = FinancialTransaction.__table__
+    rows = db.execute(
+        select(table.c.id, table.c.type, table.c.amount, table.c.due_date, table.c.description).where(
+            table.c.company_id == uuid.UUID(reconciliation.company_id),
+            table.c.account_id == uuid.UUID(reconciliation.account_id),
+            table.c.status.in_(OPEN_STATUSES),
+            table.c.due_date.between(start, end),
+        )
+    )
+    return [
+        CandidateTransaction(id, due_date, _to_cents(amount) if type == TransactionType.INCOME else -_to_cents(amount), description)
+        for id, type, amount, due_date, description in rows
+    ]
+
+
+def reconcile_statement(
+    db: Session,
+    reconciliation: BankReconciliation,
+    date_tolerance: int,
+    amount_tolerance: int,
+    batch_size: int
+) -> int:
+    """Concilia as linhas importadas e grava uma linha de resultado por linha do extrato.
+
+    Os resultados anteriores da importação são substituídos. Não faz commit.
+
+    Returns:
+        Quantidade de linhas conciliadas
+    """
+    lines = _load_lines(db, reconciliation)
+    transactions = []
+    if lines:
+        window = timedelta(days=date_tolerance)
+        start = min(line.posted_date for line in lines) - window
+        end = max(line.posted_date for line in lines) + window
+        transactions = _load_candidates(db, reconciliation, start, end)
+
+    matches, unmatched = match_statement_lines(lines, transactions, date_tolerance, amount_tolerance)
+
+    table = ReconciliationMatch.__table__
+    db.execute(delete(table).where(table.c.reconciliation_id == reconciliation.id))
+
+    def base(line: StatementEntry) -> dict:
+        return {
+            "id": str(uuid.uuid4()),
+            "reconciliation_id": reconciliation.id,
+            "company_id": reconciliation.company_id,
+            "line_id": line.id,
+            "line_number": line.line_number,
+        }
+
+    rows = [
+        dict(base(match.line), transaction_id=match.transaction.id, status=MatchStatus.MATCHED,
+             score=match.score, exact=match.exact, candidates=match.candidates)
+        for match in matches
+    ] + [
+        dict(base(line), transaction_id=None, status=MatchStatus.UNMATCHED,
+             score=None, exact=False, candidates=0)
+        for line in unmatched
+    ]
+    stmt = insert(table)
+    for offset in range(0, len(rows), batch_size):
+        db.execute(stmt, rows[offset:offset + batch_size])
+
+    # Resultados agora ficam em reconciliation_matches
+    reconciliation.reconciled_transactions = None
+    reconciliation.unreconciled_transactions = None
+    return len(matches)
+
+
+def run_reconciliation(
+    reconciliation_id: str,
+    date_tolerance: int,
+    amount_tolerance: int,
+    batch_size: int,
+    session_factory: sessionmaker = SessionLocal
+) -> None:
+    """Tarefa em segundo plano: concilia um extrato já importado"""
+    db = session_factory()
+    try:
+        reconciliation = db.get(BankReconciliation, reconciliation_id)
+        if reconciliation is None or reconciliation.status != ReconciliationStatus.PROCESSING:
+            return
+        try:
+            reconcile_statement(db, reconciliation, date_tolerance, amount_tolerance, batch_size)
+            reconciliation.status = ReconciliationStatus.COMPLETED
+            reconciliation.error_message = None
+            db.commit()
+        except Exception as error:
+            logger.exception("Conciliação %s falhou", reconciliation_id)
+            db.rollback()
+            reconciliation.status = ReconciliationStatus.FAILED
+            reconciliation.error_message = str(error) or error.__class__.__name__
+            db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,229 @@
+import calendar
+import logging
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import bindparam, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+from ..config.database import SessionLocal
+from ..config.settings import settings
+from ..models.financial import FinancialTransaction, TransactionStatus, TransactionType
+from ..models.sales import Recurrence, RecurrenceFrequency, RecurrenceType
+from .broadcast import kpi_broadcaster
+from .periods import add_months
+from .scheduler import job_lock
+from .transactions import REFERENCES, insert_transactions, owned_ids
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "recurrences"
+
+_recurrences = Recurrence.__table__
+
+
+def _step(current: date, frequency: RecurrenceFrequency, anchor_day: int) -> date:
+    """Próxima ocorrência; mensal/anual mantêm o dia de início (limitado ao fim do mês)"""
+    if frequency == RecurrenceFrequency.DAILY:
+        return current + timedelta(days=1)
+    if frequency == RecurrenceFrequency.WEEKLY:
+        return current + timedelta(days=7)
+    first = add_months(current, 12 if frequency == RecurrenceFrequency.YEARLY else 1)
+    last_day = calendar.monthrange(first.year, first.month)[1]
+    return first.replace(day=min(anchor_day, last_day))
+
+
+def expand_occurrences(
+    next_occurrence: date,
+    frequency: RecurrenceFrequency,
+    start_date: date,
+    end_date: Optional[date],
+    horizon: date
+) -> Tuple[List[date], date]:
+    """Datas de ocorrência até o horizonte e a próxima ocorrência depois dele"""
+    limit = min(horizon, end_date) if end_date else horizon
+    occurrences = []
+    current = next_occurrence
+    while current <= limit:
+        occurrences.append(current)
+        current = _step(current, RecurrenceFrequency(frequency), start_date.day)
+    return occurrences, current
+
+
+def _template(details) -> Optional[dict]:
+    """Campos da transação a partir de ``Recurrence.details`` (None se inválido)"""
+    try:
+        return {
+            "description": str(details["description"]),
+            "amount": Decimal(str(details["amount"])),
+            "type": TransactionType(details["type"]),
+            "account_id": uuid.UUID(str(details["account_id"])),
+            "category_id": uuid.UUID(str(details["category_id"])) if details.get("category_id") else None,
+            "cost_center_id": uuid.UUID(str(details["cost_center_id"])) if details.get("cost_center_id") else None,
+        }
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        return None
+
+
+def _foreign_references(db: Session, templates: list) -> set:
+    """Recorrências do lote cujo modelo aponta para cadastros de outra empresa.
+
+    As referências (conta, categoria e centro de custo) são conferidas com uma
+    consulta por empresa e tabela, como em ``validate_transaction_batch``.
+    """
+    by_company = {}
+    for recurrence, template in templates:
+        by_company.setdefault(recurrence.company_id, []).append((recurrence, template))
+
+    foreign = set()
+    for company_id, items in by_company.items():
+        for field, model in REFERENCES.items():
+            owned = owned_ids(db, model, company_id, (template[field] for _, template in items))
+            foreign.update(
+                recurrence.id for recurrence, template in items
+                if template[field] is not None and template[field] not in owned
+            )
+    return foreign
+
+
+def _chunks(rows: list, size: int) -> Iterator[list]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def materialize_recurrences(db: Session, horizon: Optional[date] = None, batch_size: Optional[int] = None) -> dict:
+    """Gera as transações de todas as recorrências com ocorrências até o horizonte.
+
+    Uma consulta busca as recorrências pendentes; as ocorrências são expandidas
+    em memória e, a cada lote, as referências do modelo são conferidas contra a
+    empresa da recorrência, as já existentes são descartadas com uma consulta
+    no índice único (recurrence_id, due_date), as novas são inseridas com
+    executemany e ``next_occurrence`` avança com um UPDATE em lote. Rodar de
+    novo após uma falha não duplica transações. Não faz commit.
+
+    O ``details`` da recorrência é o modelo da transação: ``description``,
+    ``amount``, ``type``, ``account_id`` e, opcionalmente, ``category_id`` e
+    ``cost_center_id``. Recorrências com ``details`` inválido ou que apontam
+    para cadastros de outra empresa são contadas em ``invalid``, não geram
+    transações e têm ``next_occurrence`` avançado até depois do horizonte.
+
+    Args:
+        db: Sessão do banco de dados
+        horizon: Última data a materializar (padrão: hoje + RECURRENCE_HORIZON_DAYS)
+        batch_size: Recorrências por lote (padrão: RECURRENCE_BATCH_SIZE)
+
+    Returns:
+        Dict com ``recurrences``, ``created``, ``existing``, ``invalid`` e ``companies``
+    """
+    horizon = horizon or date.today() + timedelta(days=settings.RECURRENCE_HORIZON_DAYS)
+    batch_size = batch_size or settings.RECURRENCE_BATCH_SIZE
+    r = _recurrences
+    t = FinancialTransaction
+
+    due = db.execute(
+        select(r.c.id, r.c.company_id, r.c.frequency, r.c.start_date, r.c.end_date, r.c.next_occurrence, r.c.details)
+        .where(
+            r.c.type == RecurrenceType.FINANCIAL_TRANSACTION,
+            r.c.next_occurrence <= horizon,
+            or_(r.c.end_date.is_(None), r.c.next_occurrence <= r.c.end_date)
+        )
+        .order_by(r.c.id)
+    ).all()
+
+    stats = {"recurrences": len(due), "created": 0, "existing": 0, "invalid": 0, "companies": set()}
+    advance = update(r).where(r.c.id == bindparam("recurrence_id")).values(next_occurrence=bindparam("next_date"))
+
+    for batch in _chunks(due, batch_size):
+        templates = []
+        skipped = []
+        for recurrence in batch:
+            template = _template(recurrence.details or {})
+            if template is None:
+                logger.warning("Recorrência %s com details inválido", recurrence.id)
+                skipped.append(recurrence)
+                continue
+            templates.append((recurrence, template))
+
+        foreign = _foreign_references(db, templates)
+        expanded = []
+        for recurrence, template in templates:
+            if recurrence.id in foreign:
+                logger.warning("Recorrência %s referencia cadastros de outra empresa", recurrence.id)
+                skipped.append(recurrence)
+                continue
+            occurrences, next_date = expand_occurrences(
+                recurrence.next_occurrence, recurrence.frequency, recurrence.start_date, recurrence.end_date, horizon
+            )
+            expanded.append((recurrence, template, occurrences, next_date))
+
+        # Recorrências puladas também avançam até o horizonte, para não serem
+        # buscadas (e registradas no log) de novo a cada execução
+        stats["invalid"] += len(skipped)
+        if skipped:
+            db.execute(advance, [
+                {
+                    "recurrence_id": recurrence.id,
+                    "next_date": expand_occurrences(
+                        recurrence.next_occurrence, recurrence.frequency, recurrence.start_date,
+                        recurrence.end_date, horizon
+                    )[1],
+                }
+                for recurrence in skipped
+            ])
+        if not expanded:
+            continue
+
+        existing = set(db.execute(
+            select(t.recurrence_id, t.due_date).where(
+                t.recurrence_id.in_([recurrence.id for recurrence, _, _, _ in expanded]),
+                t.due_date >= min(recurrence.next_occurrence for recurrence, _, _, _ in expanded),
+                t.due_date <= horizon
+            )
+        ).all())
+
+        rows = []
+        for recurrence, template, occurrences, _ in expanded:
+            for due_date in occurrences:
+                if (recurrence.id, due_date) in existing:
+                    stats["existing"] += 1
+                    continue
+                rows.append(dict(
+                    template,
+                    id=uuid.uuid4(),
+                    company_id=recurrence.company_id,
+                    due_date=due_date,
+                    status=TransactionStatus.PENDING,
+                    payment_date=None,
+                    is_recurring=True,
+                    recurrence_id=recurrence.id,
+                ))
+
+        insert_transactions(db, rows)
+        db.execute(advance, [
+            {"recurrence_id": recurrence.id, "next_date": next_date}
+            for recurrence, _, _, next_date in expanded
+        ])
+        stats["created"] += len(rows)
+        stats["companies"].update(row["company_id"] for row in rows)
+
+    return stats
+
+
+def run_materialize_recurrences(session_factory: sessionmaker = SessionLocal) -> Optional[int]:
+    """Job do agendador: materializa as recorrências se nenhum outro worker estiver nisso"""
+    db = session_factory()
+    try:
+        with job_lock(db, JOB_NAME) as acquired:
+            if not acquired:
+                return None
+            stats = materialize_recurrences(db)
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    for company_id in stats["companies"]:
+        kpi_broadcaster.publish(company_id)
+    return stats["created"]
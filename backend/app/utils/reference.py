@@ -0,0 +1,66 @@
+import hashlib
+import json
+from typing import Callable, List, Optional, Tuple
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from ..config.settings import settings
+from ..models.financial import FinancialAccount, FinancialCategory, CostCenter
+from .cache import CompanyCache, company_key
+
+
+def _reference_cache(name: str, model) -> CompanyCache:
+    return CompanyCache(
+        name,
+        maxsize=settings.REFERENCE_CACHE_MAXSIZE,
+        ttl=settings.REFERENCE_CACHE_TTL,
+        models=(model,)
+    )
+
+
+# Listas de cadastro por empresa, descartadas a cada gravação do próprio modelo
+accounts_cache = _reference_cache("reference_accounts", FinancialAccount)
+categories_cache = _reference_cache("reference_categories", FinancialCategory)
+cost_centers_cache = _reference_cache("reference_cost_centers", CostCenter)
+
+
+def _serialize(items: list, schema) -> Tuple[str, bytes]:
+    """Serializa a lista uma vez e calcula o ETag do conteúdo"""
+    body = json.dumps(
+        jsonable_encoder([schema.model_validate(item) for item in items]),
+        separators=(",", ":")
+    ).encode()
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"', body
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+def reference_response(
+    request: Request,
+    cache: CompanyCache,
+    company_id,
+    load: Callable[[], List],
+    schema
+) -> Response:
+    """Responde uma lista de cadastro a partir do cache, com ETag.
+
+    Em cache, a lista é entregue sem consultar o banco; se o ``If-None-Match``
+    do cliente corresponder ao ETag atual, a resposta é 304 sem corpo.
+
+    Args:
+        request: Requisição (lê ``If-None-Match``)
+        cache: Cache da lista
+        company_id: Empresa dona dos dados
+        load: Consulta a lista no banco (chamada só quando não está em cache)
+        schema: Schema Pydantic de cada item
+    """
+    etag, body = cache.get_or_compute(company_key(company_id), lambda: _serialize(load(), schema))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,289 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import case, func, literal, select, union_all
+from sqlalchemy.orm import Session
+from ..config.settings import settings
+from ..models.financial import (
+    Budget, CategoryType, CostCenterMonthlyRollup, FinancialCategory, FinancialTransaction, CostCenter,
+    TransactionStatus, TransactionType
+)
+from ..schemas.financial import DreCompare
+from .cache import CompanyCache, company_key
+from .ledger import PaidTransactions
+from .periods import add_months, month_key, period_key_expression
+
+UNCATEGORIZED = "Sem categoria"
+NO_COST_CENTER = "Sem centro de custo"
+
+# Somas de um mês: (tipo, categoria, centro de custo, total)
+MonthSums = Tuple[Tuple[TransactionType, object, object, Decimal], ...]
+
+# Meses fechados não mudam, a não ser por lançamentos retroativos, que
+# descartam só o mês afetado (ver ``touch_period`` no ledger)
+dre_period_cache = CompanyCache(
+    "dre_periods",
+    maxsize=settings.DRE_CACHE_MAXSIZE,
+    ttl=settings.DRE_CACHE_TTL,
+    period_models=(PaidTransactions,)
+)
+
+
+def month_start(key: str) -> date:
+    return date.fromisoformat(f"{key}-01")
+
+
+def month_range(start: date, end: date) -> List[str]:
+    """Chaves YYYY-MM de todos os meses entre duas datas"""
+    months = []
+    current = start.replace(day=1)
+    while current <= end:
+        months.append(month_key(current))
+        current = add_months(current, 1)
+    return months
+
+
+def _query_month_sums(db: Session, company_id, first: str, last: str) -> Dict[str, MonthSums]:
+    """Transações pagas agrupadas por mês, tipo, categoria e centro de custo (uma consulta)"""
+    t = FinancialTransaction
+    # Mesma data de referência do ledger (``reference_date``), que invalida o cache por mês
+    reference = func.coalesce(t.payment_date, t.due_date)
+    period = period_key_expression(db.get_bind().dialect.name, reference)
+    end = add_months(month_start(last), 1) - timedelta(days=1)
+
+    rows = db.query(
+        period, t.type, t.category_id, t.cost_center_id, func.sum(t.amount)
+    ).filter(
+        t.company_id == company_id,
+        t.status == TransactionStatus.PAID,
+        reference.between(month_start(first), end)
+    ).group_by(period, t.type, t.category_id, t.cost_center_id).all()
+
+    sums = defaultdict(list)
+    for month, type, category_id, cost_center_id, total in rows:
+        sums[month].append((TransactionType(type), category_id, cost_center_id, Decimal(str(total))))
+    return {month: tuple(sums.get(month, ())) for month in month_range(month_start(first), end)}
+
+
+def monthly_dre_sums(db: Session, company_id, months: List[str], today: Optional[date] = None) -> Dict[str, MonthSums]:
+    """Somas mensais da DRE, com os meses fechados vindos do cache.
+
+    Os meses que faltam no cache (e o mês aberto, sempre recalculado) saem de
+    uma única consulta agrupada; os meses fechados obtidos são guardados.
+
+    Args:
+        db: Sessão do banco de dados
+        company_id: Empresa dona dos dados
+        months: Chaves YYYY-MM desejadas
+        today: Data de referência do mês aberto (padrão: hoje)
+
+    Returns:
+        Dicionário mês -> somas do mês
+    """
+    current = month_key(today or date.today())
+    sums = {}
+    missing = []
+    for month in sorted(set(months)):
+        cached = dre_period_cache.get(company_key(company_id, month)) if month < current else None
+        if cached is None:
+            missing.append(month)
+        else:
+            sums[month] = cached
+
+    if missing:
+        # Um mês invalidado durante a consulta (mesmo fora do cache) não é guardado
+        versions = {month: dre_period_cache.period_version(company_id, month) for month in missing}
+        computed = _query_month_sums(db, company_id, missing[0], missing[-1])
+        for month in missing:
+            if month < current:
+                dre_period_cache.set_if_version(company_key(company_id, month), computed[month], versions[month])
+        sums.update({month: computed[month] for month in missing})
+    return sums
+
+
+def _section(totals: Dict, category_names: Dict, cost_center_names: Dict) -> dict:
+    categories = []
+    section_total = Decimal("0")
+    for category_id, by_cost_center in totals.items():
+        category_total = sum(by_cost_center.values(), Decimal("0"))
+        section_total += category_total
+        cost_centers = sorted(
+            (
+                {
+                    "cost_center_id": str(cost_center_id) if cost_center_id else None,
+                    "name": cost_center_names.get(cost_center_id, NO_COST_CENTER),
+                    "total": float(amount),
+                }
+                for cost_center_id, amount in by_cost_center.items()
+            ),
+            key=lambda item: (-item["total"], item["name"])
+        )
+        categories.append({
+            "category_id": str(category_id) if category_id else None,
+            "name": category_names.get(category_id, UNCATEGORIZED),
+            "total": float(category_total),
+            "cost_centers": cost_centers,
+        })
+    categories.sort(key=lambda item: (-item["total"], item["name"]))
+    return {"total": float(section_total), "categories": categories}
+
+
+def build_dre(sums: Dict[str, MonthSums], months: List[str], category_names: Dict, cost_center_names: Dict) -> dict:
+    """Monta a árvore da DRE (grupo > categoria > centro de custo) para os meses"""
+    totals = {
+        TransactionType.INCOME: defaultdict(lambda: defaultdict(Decimal)),
+        TransactionType.EXPENSE: defaultdict(lambda: defaultdict(Decimal)),
+    }
+    for month in months:
+        for type, category_id, cost_center_id, amount in sums[month]:
+            totals[type][category_id][cost_center_id] += amount
+
+    revenue = _section(totals[TransactionType.INCOME], category_names, cost_center_names)
+    expenses = _section(totals[TransactionType.EXPENSE], category_names, cost_center_names)
+    return {
+        "from": months[0],
+        "to": months[-1],
+        "revenue": revenue,
+        "expenses": expenses,
+        "net_result": round(revenue["total"] - expenses["total"], 2),
+    }
+
+
+def comparison_months(months: List[str], compare: DreCompare) -> List[str]:
+    """Meses do período de comparação: o anterior de mesmo tamanho ou o mesmo do ano anterior"""
+    shift = -len(months) if compare == DreCompare.PREVIOUS else -12
+    return [month_key(add_months(month_start(month), shift)) for month in months]
+
+
+def dre_report(
+    db: Session,
+    company_id,
+    start: date,
+    end: date,
+    compare: Optional[DreCompare] = None,
+    today: Optional[date] = None
+) -> dict:
+    """DRE dos meses entre ``start`` e ``end`` (meses inteiros), com comparação opcional.
+
+    Returns:
+        Árvore da DRE; com ``compare``, inclui ``comparison`` (mesma estrutura)
+        e ``variance`` (diferença absoluta dos totais)
+    """
+    months = month_range(start, end)
+    compared = comparison_months(months, compare) if compare else []
+    sums = monthly_dre_sums(db, company_id, months + compared, today)
+
+    category_names = dict(
+        db.query(FinancialCategory.id, FinancialCategory.name).filter(FinancialCategory.company_id == company_id).all()
+    )
+    cost_center_names = dict(
+        db.query(CostCenter.id, CostCenter.name).filter(CostCenter.company_id == company_id).all()
+    )
+
+    report = build_dre(sums, months, category_names, cost_center_names)
+    if compare:
+        comparison = build_dre(sums, compared, category_names, cost_center_names)
+        report["comparison"] = comparison
+        report["variance"] = {
+            field: round(report[field]["total"] - comparison[field]["total"], 2)
+            for field in ("revenue", "expenses")
+        }
+        report["variance"]["net_result"] = round(report["net_result"] - comparison["net_result"], 2)
+    return report
+
+
+def budget_vs_actual(db: Session, company_id, months: List[str], cost_center_id=None) -> dict:
+    """Orçado x realizado por centro de custo e categoria, mês a mês.
+
+    Orçamentos e realizado (``cost_center_monthly_rollups``, já somado por mês)
+    são unidos numa única consulta agrupada por célula; nenhuma transação é
+    lida. O realizado segue o tipo da categoria: despesas pagas menos
+    receitas em categorias de despesa, e o inverso nas de receita.
+
+    Args:
+        db: Sessão do banco de dados
+        company_id: Empresa dona dos dados
+        months: Chaves YYYY-MM do período, em ordem
+        cost_center_id: Restringe a um centro de custo
+
+    Returns:
+        Payload colunar: ``months`` e, por linha (centro de custo, categoria),
+        listas ``budget``, ``actual`` e ``variance`` (realizado - orçado)
+        alinhadas com ``months``; ``totals`` soma todas as linhas
+    """
+    b = Budget
+    r = CostCenterMonthlyRollup
+    zero = literal(0)
+    budgets = select(
+        b.cost_center_id, b.category_id, b.month.label("period"), b.amount.label("budget"),
+        zero.label("expense"), zero.label("income")
+    ).where(b.company_id == company_id, b.month.between(months[0], months[-1]))
+    actuals = select(
+        r.cost_center_id, r.category_id, r.period, zero,
+        case((r.type == TransactionType.EXPENSE, r.total_amount), else_=0),
+        case((r.type == TransactionType.INCOME, r.total_amount), else_=0)
+    ).where(r.company_id == company_id, r.period.between(months[0], months[-1]))
+    if cost_center_id is not None:
+        budgets = budgets.where(b.cost_center_id == cost_center_id)
+        actuals = actuals.where(r.cost_center_id == cost_center_id)
+
+    cells = union_all(budgets, actuals).subquery()
+    rows = db.execute(
+        select(
+            cells.c.cost_center_id, cells.c.category_id, cells.c.period,
+            func.sum(cells.c.budget), func.sum(cells.c.expense), func.sum(cells.c.income)
+        ).group_by(cells.c.cost_center_id, cells.c.category_id, cells.c.period)
+    ).all()
+
+    categories = {
+        id: (name, type) for id, name, type in
+        db.query(FinancialCategory.id, FinancialCategory.name, FinancialCategory.type)
+        .filter(FinancialCategory.company_id == company_id).all()
+    }
+    cost_centers = dict(
+        db.query(CostCenter.id, CostCenter.name).filter(CostCenter.company_id == company_id).all()
+    )
+
+    month_index = {month: index for index, month in enumerate(months)}
+    lines = {}
+    for cost_center, category, period, budget, expense, income in rows:
+        line = lines.get((cost_center, category))
+        if line is None:
+            line = lines[(cost_center, category)] = {
+                "budget": [Decimal("0")] * len(months),
+                "actual": [Decimal("0")] * len(months),
+            }
+        net = Decimal(str(expense or 0)) - Decimal(str(income or 0))
+        if categories.get(category, (None, CategoryType.EXPENSE))[1] == CategoryType.INCOME:
+            net = -net
+        index = month_index[period]
+        line["budget"][index] += Decimal(str(budget or 0))
+        line["actual"][index] += net
+
+    payload_rows = []
+    total_budget = [Decimal("0")] * len(months)
+    total_actual = [Decimal("0")] * len(months)
+    for (cost_center, category), line in lines.items():
+        payload_rows.append({
+            "cost_center_id": str(cost_center),
+            "cost_center": cost_centers.get(cost_center),
+            "category_id": str(category),
+            "category": categories.get(category, (None,))[0],
+            "budget": [float(value) for value in line["budget"]],
+            "actual": [float(value) for value in line["actual"]],
+            "variance": [float(actual - budget) for budget, actual in zip(line["budget"], line["actual"])],
+        })
+        total_budget = [total + value for total, value in zip(total_budget, line["budget"])]
+        total_actual = [total + value for total, value in zip(total_actual, line["actual"])]
+    payload_rows.sort(key=lambda row: (row["cost_center"] or "", row["category"] or ""))
+
+    return {
+        "months": months,
+        "rows": payload_rows,
+        "totals": {
+            "budget": [float(value) for value in total_budget],
+            "actual": [float(value) for value in total_actual],
+            "variance": [float(actual - budget) for budget, actual in zip(total_budget, total_actual)],
+        },
+    }
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Locks em processo para bancos sem advisory lock (um por job)
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+
+@contextmanager
+def job_lock(db: Session, name: str):
+    """Garante que apenas um worker execute o job ``name`` por vez.
+
+    No Postgres usa ``pg_try_advisory_xact_lock``, liberado no fim da transação
+    da sessão; nos demais bancos, um lock do processo. Não bloqueia: entrega
+    ``False`` se outro worker já estiver executando.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        key = zlib.crc32(name.encode())
+        yield bool(db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": key}).scalar())
+        return
+
+    with _local_locks_guard:
+        lock = _local_locks.setdefault(name, threading.Lock())
+    acquired = lock.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            lock.release()
+
+
+class Scheduler:
+    """Executa jobs periódicos dentro do ciclo de vida da aplicação.
+
+    Cada job é uma função síncrona sem argumentos, executada em thread, que
+    retorna o número de linhas alteradas ou ``None`` quando foi pulada (ex.:
+    lock em uso por outro worker).
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, dict] = {}
+        self._tasks = []
+
+    def add_job(self, name: str, interval_seconds: int, func: Callable[[], Optional[int]]) -> None:
+        self._jobs[name] = {
+            "func": func,
+            "interval_seconds": interval_seconds,
+            "metrics": {
+                "runs": 0,
+                "skipped": 0,
+                "errors": 0,
+                "rows_changed_total": 0,
+                "last_run_at": None,
+                "last_duration_ms": None,
+                "last_rows_changed": None,
+                "last_error": None,
+            },
+        }
+
+    async def run_job(self, name: str) -> Optional[int]:
+        """Executa o job uma vez e atualiza suas métricas"""
+        job = self._jobs[name]
+        metrics = job["metrics"]
+        started = time.perf_counter()
+        try:
+            rows = await run_in_threadpool(job["func"])
+        except Exception as exc:
+            logger.exception("Job %s falhou", name)
+            metrics["errors"] += 1
+            metrics["last_error"] = str(exc)
+            return None
+        finally:
+            metrics["last_run_at"] = datetime.now(timezone.utc).isoformat()
+            metrics["last_duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+        if rows is None:
+            metrics["skipped"] += 1
+            return None
+        metrics["runs"] += 1
+        metrics["last_rows_changed"] = rows
+        metrics["rows_changed_total"] += rows
+        metrics["last_error"] = None
+        return rows
+
+    async def _loop(self, name: str) -> None:
+        while True:
+            await self.run_job(name)
+            await asyncio.sleep(self._jobs[name]["interval_seconds"])
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._loop(name)) for name in self._jobs]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def metrics(self) -> dict:
+        return {
+            name: dict(job["metrics"], interval_seconds=job["interval_seconds"])
+            for name, job in self._jobs.items()
+        }
+
+
+scheduler = Scheduler()
@@ -0,0 +1,291 @@
+import codecs
+import logging
+import os
+import re
+import unicodedata
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator, NamedTuple, Optional
+from fastapi import HTTPException, UploadFile, status
+from openpyxl import load_workbook
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, sessionmaker
+from ..config.database import SessionLocal
+from ..models.integrations import BankReconciliation, BankStatementLine, FileType, ReconciliationStatus
+
+STATEMENTS_SUBDIR = "statements"
+
+logger = logging.getLogger(__name__)
+
+FILE_EXTENSIONS = {
+    ".ofx": FileType.OFX,
+    ".xlsx": FileType.XLSX,
+}
+
+# Bytes lidos do arquivo OFX por vez
+_OFX_READ_SIZE = 64 * 1024
+
+# Elemento OFX completo: ``<TAG>valor`` (SGML, sem fechamento) ou ``</TAG>``
+_OFX_TOKEN = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+# Cabeçalhos aceitos na planilha, já normalizados (minúsculas, sem acentos)
+_XLSX_HEADERS = {
+    "posted_date": ("data", "data lancamento", "data do lancamento", "date"),
+    "description": ("descricao", "historico", "lancamento", "description", "memo"),
+    "amount": ("valor", "valor (r$)", "amount"),
+    "fit_id": ("documento", "no documento", "numero documento", "id", "fitid"),
+}
+
+
+class StatementLine(NamedTuple):
+    posted_date: date
+    amount: Decimal
+    description: Optional[str]
+    fit_id: Optional[str]
+
+
+def statement_file_type(filename: Optional[str]) -> FileType:
+    """Tipo do extrato pela extensão do arquivo"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension not in FILE_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported statement file type, use .ofx or .xlsx"
+        )
+    return FILE_EXTENSIONS[extension]
+
+
+async def save_upload(upload: UploadFile, directory: str, max_size: int, chunk_size: int) -> str:
+    """Grava o upload em disco em blocos, sem carregar o arquivo na memória.
+
+    O arquivo parcial é removido se o tamanho passar de ``max_size`` (413).
+
+    Args:
+        upload: Arquivo recebido
+        directory: Diretório de destino
+        max_size: Tamanho máximo em bytes
+        chunk_size: Bytes lidos e gravados por vez
+
+    Returns:
+        Caminho do arquivo gravado
+    """
+    os.makedirs(directory, exist_ok=True)
+    extension = os.path.splitext(upload.filename or "")[1].lower()
+    path = os.path.join(directory, f"{uuid.uuid4()}{extension}")
+
+    size = 0
+    try:
+        with open(path, "wb") as destination:
+            while chunk := await upload.read(chunk_size):
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File exceeds the maximum size of {max_size} bytes"
+                    )
+                destination.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    finally:
+        await upload.close()
+    return path
+
+
+def _ofx_encoding(header: bytes) -> str:
+    """Codificação declarada no cabeçalho OFX (SGML usa CHARSET:1252 por padrão)"""
+    text = header.decode("ascii", errors="ignore").upper()
+    if "UTF-8" in text or ("<?XML" in text and "ENCODING" not in text):
+        return "utf-8"
+    return "cp1252"
+
+
+def _ofx_date(value: str) -> date:
+    # AAAAMMDD[HHMMSS[.XXX]][[-3:BRT]]
+    return datetime.strptime(value[:8], "%Y%m%d").date()
+
+
+def _ofx_amount(value: str) -> Decimal:
+    return Decimal(value.strip().replace(",", "."))
+
+
+def _ofx_tokens(path: str) -> Iterator[tuple]:
+    """Tokens ``(fechamento, tag, valor)`` do OFX, lidos em blocos"""
+    with open(path, "rb") as source:
+        raw = source.read(_OFX_READ_SIZE)
+        decoder = codecs.getincrementaldecoder(_ofx_encoding(raw))(errors="replace")
+        buffer = ""
+        while raw:
+            buffer += decoder.decode(raw)
+            # Só consome tokens seguidos de outro "<": o valor do último pode estar incompleto
+            end = buffer.rfind("<")
+            for match in _OFX_TOKEN.finditer(buffer, 0, end):
+                yield match.group(1) == "/", match.group(2).upper(), match.group(3).strip()
+            buffer = buffer[end:] if end >= 0 else ""
+            raw = source.read(_OFX_READ_SIZE)
+        for match in _OFX_TOKEN.finditer(buffer):
+            yield match.group(1) == "/", match.group(2).upper(), match.group(3).strip()
+
+
+def iter_ofx_lines(path: str) -> Iterator[StatementLine]:
+    """Lê as transações (``STMTTRN``) de um OFX 1.x (SGML) ou 2.x (XML) incrementalmente"""
+    current = None
+    for closing, tag, value in _ofx_tokens(path):
+        if tag == "STMTTRN":
+            if not closing:
+                current = {}
+                continue
+            if current is not None:
+                if "DTPOSTED" not in current or "TRNAMT" not in current:
+                    raise ValueError("OFX transaction without DTPOSTED or TRNAMT")
+                yield StatementLine(
+                    posted_date=_ofx_date(current["DTPOSTED"]),
+                    amount=_ofx_amount(current["TRNAMT"]),
+                    description=current.get("MEMO") or current.get("NAME"),
+                    fit_id=current.get("FITID") or current.get("CHECKNUM"),
+                )
+            current = None
+        elif current is not None and not closing and value:
+            current[tag] = value
+
+
+def _normalize_header(value) -> str:
+    text = unicodedata.normalize("NFKD", str(value or "")).encode("ascii", "ignore").decode()
+    return " ".join(text.lower().replace(".", "").split())
+
+
+def _xlsx_columns(row: tuple) -> Optional[dict]:
+    """Mapeia campo -> índice da coluna, se a linha for o cabeçalho"""
+    headers = [_normalize_header(value) for value in row]
+    columns = {}
+    for field, names in _XLSX_HEADERS.items():
+        for index, header in enumerate(headers):
+            if header in names:
+                columns[field] = index
+                break
+    if "posted_date" in columns and "amount" in columns:
+        return columns
+    return None
+
+
+def _xlsx_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), "%d/%m/%Y").date()
+
+
+def _xlsx_amount(value) -> Decimal:
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    # "1.234,56" (formato brasileiro)
+    return Decimal(str(value).strip().replace(".", "").replace(",", "."))
+
+
+def iter_xlsx_lines(path: str) -> Iterator[StatementLine]:
+    """Lê a primeira planilha em modo somente leitura (streaming), linha a linha.
+
+    As linhas antes do cabeçalho (data, descrição, valor, documento) são
+    ignoradas, assim como linhas sem data ou valor (saldos, totais).
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        columns = None
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            if columns is None:
+                columns = _xlsx_columns(row)
+                continue
+
+            def cell(field):
+                index = columns.get(field)
+                return row[index] if index is not None and index < len(row) else None
+
+            posted_date, amount = cell("posted_date"), cell("amount")
+            if posted_date in (None, "") or amount in (None, ""):
+                continue
+            description, fit_id = cell("description"), cell("fit_id")
+            yield StatementLine(
+                posted_date=_xlsx_date(posted_date),
+                amount=_xlsx_amount(amount),
+                description=str(description).strip() or None if description is not None else None,
+                fit_id=str(fit_id).strip() or None if fit_id is not None else None,
+            )
+        if columns is None:
+            raise ValueError("Statement header not found (expected date and amount columns)")
+    finally:
+        workbook.close()
+
+
+STATEMENT_READERS = {
+    FileType.OFX: iter_ofx_lines,
+    FileType.XLSX: iter_xlsx_lines,
+}
+
+
+def import_statement(db: Session, reconciliation: BankReconciliation, batch_size: int) -> int:
+    """Normaliza as linhas do extrato na tabela de preparo, em lotes.
+
+    As linhas são lidas do arquivo sob demanda e inseridas com INSERT em lote
+    (sem objetos ORM), de modo que o uso de memória não depende do tamanho
+    do extrato. Não faz commit.
+
+    Args:
+        db: Sessão do banco de dados
+        reconciliation: Importação com o arquivo já gravado
+        batch_size: Linhas por INSERT
+
+    Returns:
+        Quantidade de linhas importadas
+    """
+    stmt = insert(BankStatementLine.__table__)
+    batch = []
+    count = 0
+    for line in STATEMENT_READERS[reconciliation.file_type](reconciliation.file_url):
+        count += 1
+        batch.append({
+            "id": str(uuid.uuid4()),
+            "reconciliation_id": reconciliation.id,
+            "company_id": reconciliation.company_id,
+            "account_id": reconciliation.account_id,
+            "line_number": count,
+            "posted_date": line.posted_date,
+            "amount": line.amount,
+            "description": line.description,
+            "fit_id": line.fit_id,
+        })
+        if len(batch) >= batch_size:
+            db.execute(stmt, batch)
+            batch = []
+    if batch:
+        db.execute(stmt, batch)
+    return count
+
+
+def run_statement_import(
+    reconciliation_id: str,
+    batch_size: int,
+    session_factory: sessionmaker = SessionLocal
+) -> None:
+    """Tarefa em segundo plano: importa o extrato e registra o resultado"""
+    db = session_factory()
+    try:
+        reconciliation = db.get(BankReconciliation, reconciliation_id)
+        if reconciliation is None or reconciliation.status != ReconciliationStatus.PENDING:
+            return
+        reconciliation.status = ReconciliationStatus.PROCESSING
+        db.commit()
+
+        try:
+            reconciliation.line_count = import_statement(db, reconciliation, batch_size)
+            reconciliation.status = ReconciliationStatus.IMPORTED
+            db.commit()
+        except Exception as error:
+            logger.exception("Importação de extrato %s falhou", reconciliation_id)
+            db.rollback()
+            reconciliation.status = ReconciliationStatus.FAILED
+            reconciliation.error_message = str(error) or error.__class__.__name__
+            db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,150 @@
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+import numpy as np
+
+# Tabelas versionadas por ano de início de vigência
+TAX_TABLES_PATH = Path(__file__).resolve().parent.parent / "data" / "tax_tables.json"
+
+
+class SimplesAnnex:
+    """Faixas de um anexo do Simples Nacional, compiladas para busca binária.
+
+    As faixas são definidas pela receita bruta dos últimos 12 meses (RBT12);
+    a alíquota efetiva é ``(RBT12 x alíquota nominal - parcela a deduzir) / RBT12``.
+    """
+    __slots__ = (
+        "name", "description", "limits", "rates", "deductions",
+        "limits_array", "rates_array", "deductions_array",
+    )
+
+    def __init__(self, name: str, description: str, limits: List[Decimal], rates: List[Decimal], deductions: List[Decimal]):
+        if not (len(limits) == len(rates) == len(deductions)) or limits != sorted(limits):
+            raise ValueError(f"Invalid Simples Nacional annex {name}")
+        self.name = name
+        self.description = description
+        self.limits = tuple(limits)
+        self.rates = tuple(rates)
+        self.deductions = tuple(deductions)
+        self.limits_array = np.array(limits, dtype=float)
+        self.rates_array = np.array(rates, dtype=float)
+        self.deductions_array = np.array(deductions, dtype=float)
+
+    @property
+    def ceiling(self) -> Decimal:
+        """Maior RBT12 permitida no Simples Nacional"""
+        return self.limits[-1]
+
+    def bracket(self, rbt12: Decimal) -> int:
+        """Índice da faixa da RBT12; ``ValueError`` acima do teto do regime"""
+        index = bisect_left(self.limits, rbt12)
+        if index == len(self.limits):
+            raise ValueError(f"Revenue exceeds the Simples Nacional limit of {self.ceiling}")
+        return index
+
+    def effective_rate(self, rbt12: Decimal) -> Decimal:
+        """Alíquota efetiva (fração) para a RBT12"""
+        index = self.bracket(rbt12)
+        return (rbt12 * self.rates[index] - self.deductions[index]) / rbt12
+
+    def effective_rates(self, revenues: np.ndarray) -> np.ndarray:
+        """Alíquotas efetivas de um array de RBT12 (NaN acima do teto)"""
+        index = np.searchsorted(self.limits_array, revenues, side="left")
+        eligible = index < len(self.limits_array)
+        index = np.minimum(index, len(self.limits_array) - 1)
+        rates = (revenues * self.rates_array[index] - self.deductions_array[index]) / revenues
+        return np.where(eligible, rates, np.nan)
+
+
+class PresumidoParameters(NamedTuple):
+    """Parâmetros do Lucro Presumido (valores anuais)"""
+    presumption: Dict[str, Dict[str, Decimal]]  # atividade -> {"irpj", "csll"}
+    irpj_rate: Decimal
+    irpj_surcharge_rate: Decimal
+    irpj_surcharge_threshold: Decimal
+    csll_rate: Decimal
+    pis_rate: Decimal
+    cofins_rate: Decimal
+
+
+class TaxTableVersion(NamedTuple):
+    valid_from: int
+    source: str
+    simples: Dict[str, SimplesAnnex]
+    presumido: PresumidoParameters
+
+
+def _decimals(values) -> List[Decimal]:
+    return [Decimal(str(value)) for value in values]
+
+
+def load_tax_tables(path: Path = TAX_TABLES_PATH) -> List[TaxTableVersion]:
+    """Lê e compila as tabelas do arquivo de dados, ordenadas por vigência"""
+    with open(path, encoding="utf-8") as data_file:
+        data = json.load(data_file)
+
+    versions = []
+    for version in data["versions"]:
+        simples = version["simples_nacional"]
+        limits = _decimals(simples["limits"])
+        presumido = version["lucro_presumido"]
+        versions.append(TaxTableVersion(
+            valid_from=int(version["valid_from"]),
+            source=version.get("source", ""),
+            simples={
+                name: SimplesAnnex(
+                    name,
+                    annex.get("description", ""),
+                    limits,
+                    _decimals(annex["rates"]),
+                    _decimals(annex["deductions"]),
+                )
+                for name, annex in simples["annexes"].items()
+            },
+            presumido=PresumidoParameters(
+                presumption={
+                    activity: {tax: Decimal(str(rate)) for tax, rate in rates.items()}
+                    for activity, rates in presumido["presumption"].items()
+                },
+                **{
+                    field: Decimal(str(presumido[field]))
+                    for field in PresumidoParameters._fields
+                    if field != "presumption"
+                }
+            ),
+        ))
+    return sorted(versions, key=lambda version: version.valid_from)
+
+
+# Carregadas uma única vez, na importação (inicialização da aplicação)
+TAX_TABLES = load_tax_tables()
+_VALID_FROM = [version.valid_from for version in TAX_TABLES]
+
+
+def tax_table(year: Optional[int] = None) -> TaxTableVersion:
+    """Tabela vigente no ano (padrão: ano atual)"""
+    year = year or date.today().year
+    index = bisect_right(_VALID_FROM, year)
+    if index == 0:
+        raise ValueError(f"No tax table for year {year}")
+    return TAX_TABLES[index - 1]
+
+
+def simples_annex(annex: str, year: Optional[int] = None) -> SimplesAnnex:
+    """Anexo do Simples Nacional vigente no ano"""
+    try:
+        return tax_table(year).simples[annex]
+    except KeyError:
+        raise ValueError(f"Unknown Simples Nacional annex {annex}")
+
+
+def presumido_parameters(activity: str, year: Optional[int] = None) -> tuple:
+    """Parâmetros do Lucro Presumido e percentuais de presunção da atividade"""
+    parameters = tax_table(year).presumido
+    try:
+        return parameters, parameters.presumption[activity]
+    except KeyError:
+        raise ValueError(f"Unknown activity {activity}")
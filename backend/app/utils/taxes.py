@@ -0,0 +1,322 @@
+from datetime import date
+from decimal import Decimal
+from typing import List, Optional
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..config.settings import settings
+from ..models.financial import FinancialMonthlyRollup, TransactionStatus, TransactionType
+from .cache import CompanyCache, company_key
+from .ledger import PaidIncome
+from .periods import add_months, month_key
+from .tax_tables import presumido_parameters, simples_annex, tax_table
+
+SIMPLES_NACIONAL = "simples_nacional"
+LUCRO_PRESUMIDO = "lucro_presumido"
+
+DEFAULT_ANNEX = "III"
+DEFAULT_ACTIVITY = "services"
+
+# Meses da receita bruta acumulada (RBT12)
+RBT12_MONTHS = 12
+
+# Projeção por empresa, descartada quando uma receita paga entra ou muda
+tax_projection_cache = CompanyCache(
+    "tax_projection",
+    maxsize=settings.TAX_PROJECTION_CACHE_MAXSIZE,
+    ttl=settings.TAX_PROJECTION_CACHE_TTL,
+    models=(PaidIncome,)
+)
+
+
+def calculate_simples_nacional(revenue: Decimal, annex: str = DEFAULT_ANNEX, year: Optional[int] = None) -> dict:
+    """Calcula impostos do Simples Nacional pela alíquota efetiva do anexo"""
+    table = simples_annex(annex, year)
+    rate = table.effective_rate(revenue)
+    total_tax = revenue * rate
+
+    return {
+        "regime": "Simples Nacional",
+        "annex": annex,
+        "table_version": tax_table(year).valid_from,
+        "annual_revenue": float(revenue),
+        "tax_rate": float(rate * 100),
+        "total_tax": float(total_tax),
+        "net_income": float(revenue - total_tax),
+        "monthly_tax": float(total_tax / 12),
+        "breakdown": {
+            "simples_nacional": float(total_tax)
+        }
+    }
+
+
+def calculate_lucro_presumido(revenue: Decimal, activity: str = DEFAULT_ACTIVITY, year: Optional[int] = None) -> dict:
+    """Calcula impostos do Lucro Presumido"""
+    parameters, presumption = presumido_parameters(activity, year)
+    presumed_profit = revenue * presumption["irpj"]
+    csll_base = revenue * presumption["csll"]
+
+    # IRPJ: 15% sobre o lucro presumido + adicional de 10% sobre o que exceder R$ 240.000
+    irpj = presumed_profit * parameters.irpj_rate
+    if presumed_profit > parameters.irpj_surcharge_threshold:
+        irpj += (presumed_profit - parameters.irpj_surcharge_threshold) * parameters.irpj_surcharge_rate
+
+    csll = csll_base * parameters.csll_rate
+    pis = revenue * parameters.pis_rate
+    cofins = revenue * parameters.cofins_rate
+
+    total_tax = irpj + csll + pis + cofins
+
+    return {
+        "regime": "Lucro Presumido",
+        "activity": activity,
+        "table_version": tax_table(year).valid_from,
+        "annual_revenue": float(revenue),
+        "presumed_profit": float(presumed_profit),
+        "total_tax": float(total_tax),
+        "net_income": float(revenue - total_tax),
+        "monthly_tax": float(total_tax / 12),
+        "breakdown": {
+            "irpj": float(irpj),
+            "csll": float(csll),
+            "pis": float(pis),
+            "cofins": float(cofins)
+        }
+    }
+
+
+def simples_nacional_grid(revenues: np.ndarray, annex: str = DEFAULT_ANNEX, year: Optional[int] = None) -> dict:
+    """Versão vetorizada de ``calculate_simples_nacional`` (NaN acima do teto do regime)"""
+    rates = simples_annex(annex, year).effective_rates(revenues)
+    total_tax = revenues * rates
+    return {
+        "tax_rate": rates * 100,
+        "total_tax": total_tax,
+        "breakdown": {"simples_nacional": total_tax},
+    }
+
+
+def lucro_presumido_grid(revenues: np.ndarray, activity: str = DEFAULT_ACTIVITY, year: Optional[int] = None) -> dict:
+    """Versão vetorizada de ``calculate_lucro_presumido`` para um array de receitas"""
+    parameters, presumption = presumido_parameters(activity, year)
+    threshold = float(parameters.irpj_surcharge_threshold)
+    presumed_profit = revenues * float(presumption["irpj"])
+    irpj = (
+        presumed_profit * float(parameters.irpj_rate)
+        + np.maximum(presumed_profit - threshold, 0) * float(parameters.irpj_surcharge_rate)
+    )
+    csll = revenues * float(presumption["csll"]) * float(parameters.csll_rate)
+    pis = revenues * float(parameters.pis_rate)
+    cofins = revenues * float(parameters.cofins_rate)
+    return {
+        "presumed_profit": presumed_profit,
+        "total_tax": irpj + csll + pis + cofins,
+        "breakdown": {"irpj": irpj, "csll": csll, "pis": pis, "cofins": cofins},
+    }
+
+
+def find_breakevens(
+    revenues: np.ndarray,
+    simples_tax: np.ndarray,
+    presumido_tax: np.ndarray,
+    simples_ceiling: Optional[float] = None
+) -> List[dict]:
+    """Receitas em que o regime mais barato muda, interpoladas entre pontos da grade.
+
+    Pontos acima do teto do Simples (imposto NaN) contam como Lucro Presumido
+    mais barato; a troca nesse caso é informada no próprio teto.
+    """
+    order = np.argsort(revenues)
+    revenue = revenues[order]
+    difference = np.where(np.isnan(simples_tax), np.inf, simples_tax - presumido_tax)[order]
+
+    # Pontos com impostos iguais não definem lado; a troca é buscada entre os demais
+    keep = difference != 0
+    revenue, difference = revenue[keep], difference[keep]
+    crossings = np.nonzero(np.sign(difference[:-1]) != np.sign(difference[1:]))[0]
+
+    low, high = revenue[crossings], revenue[crossings + 1]
+    d_low, d_high = difference[crossings], difference[crossings + 1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        points = low + (high - low) * d_low / (d_low - d_high)
+    if simples_ceiling is not None:
+        points = np.where(np.isfinite(d_high), points, np.minimum(high, simples_ceiling))
+
+    return [
+        {
+            "revenue": round(float(point), 2),
+            "cheaper_below": SIMPLES_NACIONAL if below < 0 else LUCRO_PRESUMIDO,
+            "cheaper_above": LUCRO_PRESUMIDO if below < 0 else SIMPLES_NACIONAL,
+        }
+        for point, below in zip(points, d_low)
+    ]
+
+
+def _rounded(values: np.ndarray) -> List[Optional[float]]:
+    return [None if np.isnan(value) else value for value in np.round(values, 2).tolist()]
+
+
+def simulate_tax_grid(
+    revenues: List[Decimal],
+    annex: str = DEFAULT_ANNEX,
+    activity: str = DEFAULT_ACTIVITY,
+    year: Optional[int] = None
+) -> dict:
+    """Simula os dois regimes para todas as receitas de uma vez.
+
+    Args:
+        revenues: Receitas anuais (RBT12) a avaliar
+        annex: Anexo do Simples Nacional
+        activity: Atividade para a presunção do Lucro Presumido
+        year: Ano da tabela (padrão: ano atual)
+
+    Returns:
+        Payload colunar com os impostos de cada regime por receita, o regime
+        mais barato em cada ponto e as receitas de equilíbrio entre regimes.
+        Receitas acima do teto do Simples têm imposto ``None`` nesse regime.
+
+    Raises:
+        ValueError: Ano, anexo ou atividade sem tabela
+    """
+    grid = np.array([float(revenue) for revenue in revenues], dtype=float)
+    simples = simples_nacional_grid(grid, annex, year)
+    presumido = lucro_presumido_grid(grid, activity, year)
+
+    simples_cheaper = np.nan_to_num(simples["total_tax"], nan=np.inf) <= presumido["total_tax"]
+    best = np.where(simples_cheaper, SIMPLES_NACIONAL, LUCRO_PRESUMIDO)
+
+    return {
+        "table_version": tax_table(year).valid_from,
+        "annex": annex,
+        "activity": activity,
+        "revenue": grid.tolist(),
+        SIMPLES_NACIONAL: {
+            "tax_rate": _rounded(simples["tax_rate"]),
+            "total_tax": _rounded(simples["total_tax"]),
+            "effective_rate": _rounded(simples["total_tax"] / grid * 100),
+        },
+        LUCRO_PRESUMIDO: {
+            "presumed_profit": _rounded(presumido["presumed_profit"]),
+            "total_tax": _rounded(presumido["total_tax"]),
+            "effective_rate": _rounded(presumido["total_tax"] / grid * 100),
+            "breakdown": {name: _rounded(values) for name, values in presumido["breakdown"].items()},
+        },
+        "best_regime": best.tolist(),
+        "breakeven": find_breakevens(
+            grid, simples["total_tax"], presumido["total_tax"], float(simples_annex(annex, year).ceiling)
+        ),
+    }
+
+
+def grid_simulation_records(payload: dict) -> List[tuple]:
+    """Converte o payload da grade em (receita, regime, simulated_taxes) no formato da simulação unitária"""
+    records = []
+    simples = payload[SIMPLES_NACIONAL]
+    presumido = payload[LUCRO_PRESUMIDO]
+    for index, revenue in enumerate(payload["revenue"]):
+        simples_tax = simples["total_tax"][index]
+        presumido_tax = presumido["total_tax"][index]
+        # Acima do teto não há simulação do Simples Nacional
+        if simples_tax is not None:
+            records.append((revenue, SIMPLES_NACIONAL, {
+                "regime": "Simples Nacional",
+                "annex": payload["annex"],
+                "table_version": payload["table_version"],
+                "annual_revenue": revenue,
+                "tax_rate": simples["tax_rate"][index],
+                "total_tax": simples_tax,
+                "net_income": revenue - simples_tax,
+                "monthly_tax": simples_tax / 12,
+                "breakdown": {"simples_nacional": simples_tax},
+            }))
+        records.append((revenue, LUCRO_PRESUMIDO, {
+            "regime": "Lucro Presumido",
+            "activity": payload["activity"],
+            "table_version": payload["table_version"],
+            "annual_revenue": revenue,
+            "presumed_profit": presumido["presumed_profit"][index],
+            "total_tax": presumido_tax,
+            "net_income": revenue - presumido_tax,
+            "monthly_tax": presumido_tax / 12,
+            "breakdown": {name: values[index] for name, values in presumido["breakdown"].items()},
+        }))
+    return records
+
+
+def compute_tax_projection(
+    db: Session,
+    company_id,
+    months: int,
+    annex: str = DEFAULT_ANNEX,
+    today: Optional[date] = None
+) -> dict:
+    """Imposto do Simples Nacional mês a mês a partir das receitas pagas.
+
+    As receitas mensais saem de uma única consulta agrupada nos agregados
+    mensais (``financial_monthly_rollups``), cobrindo os ``months`` meses e os
+    12 anteriores. A RBT12 de cada mês (receita dos 12 meses anteriores) é uma
+    janela deslizante sobre a soma acumulada. Sem receita nos 12 meses
+    anteriores (início de atividade), a RBT12 é a receita do mês x 12.
+
+    Args:
+        db: Sessão do banco de dados
+        company_id: Empresa dona dos dados
+        months: Quantidade de meses, incluindo o mês atual
+        annex: Anexo do Simples Nacional
+        today: Data de referência (padrão: hoje)
+
+    Returns:
+        Payload colunar com ``periods``, ``revenue``, ``rbt12``,
+        ``effective_rate`` (%) e ``tax``; meses acima do teto do regime têm
+        alíquota e imposto ``None``
+    """
+    today = today or date.today()
+    table = simples_annex(annex, today.year)
+    first_month = add_months(today, -(months - 1))
+    window_start = add_months(first_month, -RBT12_MONTHS)
+
+    periods = [month_key(add_months(window_start, offset)) for offset in range(months + RBT12_MONTHS)]
+    index = {period: position for position, period in enumerate(periods)}
+
+    rollup = FinancialMonthlyRollup
+    rows = db.query(rollup.period, func.sum(rollup.total_amount)).filter(
+        rollup.company_id == company_id,
+        rollup.type == TransactionType.INCOME,
+        rollup.status == TransactionStatus.PAID,
+        rollup.period >= periods[0],
+        rollup.period <= periods[-1]
+    ).group_by(rollup.period)
+
+    revenue = np.zeros(len(periods), dtype=float)
+    for period, total in rows:
+        revenue[index[period]] = float(total or 0)
+
+    # RBT12 do mês i = soma dos 12 meses anteriores (janela deslizante)
+    cumulative = np.concatenate(([0.0], np.cumsum(revenue)))
+    months_revenue = revenue[RBT12_MONTHS:]
+    rbt12 = cumulative[RBT12_MONTHS:-1] - cumulative[:-RBT12_MONTHS - 1]
+    rbt12 = np.where(rbt12 > 0, rbt12, months_revenue * RBT12_MONTHS)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rates = np.where(rbt12 > 0, table.effective_rates(rbt12), 0.0)
+    tax = months_revenue * rates
+
+    return {
+        "annex": annex,
+        "table_version": tax_table(today.year).valid_from,
+        "periods": periods[RBT12_MONTHS:],
+        "revenue": _rounded(months_revenue),
+        "rbt12": _rounded(rbt12),
+        "effective_rate": _rounded(rates * 100),
+        "tax": _rounded(tax),
+        "total_tax": round(float(np.nansum(tax)), 2),
+    }
+
+
+def cached_tax_projection(db: Session, company_id, months: int, annex: str = DEFAULT_ANNEX) -> dict:
+    """Retorna a projeção de impostos usando o cache por empresa"""
+    today = date.today()
+    key = company_key(company_id, month_key(today), months, annex)
+    return tax_projection_cache.get_or_compute(
+        key, lambda: compute_tax_projection(db, company_id, months, annex, today)
+    )
@@ -0,0 +1,289 @@
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Query, Session, noload, selectinload
+from ..models.financial import (
+    FinancialAccount, FinancialCategory, CostCenter, FinancialTransaction, TransactionStatus
+)
+from ..schemas.financial import (
+    FinancialTransactionBase, FinancialTransactionFilters, TransactionSort, BulkItemError
+)
+from .cache import touch_company
+from .ledger import TransactionState, TransactionChange, record_transaction_changes
+
+# Coluna principal de cada ordenação; o id desempata e torna a chave única
+_SORT_COLUMNS = {
+    "due_date": FinancialTransaction.due_date,
+    "amount": FinancialTransaction.amount,
+    "created_at": FinancialTransaction.created_at,
+}
+
+# Referências de uma transação que precisam pertencer à empresa
+REFERENCES = {
+    "account_id": FinancialAccount,
+    "category_id": FinancialCategory,
+    "cost_center_id": CostCenter,
+}
+
+# Mensagem de erro de cada referência inexistente na empresa
+_REFERENCE_NAMES = {
+    "account_id": "Account",
+    "category_id": "Category",
+    "cost_center_id": "Cost center",
+}
+
+# Tamanho máximo da lista de ids em cada consulta IN
+_ID_CHUNK_SIZE = 500
+
+# Relacionamentos aninhados na resposta de transações
+EXPANDABLE_RELATIONS = ("account", "category", "cost_center")
+
+
+def parse_expand(expand: Optional[str]) -> Set[str]:
+    """Interpreta o parâmetro ``expand``.
+
+    Ausente expande todos os relacionamentos; vazio (``?expand=``) não expande
+    nenhum; caso contrário, lista separada por vírgulas.
+    """
+    if expand is None:
+        return set(EXPANDABLE_RELATIONS)
+    relations = {name.strip() for name in expand.split(",") if name.strip()}
+    unknown = relations - set(EXPANDABLE_RELATIONS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid expand: {', '.join(sorted(unknown))}"
+        )
+    return relations
+
+
+def transaction_load_options(relations: Set[str]) -> list:
+    """Opções de carga: relacionamentos expandidos em lote (SELECT ... IN), os demais não carregados"""
+    return [
+        selectinload(getattr(FinancialTransaction, name)) if name in relations
+        else noload(getattr(FinancialTransaction, name))
+        for name in EXPANDABLE_RELATIONS
+    ]
+
+
+def filter_transactions(query: Query, filters: FinancialTransactionFilters) -> Query:
+    """Aplica os filtros da listagem a uma consulta de transações"""
+    t = FinancialTransaction
+
+    if filters.status is not None:
+        query = query.filter(t.status == filters.status)
+    if filters.type is not None:
+        query = query.filter(t.type == filters.type)
+    if filters.due_from is not None:
+        query = query.filter(t.due_date >= filters.due_from)
+    if filters.due_to is not None:
+        query = query.filter(t.due_date <= filters.due_to)
+    if filters.paid_from is not None:
+        query = query.filter(t.payment_date >= filters.paid_from)
+    if filters.paid_to is not None:
+        query = query.filter(t.payment_date <= filters.paid_to)
+    if filters.account_id is not None:
+        query = query.filter(t.account_id == filters.account_id)
+    if filters.category_id is not None:
+        query = query.filter(t.category_id == filters.category_id)
+    if filters.cost_center_id is not None:
+        query = query.filter(t.cost_center_id == filters.cost_center_id)
+    if filters.min_amount is not None:
+        query = query.filter(t.amount >= filters.min_amount)
+    if filters.max_amount is not None:
+        query = query.filter(t.amount <= filters.max_amount)
+
+    return query
+
+
+def transaction_sort_key(sort: TransactionSort) -> Tuple[List, bool]:
+    """Retorna (colunas da chave de ordenação, decrescente?)"""
+    descending = sort.value.startswith("-")
+    column = _SORT_COLUMNS[sort.value.lstrip("-")]
+    return [column, FinancialTransaction.id], descending
+
+
+def owned_ids(db: Session, model, company_id, ids: Iterable) -> Set:
+    """Retorna os ids de ``ids`` que existem em ``model`` para a empresa"""
+    ids = list({i for i in ids if i is not None})
+    found = set()
+    for start in range(0, len(ids), _ID_CHUNK_SIZE):
+        rows = db.query(model.id).filter(
+            model.company_id == company_id,
+            model.id.in_(ids[start:start + _ID_CHUNK_SIZE])
+        )
+        found.update(row[0] for row in rows)
+    return found
+
+
+def check_transaction_references(db: Session, company_id, values: Dict[str, Any]) -> None:
+    """Garante que conta, categoria e centro de custo informados pertencem à empresa (404 se não)"""
+    for field, model in REFERENCES.items():
+        value = values.get(field)
+        if value is not None and not owned_ids(db, model, company_id, [value]):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"{_REFERENCE_NAMES[field]} not found"
+            )
+
+
+def validate_transaction_batch(
+    db: Session,
+    company_id,
+    items: List[Dict[str, Any]]
+) -> Tuple[List[dict], List[BulkItemError]]:
+    """Valida um lote de transações como um todo.
+
+    Cada item passa pelo schema de criação; as referências (conta, categoria e
+    centro de custo) são conferidas com uma consulta por tabela para o lote
+    inteiro, e não uma por item. O ``company_id`` dos itens é ignorado.
+
+    Args:
+        db: Sessão do banco de dados
+        company_id: Empresa dona das transações
+        items: Itens recebidos na requisição
+
+    Returns:
+        Tupla (linhas prontas para inserção, erros por índice do item)
+    """
+    parsed = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            parsed.append((index, FinancialTransactionBase(**item)))
+        except ValidationError as exc:
+            messages = [
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                for error in exc.errors()
+            ]
+            errors.append(BulkItemError(index=index, errors=messages))
+        except TypeError:
+            errors.append(BulkItemError(index=index, errors=["Item must be an object"]))
+
+    owned = {
+        field: owned_ids(db, model, company_id, (getattr(data, field) for _, data in parsed))
+        for field, model in REFERENCES.items()
+    }
+
+    rows = []
+    for index, data in parsed:
+        missing = [
+            f"{field}: not found"
+            for field in REFERENCES
+            if getattr(data, field) is not None and getattr(data, field) not in owned[field]
+        ]
+        if missing:
+            errors.append(BulkItemError(index=index, errors=missing))
+            continue
+        rows.append(dict(
+            data.dict(),
+            id=uuid.uuid4(),
+            company_id=company_id,
+            status=TransactionStatus.PENDING,
+            payment_date=None,
+        ))
+
+    errors.sort(key=lambda error: error.index)
+    return rows, errors
+
+
+def insert_transactions(db: Session, rows: List[dict]) -> None:
+    """Insere transações em lote (executemany) e atualiza os agregados.
+
+    Não faz commit. Cada linha traz as colunas da transação, inclusive as de
+    ``TransactionState`` (ver ``validate_transaction_batch``).
+    """
+    if not rows:
+        return
+    db.execute(insert(FinancialTransaction), rows)
+    record_transaction_changes(db, [
+        (None, TransactionState(
+            company_id=row["company_id"],
+            account_id=row["account_id"],
+            type=row["type"],
+            status=row["status"],
+            amount=row["amount"],
+            due_date=row["due_date"],
+            payment_date=row["payment_date"],
+            category_id=row["category_id"],
+            cost_center_id=row["cost_center_id"],
+        ))
+        for row in rows
+    ])
+    # INSERT em massa não passa pelo flush do ORM
+    for company_id in {row["company_id"] for row in rows}:
+        touch_company(db, FinancialTransaction, company_id)
+
+
+def _select_states(db: Session, company_id, ids: List) -> Dict[Any, TransactionState]:
+    """Estados atuais das transações da empresa, bloqueando as linhas quando suportado"""
+    t = FinancialTransaction
+    rows = db.query(
+        t.id, t.company_id, t.account_id, t.type, t.status, t.amount,
+        t.due_date, t.payment_date, t.category_id, t.cost_center_id
+    ).filter(
+        t.company_id == company_id,
+        t.id.in_(ids)
+    ).with_for_update()
+    return {row[0]: TransactionState(*row[1:]) for row in rows}
+
+
+def bulk_update_transactions(
+    db: Session,
+    company_id,
+    ids: Iterable,
+    values: dict,
+    skip_status: Optional[TransactionStatus] = None
+) -> Tuple[int, int]:
+    """Aplica ``values`` a várias transações da empresa com UPDATE ... WHERE id IN.
+
+    Linhas que já estão no estado final não são reescritas. Os agregados são
+    atualizados na mesma transação de banco; não faz commit.
+
+    Args:
+        db: Sessão do banco de dados
+        company_id: Empresa dona das transações
+        ids: Ids das transações
+        values: Colunas a alterar (campos de ``TransactionState``)
+        skip_status: Transações já neste status não são alteradas
+
+    Returns:
+        Tupla (transações encontradas, transações alteradas)
+    """
+    ids = list(dict.fromkeys(ids))
+    matched = 0
+    affected = 0
+    changes: List[TransactionChange] = []
+
+    for start in range(0, len(ids), _ID_CHUNK_SIZE):
+        states = _select_states(db, company_id, ids[start:start + _ID_CHUNK_SIZE])
+        matched += len(states)
+
+        changed = {}
+        for transaction_id, before in states.items():
+            if skip_status is not None and before.status == skip_status:
+                continue
+            after = before._replace(**values)
+            if after != before:
+                changed[transaction_id] = (before, after)
+        if not changed:
+            continue
+
+        result = db.execute(
+            update(FinancialTransaction)
+            .where(
+                FinancialTransaction.company_id == company_id,
+                FinancialTransaction.id.in_(list(changed))
+            )
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        affected += result.rowcount
+        changes.extend(changed.values())
+
+    if changes:
+        record_transaction_changes(db, changes)
+        touch_company(db, FinancialTransaction, company_id)
+    return matched, affected
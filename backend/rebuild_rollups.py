@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir os agregados mensais de transações financeiras
+(por tipo/status e o realizado por centro de custo)
+"""
+
+import argparse
+import uuid
+from sqlalchemy.orm import sessionmaker
+from app.config.database import engine
+from app.models import user, company, plan, customer, supplier, financial, invoice, billing, sales, integrations
+from app.utils.ledger import rebuild_cost_center_rollups, rebuild_monthly_rollups
+
+# Criar sessão
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrói financial_monthly_rollups e cost_center_monthly_rollups")
+    parser.add_argument("--company", help="ID da empresa (padrão: todas)")
+    args = parser.parse_args()
+
+    company_id = uuid.UUID(args.company) if args.company else None
+
+    db = SessionLocal()
+    try:
+        rows = rebuild_monthly_rollups(db, company_id)
+        cost_center_rows = rebuild_cost_center_rollups(db, company_id)
+        db.commit()
+        print(f"✅ {rows} agregados mensais reconstruídos")
+        print(f"✅ {cost_center_rows} agregados por centro de custo reconstruídos")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Script para gravar snapshots de saldo das contas financeiras
+"""
+
+import argparse
+import uuid
+from datetime import date
+from sqlalchemy.orm import sessionmaker
+from app.config.database import engine
+from app.models import user, company, plan, customer, supplier, financial, invoice, billing, sales, integrations
+from app.utils.balances import take_balance_snapshots
+
+# Criar sessão
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grava account_balance_snapshots")
+    parser.add_argument("--date", help="Data do snapshot, YYYY-MM-DD (padrão: ontem)")
+    parser.add_argument("--company", help="ID da empresa (padrão: todas)")
+    args = parser.parse_args()
+
+    snapshot_date = date.fromisoformat(args.date) if args.date else None
+    company_id = uuid.UUID(args.company) if args.company else None
+
+    db = SessionLocal()
+    try:
+        rows = take_balance_snapshots(db, snapshot_date, company_id)
+        db.commit()
+        print(f"✅ {rows} snapshots de saldo gravados")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
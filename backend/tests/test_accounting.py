@@ -0,0 +1,136 @@
+import uuid
+import pytest
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.config.database import get_db, Base
+from app.config.settings import settings
+from app.models.user import User
+from app.models.financial import (
+    FinancialAccount, FinancialCategory, FinancialTransaction,
+    AccountType, CategoryType, TransactionType, TransactionStatus
+)
+from app.utils.security import get_current_active_user
+
+# Configurar banco de dados de teste
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_accounting.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+client = TestClient(app)
+
+@pytest.fixture(scope="module")
+def setup_database():
+    Base.metadata.create_all(bind=engine)
+    app.dependency_overrides[get_db] = override_get_db
+    yield
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_current_active_user, None)
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="module")
+def company_user(setup_database):
+    user = User(
+        id=str(uuid.uuid4()),
+        email="contador@teste.com",
+        first_name="Usuario",
+        last_name="Contador",
+        is_active=True,
+        company_id=uuid.uuid4()
+    )
+    app.dependency_overrides[get_current_active_user] = lambda: user
+
+    db = TestingSessionLocal()
+    account = FinancialAccount(company_id=user.company_id, name="Banco", type=AccountType.BANK)
+    sales = FinancialCategory(company_id=user.company_id, name="Vendas", type=CategoryType.INCOME)
+    db.add_all([account, sales])
+    db.flush()
+
+    def transaction(amount, type, status, payment_date, category=None):
+        db.add(FinancialTransaction(
+            company_id=user.company_id, account_id=account.id, description=f"Lançamento | {amount}",
+            amount=Decimal(amount), type=type, status=status, due_date=date(2024, 1, 1),
+            payment_date=payment_date, category_id=category.id if category else None
+        ))
+
+    transaction("1000.00", TransactionType.INCOME, TransactionStatus.PAID, date(2024, 1, 10), sales)
+    transaction("500.50", TransactionType.INCOME, TransactionStatus.PAID, date(2024, 2, 5), sales)
+    transaction("300.00", TransactionType.EXPENSE, TransactionStatus.PAID, date(2024, 1, 20))
+    transaction("999.00", TransactionType.EXPENSE, TransactionStatus.PENDING, None)
+    transaction("777.00", TransactionType.INCOME, TransactionStatus.PAID, date(2023, 12, 31), sales)
+    db.commit()
+    db.close()
+    return user
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ACCOUNTING_EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 1)
+    return tmp_path
+
+def run_export(export_type):
+    response = client.post("/api/v1/financial/accounting/exports/", json={
+        "export_type": export_type, "start_date": "2024-01-01", "end_date": "2024-12-31"
+    })
+    assert response.status_code == 202
+    export_id = response.json()["id"]
+    # A tarefa em segundo plano roda ao fim da requisição no TestClient
+    data = client.get(f"/api/v1/financial/accounting/exports/{export_id}").json()
+    assert data["status"] == "completed"
+    assert data["transaction_count"] == 3
+    download = client.get(f"/api/v1/financial/accounting/exports/{export_id}/download")
+    assert download.status_code == 200
+    return download.text
+
+def test_sped_export_totals(company_user, export_dir):
+    """Teste do arquivo SPED: lançamentos, partidas e totais de encerramento"""
+    lines = run_export("sped").splitlines()
+    records = [line.split("|")[1:-1] for line in lines]
+    registers = Counter(record[0] for record in records)
+
+    assert registers["I200"] == 3
+    assert registers["I250"] == 6
+    first = [record[0] for record in records].index("I200")
+    assert records[first] == ["I200", "1", "10012024", "1000,00", "N"]
+    debit, credit = records[first + 1], records[first + 2]
+    assert (debit[3], debit[4], credit[3], credit[4]) == ("1000,00", "D", "1000,00", "C")
+    assert debit[7] == "Lançamento 1000.00"
+
+    totals = {record[0]: int(record[1]) for record in records if record[0].endswith("990")}
+    # Linhas por bloco (o bloco 9 inclui o 9999)
+    for block, count in totals.items():
+        assert count == sum(1 for record in records if record[0][0] == block[0])
+    for register, count in ((record[1], int(record[2])) for record in records if record[0] == "9900"):
+        assert registers[register] == count
+    assert records[-1] == ["9999", str(len(lines))]
+
+def test_dre_export(company_user, export_dir):
+    """Teste do arquivo DRE por categoria"""
+    rows = [line.split(";") for line in run_export("dre").splitlines()]
+    assert rows == [
+        ["grupo", "categoria", "valor"],
+        ["Receitas", "Vendas", "1500,50"],
+        ["Receitas", "Total de receitas", "1500,50"],
+        ["Despesas", "Sem categoria", "300,00"],
+        ["Despesas", "Total de despesas", "300,00"],
+        ["Resultado", "Resultado do período", "1200,50"],
+    ]
+
+def test_accounting_export_validation(company_user, export_dir):
+    """Teste de período inválido e de download antes da conclusão"""
+    response = client.post("/api/v1/financial/accounting/exports/", json={
+        "export_type": "sped", "start_date": "2024-12-31", "end_date": "2024-01-01"
+    })
+    assert response.status_code == 422
+    assert client.get(f"/api/v1/financial/accounting/exports/{uuid.uuid4()}").status_code == 404
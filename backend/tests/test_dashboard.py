@@ -0,0 +1,230 @@
+import asyncio
+import uuid
+import pytest
+from datetime import date, timedelta
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.config.database import get_db, Base
+from app.models.user import User
+from app.models.customer import Customer
+from app.models.financial import (
+    FinancialAccount, FinancialTransaction, AccountType, TransactionType, TransactionStatus
+)
+from app.utils.broadcast import kpi_broadcaster
+from app.utils.kpis import cached_dashboard_kpis
+from app.utils.security import get_current_active_user
+
+# Configurar banco de dados de teste
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_dashboard.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+client = TestClient(app)
+
+@pytest.fixture(scope="module")
+def setup_database():
+    Base.metadata.create_all(bind=engine)
+    app.dependency_overrides[get_db] = override_get_db
+    yield
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_current_active_user, None)
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def test_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture
+def company_user(setup_database):
+    user = User(
+        id=str(uuid.uuid4()),
+        email="dashboard@teste.com",
+        first_name="Usuario",
+        last_name="Dashboard",
+        is_active=True,
+        company_id=uuid.uuid4()
+    )
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    return user
+
+@pytest.fixture
+def account(test_db, company_user):
+    account = FinancialAccount(
+        company_id=company_user.company_id,
+        name="Conta Teste",
+        type=AccountType.BANK
+    )
+    test_db.add(account)
+    test_db.commit()
+    test_db.refresh(account)
+    return account
+
+def add_transaction(db, account, type, amount, status, due_date, payment_date=None):
+    transaction = FinancialTransaction(
+        company_id=account.company_id,
+        account_id=account.id,
+        type=type,
+        description="Transação Teste",
+        amount=Decimal(amount),
+        due_date=due_date,
+        payment_date=payment_date,
+        status=status
+    )
+    db.add(transaction)
+    db.commit()
+    return transaction
+
+class QueryCounter:
+    def __init__(self, bind):
+        self.bind = bind
+        self.count = 0
+
+    def _callback(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.bind, "before_cursor_execute", self._callback)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.bind, "before_cursor_execute", self._callback)
+
+def test_kpis_values(test_db, company_user, account):
+    """Teste dos valores agregados dos KPIs"""
+    today = date.today()
+    prev_month = today.replace(day=1) - timedelta(days=1)
+
+    add_transaction(test_db, account, TransactionType.INCOME, "1000", TransactionStatus.PAID, today, today)
+    add_transaction(test_db, account, TransactionType.INCOME, "500", TransactionStatus.PAID, prev_month, prev_month)
+    add_transaction(test_db, account, TransactionType.EXPENSE, "300", TransactionStatus.PAID, today, today)
+    add_transaction(test_db, account, TransactionType.INCOME, "200", TransactionStatus.PENDING, today + timedelta(days=10))
+    add_transaction(test_db, account, TransactionType.EXPENSE, "50", TransactionStatus.PENDING, today + timedelta(days=90))
+    test_db.add(Customer(company_id=str(company_user.company_id), name="Cliente", document="12345678901"))
+    test_db.commit()
+
+    response = client.get("/api/v1/dashboard/kpis")
+
+    assert response.status_code == 200
+    data = response.json()
+    kpis = data["financial_kpis"]
+    assert kpis["revenue"]["current"] == 1000
+    assert kpis["revenue"]["previous"] == 500
+    assert kpis["revenue"]["variation"] == 100
+    assert kpis["expenses"]["current"] == 300
+    assert kpis["profit"]["current"] == 700
+    assert kpis["margin"]["current"] == 70
+    assert kpis["accounts_receivable"] == 200
+    assert kpis["accounts_payable"] == 50
+    assert kpis["projected_cash_flow"] == 200
+    assert data["counters"] == {"customers": 1, "suppliers": 0, "invoices": 0, "billings": 0}
+    assert data["period"]["current_month"] == today.strftime("%Y-%m")
+
+def test_kpis_single_query(test_db, company_user, account):
+    """Teste de que os KPIs são calculados em uma única consulta"""
+    add_transaction(test_db, account, TransactionType.INCOME, "100", TransactionStatus.PAID, date.today(), date.today())
+
+    with QueryCounter(engine) as counter:
+        response = client.get("/api/v1/dashboard/kpis")
+
+    assert response.status_code == 200
+    assert counter.count == 1
+
+def test_kpis_empty_company(company_user):
+    """Teste de KPIs para empresa sem movimentação"""
+    response = client.get("/api/v1/dashboard/kpis")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["financial_kpis"]["revenue"]["current"] == 0
+    assert data["financial_kpis"]["margin"]["current"] == 0
+    assert data["counters"]["customers"] == 0
+
+def test_kpis_cache_invalidated_on_write(test_db, company_user, account):
+    """Teste do cache de KPIs e da invalidação por gravação"""
+    add_transaction(test_db, account, TransactionType.INCOME, "100", TransactionStatus.PAID, date.today(), date.today())
+
+    first = client.get("/api/v1/dashboard/kpis").json()
+    with QueryCounter(engine) as counter:
+        cached = client.get("/api/v1/dashboard/kpis").json()
+    assert counter.count == 0
+    assert cached == first
+
+    add_transaction(test_db, account, TransactionType.INCOME, "50", TransactionStatus.PAID, date.today(), date.today())
+
+    refreshed = client.get("/api/v1/dashboard/kpis").json()
+    assert refreshed["financial_kpis"]["revenue"]["current"] == 150
+
+    stats = {cache["name"]: cache for cache in client.get("/api/v1/dashboard/cache/stats").json()}
+    assert stats["dashboard_kpis"]["hits"] >= 1
+    assert stats["dashboard_kpis"]["misses"] >= 2
+
+def test_timeseries_zero_fills_periods(test_db, company_user, account):
+    """Teste da série temporal agrupada por mês e por semana"""
+    today = date.today()
+    prev_month = today.replace(day=1) - timedelta(days=1)
+
+    add_transaction(test_db, account, TransactionType.INCOME, "400", TransactionStatus.PAID, today, today)
+    add_transaction(test_db, account, TransactionType.EXPENSE, "100", TransactionStatus.PAID, today, today)
+    add_transaction(test_db, account, TransactionType.INCOME, "250", TransactionStatus.PAID, prev_month, prev_month)
+    add_transaction(test_db, account, TransactionType.INCOME, "999", TransactionStatus.PENDING, today)
+
+    with QueryCounter(engine) as counter:
+        response = client.get("/api/v1/dashboard/timeseries?months=3")
+    assert counter.count == 1
+
+    data = response.json()
+    assert len(data["periods"]) == 3
+    assert data["periods"][-1] == today.strftime("%Y-%m")
+    assert data["income"] == [0.0, 250.0, 400.0]
+    assert data["expense"] == [0.0, 0.0, 100.0]
+    assert data["profit"] == [0.0, 250.0, 300.0]
+    assert data["margin"] == [0.0, 100.0, 75.0]
+
+    weekly = client.get("/api/v1/dashboard/timeseries?months=1&granularity=week").json()
+    week_start = (today - timedelta(days=today.weekday())).isoformat()
+    position = weekly["periods"].index(week_start)
+    assert weekly["income"][position] == 400.0
+    assert sum(weekly["income"]) == 400.0
+
+def test_broadcaster_pushes_kpi_deltas(test_db, company_user, account):
+    """Teste do fan-out de deltas de KPIs para os assinantes da empresa"""
+    company_id = company_user.company_id
+
+    async def scenario():
+        snapshot = cached_dashboard_kpis(test_db, company_id)
+        first = kpi_broadcaster.subscribe(company_id, snapshot, engine)
+        second = kpi_broadcaster.subscribe(company_id, snapshot, engine)
+        try:
+            add_transaction(test_db, account, TransactionType.INCOME, "100", TransactionStatus.PAID, date.today(), date.today())
+            kpi_broadcaster.publish(company_id)
+            kpi_broadcaster.publish(company_id)
+            return (
+                await asyncio.wait_for(first.get(), timeout=5),
+                await asyncio.wait_for(second.get(), timeout=5),
+            )
+        finally:
+            kpi_broadcaster.unsubscribe(company_id, first)
+            kpi_broadcaster.unsubscribe(company_id, second)
+
+    first_event, second_event = asyncio.run(scenario())
+
+    assert first_event == second_event
+    event, delta = first_event
+    assert event == "kpis-delta"
+    assert delta["financial_kpis"]["revenue"]["current"] == 100
+    assert "counters" not in delta
+    assert kpi_broadcaster.subscriber_count(company_id) == 0
@@ -0,0 +1,919 @@
+import csv
+import io
+import json
+import uuid
+import pytest
+from datetime import date, timedelta
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.config.database import get_db, Base
+from app.config.settings import settings
+from app.models.user import User
+from app.models.financial import (
+    FinancialAccount, FinancialCategory, CostCenter, CostCenterMonthlyRollup, FinancialMonthlyRollup,
+    FinancialTransaction, AccountBalanceSnapshot, AccountType, CategoryType, TransactionType, TransactionStatus
+)
+from app.utils import reports
+from app.utils.cache import company_key
+from app.utils.balances import JOB_NAME as BALANCE_SNAPSHOT_JOB, run_balance_snapshots, take_balance_snapshots
+from app.models.sales import Recurrence, RecurrenceType, RecurrenceFrequency
+from app.utils.ledger import (
+    TransactionState, rebuild_cost_center_rollups, rebuild_monthly_rollups, record_transaction_changes
+)
+from app.utils.recurrences import materialize_recurrences
+from app.utils.periods import add_months, month_key
+from app.utils.overdue import JOB_NAME as OVERDUE_JOB, run_overdue_sweep
+from app.utils.scheduler import job_lock
+from app.utils.taxes import calculate_simples_nacional, calculate_lucro_presumido
+from app.utils.security import get_current_active_user
+
+# Configurar banco de dados de teste
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_financial.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+client = TestClient(app)
+
+@pytest.fixture(scope="module")
+def setup_database():
+    Base.metadata.create_all(bind=engine)
+    app.dependency_overrides[get_db] = override_get_db
+    yield
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_current_active_user, None)
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def test_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture
+def company_user(setup_database):
+    user = User(
+        id=str(uuid.uuid4()),
+        email="financeiro@teste.com",
+        first_name="Usuario",
+        last_name="Financeiro",
+        is_active=True,
+        company_id=uuid.uuid4()
+    )
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    return user
+
+@pytest.fixture
+def account(test_db, company_user):
+    account = FinancialAccount(
+        company_id=company_user.company_id,
+        name="Conta Teste",
+        type=AccountType.BANK
+    )
+    test_db.add(account)
+    test_db.commit()
+    test_db.refresh(account)
+    return account
+
+def transaction_payload(account, **overrides):
+    payload = {
+        "description": "Transação Teste",
+        "amount": "100.00",
+        "due_date": date.today().isoformat(),
+        "type": "income",
+        "account_id": str(account.id),
+        "company_id": str(account.company_id)
+    }
+    payload.update(overrides)
+    return payload
+
+class QueryCounter:
+    def __init__(self, bind):
+        self.bind = bind
+        self.count = 0
+
+    def _callback(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.bind, "before_cursor_execute", self._callback)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.bind, "before_cursor_execute", self._callback)
+
+def walk_pages(url, limit, max_pages=50, **params):
+    """Percorre todas as páginas de uma listagem por cursor e retorna os ids na ordem"""
+    ids = []
+    cursor = None
+    for _ in range(max_pages):
+        response = client.get(url, params=dict(params, limit=limit, **({"cursor": cursor} if cursor else {})))
+        assert response.status_code == 200
+        ids.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+    raise AssertionError(f"cursor did not reach the last page after {max_pages} pages")
+
+def rollups_for(db, company_id):
+    rows = db.query(FinancialMonthlyRollup).filter(
+        FinancialMonthlyRollup.company_id == company_id,
+        FinancialMonthlyRollup.transaction_count != 0
+    ).all()
+    return {
+        (row.period, row.type, row.status): (Decimal(str(row.total_amount)), row.transaction_count)
+        for row in rows
+    }
+
+def test_rollups_follow_transaction_lifecycle(test_db, company_user, account):
+    """Teste de manutenção incremental dos agregados mensais"""
+    today = date.today()
+    period = today.strftime("%Y-%m")
+    next_period = (today.replace(day=1) + timedelta(days=32)).strftime("%Y-%m")
+
+    response = client.post("/api/v1/financial/transactions/", json=transaction_payload(account))
+    assert response.status_code == 200
+    transaction_id = response.json()["id"]
+
+    client.post("/api/v1/financial/transactions/", json=transaction_payload(account, amount="40.00", type="expense"))
+
+    assert rollups_for(test_db, company_user.company_id) == {
+        (period, TransactionType.INCOME, TransactionStatus.PENDING): (Decimal("100.00"), 1),
+        (period, TransactionType.EXPENSE, TransactionStatus.PENDING): (Decimal("40.00"), 1),
+    }
+
+    # Alterar valor e vencimento move a transação para outro mês
+    client.put(
+        f"/api/v1/financial/transactions/{transaction_id}",
+        json={"amount": "150.00", "due_date": (today.replace(day=1) + timedelta(days=32)).isoformat()}
+    )
+    test_db.expire_all()
+    assert rollups_for(test_db, company_user.company_id) == {
+        (next_period, TransactionType.INCOME, TransactionStatus.PENDING): (Decimal("150.00"), 1),
+        (period, TransactionType.EXPENSE, TransactionStatus.PENDING): (Decimal("40.00"), 1),
+    }
+
+    # Pagamento usa o mês da data de pagamento
+    client.post(f"/api/v1/financial/transactions/{transaction_id}/pay")
+    test_db.expire_all()
+    assert rollups_for(test_db, company_user.company_id) == {
+        (period, TransactionType.INCOME, TransactionStatus.PAID): (Decimal("150.00"), 1),
+        (period, TransactionType.EXPENSE, TransactionStatus.PENDING): (Decimal("40.00"), 1),
+    }
+
+    client.delete(f"/api/v1/financial/transactions/{transaction_id}")
+    test_db.expire_all()
+    incremental = rollups_for(test_db, company_user.company_id)
+    assert incremental == {
+        (period, TransactionType.EXPENSE, TransactionStatus.PENDING): (Decimal("40.00"), 1),
+    }
+
+    # A reconstrução deve chegar ao mesmo resultado
+    rebuild_monthly_rollups(test_db, company_user.company_id)
+    test_db.commit()
+    assert rollups_for(test_db, company_user.company_id) == incremental
+
+def test_list_transactions_cursor_pagination(company_user, account):
+    """Teste de paginação por cursor estável em (vencimento, id)"""
+    today = date.today()
+    for offset in [3, 1, 4, 1, 5]:
+        client.post(
+            "/api/v1/financial/transactions/",
+            json=transaction_payload(account, due_date=(today + timedelta(days=offset)).isoformat())
+        )
+
+    first = client.get("/api/v1/financial/transactions/?limit=2")
+    assert first.status_code == 200
+    assert "X-Prev-Cursor" not in first.headers
+
+    seen = [item["id"] for item in first.json()]
+    cursor = first.headers["X-Next-Cursor"]
+    pages = [first.json()]
+    while cursor:
+        response = client.get(f"/api/v1/financial/transactions/?limit=2&cursor={cursor}")
+        pages.append(response.json())
+        seen.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+
+    assert len(seen) == len(set(seen)) == 5
+    due_dates = [item["due_date"] for page in pages for item in page]
+    assert due_dates == sorted(due_dates)
+
+    # Voltar a partir da última página retorna a página anterior
+    previous = client.get(f"/api/v1/financial/transactions/?limit=2&cursor={response.headers['X-Prev-Cursor']}")
+    assert [item["id"] for item in previous.json()] == [item["id"] for item in pages[1]]
+
+def test_list_transactions_created_at_cursor_after_bulk_insert(company_user, account):
+    """Teste de paginação por (created_at, id) com transações inseridas em lote"""
+    items = [transaction_payload(account, amount=f"{index + 1}.00") for index in range(12)]
+    created = client.post("/api/v1/financial/transactions/bulk", json={"items": items}).json()["created_ids"]
+
+    for sort in ("created_at", "-created_at"):
+        ids = walk_pages("/api/v1/financial/transactions/", 5, sort=sort, expand="")
+        assert len(ids) == len(set(ids)) == 12
+        assert set(ids) == set(created)
+
+def test_list_transactions_invalid_cursor(company_user):
+    """Teste de cursor inválido"""
+    response = client.get("/api/v1/financial/transactions/?cursor=invalido")
+    assert response.status_code == 400
+
+def test_list_transactions_filters_and_sort(company_user, account):
+    """Teste de filtros e ordenação da listagem de transações"""
+    for amount, type in [("10.00", "income"), ("250.00", "expense"), ("80.00", "expense"), ("500.00", "income")]:
+        client.post("/api/v1/financial/transactions/", json=transaction_payload(account, amount=amount, type=type))
+
+    response = client.get("/api/v1/financial/transactions/?type=expense&sort=-amount")
+    assert [item["amount"] for item in response.json()] == ["250.00", "80.00"]
+
+    response = client.get("/api/v1/financial/transactions/?min_amount=50&max_amount=300&sort=amount")
+    assert [item["amount"] for item in response.json()] == ["80.00", "250.00"]
+
+    response = client.get("/api/v1/financial/transactions/?status=paid")
+    assert response.json() == []
+
+def test_list_transactions_batches_relations(test_db, company_user, account):
+    """Teste de que os relacionamentos são carregados em lote, sem N+1"""
+    for index in range(5):
+        category = FinancialCategory(company_id=company_user.company_id, name=f"Categoria {index}", type=CategoryType.INCOME)
+        cost_center = CostCenter(company_id=company_user.company_id, name=f"Centro {index}")
+        test_db.add_all([category, cost_center])
+        test_db.commit()
+        client.post(
+            "/api/v1/financial/transactions/",
+            json=transaction_payload(account, category_id=str(category.id), cost_center_id=str(cost_center.id))
+        )
+
+    with QueryCounter(engine) as counter:
+        response = client.get("/api/v1/financial/transactions/")
+    data = response.json()
+    assert len(data) == 5
+    assert all(item["account"]["id"] == str(account.id) for item in data)
+    assert {item["category"]["name"] for item in data} == {f"Categoria {i}" for i in range(5)}
+    # Transações + uma consulta por relacionamento, independente do número de linhas
+    assert counter.count == 4
+
+    with QueryCounter(engine) as counter:
+        response = client.get("/api/v1/financial/transactions/?expand=")
+    assert counter.count == 1
+    assert all(item["account"] is None and item["category"] is None for item in response.json())
+
+    transaction_id = data[0]["id"]
+    with QueryCounter(engine) as counter:
+        response = client.get(f"/api/v1/financial/transactions/{transaction_id}?expand=category")
+    assert counter.count == 2
+    assert response.json()["category"] is not None
+    assert response.json()["cost_center"] is None
+
+    assert client.get("/api/v1/financial/transactions/?expand=invoices").status_code == 400
+
+def test_bulk_create_transactions(test_db, company_user, account):
+    """Teste de criação em lote, com e sem modo parcial"""
+    items = [transaction_payload(account, amount=f"{i + 1}.00") for i in range(50)]
+    items[10]["amount"] = "-5.00"
+    items[20]["account_id"] = str(uuid.uuid4())
+
+    response = client.post("/api/v1/financial/transactions/bulk", json={"items": items})
+    assert response.status_code == 422
+    assert [error["index"] for error in response.json()["detail"]] == [10, 20]
+    assert client.get("/api/v1/financial/transactions/").json() == []
+
+    with QueryCounter(engine) as counter:
+        response = client.post("/api/v1/financial/transactions/bulk", json={"items": items, "partial": True})
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["created_ids"]) == 48
+    assert [error["index"] for error in data["errors"]] == [10, 20]
+    # Validação e inserção não crescem com o número de itens
+    assert counter.count <= 5
+
+    listed = client.get("/api/v1/financial/transactions/?limit=1000&expand=").json()
+    assert {item["id"] for item in listed} == set(data["created_ids"])
+
+    period = date.today().strftime("%Y-%m")
+    expected = sum(Decimal(f"{i + 1}.00") for i in range(50) if i not in (10, 20))
+    assert rollups_for(test_db, company_user.company_id) == {
+        (period, TransactionType.INCOME, TransactionStatus.PENDING): (expected, 48),
+    }
+
+def test_bulk_pay_and_status(test_db, company_user, account):
+    """Teste de pagamento e alteração de status em lote"""
+    items = [transaction_payload(account, amount="10.00") for _ in range(6)]
+    ids = client.post("/api/v1/financial/transactions/bulk", json={"items": items}).json()["created_ids"]
+    payment_date = date.today().replace(day=1)
+
+    with QueryCounter(engine) as counter:
+        response = client.post(
+            "/api/v1/financial/transactions/bulk-pay",
+            json={"ids": ids[:4] + [str(uuid.uuid4())], "payment_date": payment_date.isoformat()}
+        )
+    assert response.json() == {"requested": 5, "matched": 4, "affected": 4}
+    # SELECT dos estados, um UPDATE, o upsert dos agregados e o saldo (snapshots e conta)
+    assert counter.count == 5
+
+    # Repetir o pagamento não altera nada
+    response = client.post("/api/v1/financial/transactions/bulk-pay", json={"ids": ids[:4]})
+    assert response.json()["affected"] == 0
+
+    paid = client.get("/api/v1/financial/transactions/?status=paid&expand=").json()
+    assert {item["id"] for item in paid} == set(ids[:4])
+    assert {item["payment_date"] for item in paid} == {payment_date.isoformat()}
+
+    # Status "pago" em lote não reescreve a data das transações já pagas
+    response = client.post(
+        "/api/v1/financial/transactions/bulk-status",
+        json={"ids": ids[2:], "status": "paid"}
+    )
+    assert response.json() == {"requested": 4, "matched": 4, "affected": 2}
+    paid = {item["id"]: item for item in client.get("/api/v1/financial/transactions/?status=paid&expand=").json()}
+    assert {paid[id]["payment_date"] for id in ids[2:4]} == {payment_date.isoformat()}
+    assert {paid[id]["payment_date"] for id in ids[4:]} == {date.today().isoformat()}
+
+    response = client.post(
+        "/api/v1/financial/transactions/bulk-status",
+        json={"ids": ids[:2], "status": "pending"}
+    )
+    assert response.json()["affected"] == 2
+
+    period = date.today().strftime("%Y-%m")
+    test_db.expire_all()
+    assert rollups_for(test_db, company_user.company_id) == {
+        (period, TransactionType.INCOME, TransactionStatus.PAID): (Decimal("40.00"), 4),
+        (period, TransactionType.INCOME, TransactionStatus.PENDING): (Decimal("20.00"), 2),
+    }
+    rebuild_monthly_rollups(test_db, company_user.company_id)
+    test_db.commit()
+    assert rollups_for(test_db, company_user.company_id) == {
+        (period, TransactionType.INCOME, TransactionStatus.PAID): (Decimal("40.00"), 4),
+        (period, TransactionType.INCOME, TransactionStatus.PENDING): (Decimal("20.00"), 2),
+    }
+
+def test_export_transactions_streams_batches(company_user, account, monkeypatch):
+    """Teste de exportação em CSV e NDJSON lida em lotes"""
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 4)
+    items = [transaction_payload(account, amount=f"{i + 1}.00", type="income" if i % 2 else "expense") for i in range(10)]
+    client.post("/api/v1/financial/transactions/bulk", json={"items": items})
+
+    response = client.get("/api/v1/financial/transactions/export?format=csv&sort=amount")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["amount"] for row in rows] == [f"{i + 1}.00" for i in range(10)]
+    assert {row["type"] for row in rows} == {"income", "expense"}
+
+    response = client.get("/api/v1/financial/transactions/export?format=ndjson&type=income")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 5
+    assert all(line["type"] == "income" and line["status"] == "pending" for line in lines)
+    assert lines[0]["account_id"] == str(account.id)
+
+def test_account_balance_follows_payments(test_db, company_user, account):
+    """Teste de saldo mantido pelos pagamentos e consultado em uma data"""
+    today = date.today()
+    account.balance = Decimal("1000.00")
+    test_db.commit()
+
+    def balance(as_of=None):
+        url = f"/api/v1/financial/accounts/{account.id}/balance"
+        if as_of:
+            url += f"?as_of={as_of.isoformat()}"
+        return Decimal(client.get(url).json()["balance"])
+
+    income = client.post("/api/v1/financial/transactions/", json=transaction_payload(account, amount="300.00")).json()["id"]
+    expense = client.post("/api/v1/financial/transactions/", json=transaction_payload(account, amount="120.00", type="expense")).json()["id"]
+    client.post("/api/v1/financial/transactions/", json=transaction_payload(account, amount="999.00"))
+    assert balance() == Decimal("1000.00")
+
+    client.put(f"/api/v1/financial/transactions/{income}", json={"status": "paid", "payment_date": (today - timedelta(days=10)).isoformat()})
+    client.post("/api/v1/financial/transactions/bulk-pay", json={"ids": [expense], "payment_date": (today - timedelta(days=5)).isoformat()})
+    assert balance() == Decimal("1180.00")
+
+    # Sem snapshots: parte do saldo atual
+    assert balance(today - timedelta(days=11)) == Decimal("1000.00")
+    assert balance(today - timedelta(days=7)) == Decimal("1300.00")
+
+    take_balance_snapshots(test_db, today - timedelta(days=7))
+    test_db.commit()
+
+    # Pagamento retroativo desloca o snapshot posterior
+    client.put(f"/api/v1/financial/transactions/{income}", json={"amount": "350.00"})
+    assert balance() == Decimal("1230.00")
+    with QueryCounter(engine) as counter:
+        assert balance(today - timedelta(days=6)) == Decimal("1350.00")
+    # Conta, snapshot e varredura desde o snapshot
+    assert counter.count == 3
+    assert balance(today) == Decimal("1230.00")
+
+    client.delete(f"/api/v1/financial/transactions/{expense}")
+    assert balance() == Decimal("1350.00")
+    assert balance(today - timedelta(days=7)) == Decimal("1350.00")
+
+    # Ajuste manual desloca todo o histórico
+    client.put(f"/api/v1/financial/accounts/{account.id}", json={"balance": "1400.00"})
+    assert balance(today - timedelta(days=7)) == Decimal("1400.00")
+    assert balance(today - timedelta(days=11)) == Decimal("1050.00")
+
+def test_transaction_references_must_belong_to_company(test_db, company_user, account):
+    """Teste: transação avulsa não pode apontar para conta de outra empresa"""
+    foreign = FinancialAccount(company_id=uuid.uuid4(), name="Outra empresa", type=AccountType.BANK, balance=Decimal("1000.00"))
+    foreign_category = FinancialCategory(company_id=foreign.company_id, name="Alheia", type=CategoryType.EXPENSE)
+    test_db.add_all([foreign, foreign_category])
+    test_db.commit()
+
+    response = client.post("/api/v1/financial/transactions/", json=transaction_payload(
+        account, type="expense", amount="500.00", account_id=str(foreign.id)
+    ))
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Account not found"
+
+    transaction_id = client.post("/api/v1/financial/transactions/", json=transaction_payload(account)).json()["id"]
+    for field, value in (("account_id", foreign.id), ("category_id", foreign_category.id)):
+        response = client.put(f"/api/v1/financial/transactions/{transaction_id}", json={field: str(value), "status": "paid"})
+        assert response.status_code == 404
+
+    # O UPDATE de saldo do ledger também filtra pela empresa da transação
+    paid = TransactionState(
+        company_id=company_user.company_id, account_id=foreign.id, type=TransactionType.EXPENSE,
+        status=TransactionStatus.PAID, amount=Decimal("500.00"), due_date=date.today(), payment_date=date.today()
+    )
+    record_transaction_changes(test_db, [(None, paid)])
+    test_db.commit()
+
+    test_db.refresh(foreign)
+    assert Decimal(str(foreign.balance)) == Decimal("1000.00")
+    assert client.get(f"/api/v1/financial/transactions/{transaction_id}").json()["status"] == "pending"
+
+def test_balance_history_columnar(test_db, company_user, account):
+    """Teste da série diária de saldos de todas as contas"""
+    today = date.today()
+    cash = FinancialAccount(company_id=company_user.company_id, name="Caixa", type=AccountType.CASH, balance=Decimal("50.00"))
+    test_db.add(cash)
+    account.balance = Decimal("1000.00")
+    test_db.commit()
+
+    payments = [
+        (account, "100.00", "income", 3),
+        (account, "30.50", "expense", 1),
+        (cash, "20.00", "expense", 2),
+        (account, "7.00", "income", 0),
+    ]
+    for target, amount, type, days_ago in payments:
+        transaction_id = client.post(
+            "/api/v1/financial/transactions/", json=transaction_payload(target, amount=amount, type=type)
+        ).json()["id"]
+        client.put(
+            f"/api/v1/financial/transactions/{transaction_id}",
+            json={"status": "paid", "payment_date": (today - timedelta(days=days_ago)).isoformat()}
+        )
+
+    start = today - timedelta(days=4)
+    response = client.get(f"/api/v1/financial/accounts/balance-history?from={start.isoformat()}&to={today.isoformat()}")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["dates"] == [(start + timedelta(days=i)).isoformat() for i in range(5)]
+    assert [item["name"] for item in data["accounts"]] == ["Caixa", "Conta Teste"]
+    assert data["balances"] == [
+        [50.0, 50.0, 30.0, 30.0, 30.0],
+        [1000.0, 1100.0, 1100.0, 1069.5, 1076.5],
+    ]
+
+    response = client.get(f"/api/v1/financial/accounts/balance-history?from={today.isoformat()}&to={start.isoformat()}")
+    assert response.status_code == 400
+
+def test_overdue_sweep(test_db, company_user, account):
+    """Teste da varredura de vencidas: status, agregados, lock e KPIs"""
+    today = date.today()
+    late = today - timedelta(days=40)
+    for due_date, amount in [(late, "70.00"), (today - timedelta(days=1), "30.00"), (today, "5.00")]:
+        client.post("/api/v1/financial/transactions/", json=transaction_payload(account, amount=amount, due_date=due_date.isoformat()))
+    paid = client.post("/api/v1/financial/transactions/", json=transaction_payload(account, due_date=late.isoformat())).json()["id"]
+    client.post(f"/api/v1/financial/transactions/{paid}/pay")
+
+    # Outro worker com o lock: a execução é pulada
+    holder = TestingSessionLocal()
+    try:
+        with job_lock(holder, OVERDUE_JOB) as acquired:
+            assert acquired
+            assert run_overdue_sweep(TestingSessionLocal) is None
+    finally:
+        holder.close()
+
+    assert run_overdue_sweep(TestingSessionLocal) == 2
+    assert run_overdue_sweep(TestingSessionLocal) == 0
+
+    overdue = client.get("/api/v1/financial/transactions/?status=overdue&expand=").json()
+    assert sorted(item["amount"] for item in overdue) == ["30.00", "70.00"]
+
+    incremental = rollups_for(test_db, company_user.company_id)
+    assert incremental[(late.strftime("%Y-%m"), TransactionType.INCOME, TransactionStatus.OVERDUE)] == (Decimal("70.00"), 1)
+    rebuild_monthly_rollups(test_db, company_user.company_id)
+    test_db.commit()
+    assert rollups_for(test_db, company_user.company_id) == incremental
+
+    # Vencidas continuam contando como contas a receber
+    kpis = client.get("/api/v1/dashboard/kpis").json()
+    assert kpis["financial_kpis"]["accounts_receivable"] == 105.0
+
+def test_balance_snapshot_job(test_db, company_user, account):
+    """Teste do job diário de snapshots de saldo"""
+    with job_lock(test_db, BALANCE_SNAPSHOT_JOB) as acquired:
+        assert acquired
+        assert run_balance_snapshots(TestingSessionLocal) is None
+
+    assert run_balance_snapshots(TestingSessionLocal) >= 1
+    snapshot = test_db.get(AccountBalanceSnapshot, (account.id, date.today() - timedelta(days=1)))
+    assert snapshot is not None and snapshot.company_id == company_user.company_id
+
+def test_materialize_recurrences_is_idempotent(test_db, company_user, account):
+    """Teste da geração de transações a partir de recorrências"""
+    template = {"description": "Aluguel", "amount": "1500.00", "type": "expense", "account_id": str(account.id)}
+    monthly = Recurrence(
+        company_id=company_user.company_id, type=RecurrenceType.FINANCIAL_TRANSACTION,
+        frequency=RecurrenceFrequency.MONTHLY, start_date=date(2024, 1, 31),
+        next_occurrence=date(2024, 1, 31), details=template
+    )
+    weekly = Recurrence(
+        company_id=company_user.company_id, type=RecurrenceType.FINANCIAL_TRANSACTION,
+        frequency=RecurrenceFrequency.WEEKLY, start_date=date(2024, 3, 1), end_date=date(2024, 3, 20),
+        next_occurrence=date(2024, 3, 1), details=dict(template, description="Diarista", amount="200.00")
+    )
+    invalid = Recurrence(
+        company_id=company_user.company_id, type=RecurrenceType.FINANCIAL_TRANSACTION,
+        frequency=RecurrenceFrequency.DAILY, start_date=date(2024, 1, 1),
+        next_occurrence=date(2024, 1, 1), details={"description": "Sem valor"}
+    )
+    foreign_account = FinancialAccount(company_id=uuid.uuid4(), name="Outra empresa", type=AccountType.BANK)
+    test_db.add(foreign_account)
+    test_db.flush()
+    foreign = Recurrence(
+        company_id=company_user.company_id, type=RecurrenceType.FINANCIAL_TRANSACTION,
+        frequency=RecurrenceFrequency.MONTHLY, start_date=date(2024, 1, 10),
+        next_occurrence=date(2024, 1, 10), details=dict(template, account_id=str(foreign_account.id))
+    )
+    test_db.add_all([monthly, weekly, invalid, foreign])
+    test_db.commit()
+
+    with QueryCounter(engine) as counter:
+        stats = materialize_recurrences(test_db, horizon=date(2024, 4, 30), batch_size=10)
+    test_db.commit()
+    assert (stats["created"], stats["existing"], stats["invalid"]) == (7, 0, 2)
+    # Recorrências, contas do lote, avanço das puladas, existentes, INSERT, agregados e avanço das demais
+    assert counter.count == 7
+    assert test_db.query(FinancialTransaction).filter(FinancialTransaction.recurrence_id == foreign.id).count() == 0
+    # Recorrências puladas avançam até depois do horizonte e não voltam na próxima execução
+    test_db.refresh(foreign)
+    test_db.refresh(invalid)
+    assert foreign.next_occurrence == date(2024, 5, 10)
+    assert invalid.next_occurrence == date(2024, 5, 1)
+    assert materialize_recurrences(test_db, horizon=date(2024, 4, 30))["invalid"] == 0
+
+    rows = test_db.query(FinancialTransaction).filter(FinancialTransaction.recurrence_id == monthly.id).all()
+    assert sorted(row.due_date for row in rows) == [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)]
+    assert all(row.is_recurring and row.status == TransactionStatus.PENDING for row in rows)
+    test_db.refresh(monthly)
+    test_db.refresh(weekly)
+    assert monthly.next_occurrence == date(2024, 5, 31)
+    assert weekly.next_occurrence == date(2024, 3, 22)
+
+    # Nova execução não gera nada; voltar next_occurrence (falha no meio) também não duplica
+    assert materialize_recurrences(test_db, horizon=date(2024, 4, 30))["created"] == 0
+    monthly.next_occurrence = date(2024, 1, 31)
+    test_db.commit()
+    stats = materialize_recurrences(test_db, horizon=date(2024, 5, 31))
+    test_db.commit()
+    assert (stats["created"], stats["existing"]) == (1, 4)
+
+    assert rollups_for(test_db, company_user.company_id)[("2024-03", TransactionType.EXPENSE, TransactionStatus.PENDING)] == (Decimal("2100.00"), 4)
+
+def test_batch_tax_simulation(test_db, company_user):
+    """Teste da simulação vetorizada: paridade com a unitária, equilíbrio e modo efêmero"""
+    revenues = [str(value) for value in range(50000, 4000001, 50000)]
+
+    response = client.post("/api/v1/financial/taxes/simulate/batch", json={"revenues": revenues, "ephemeral": True})
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["revenue"]) == len(revenues)
+
+    for index in (0, 3, 17, 40, 79):
+        revenue = Decimal(revenues[index])
+        assert data["simples_nacional"]["total_tax"][index] == pytest.approx(calculate_simples_nacional(revenue)["total_tax"])
+        assert data["lucro_presumido"]["total_tax"][index] == pytest.approx(calculate_lucro_presumido(revenue)["total_tax"])
+
+    # Cada equilíbrio fica entre dois pontos em que o regime mais barato muda
+    assert data["breakeven"]
+    for breakeven in data["breakeven"]:
+        below = max(i for i, r in enumerate(data["revenue"]) if r <= breakeven["revenue"])
+        assert data["best_regime"][below] == breakeven["cheaper_below"]
+        assert data["best_regime"][below + 1] == breakeven["cheaper_above"]
+
+    assert client.get("/api/v1/financial/taxes/simulations/").json() == []
+
+    client.post("/api/v1/financial/taxes/simulate/batch", json={"revenues": revenues[:3]})
+    simulations = client.get("/api/v1/financial/taxes/simulations/").json()
+    assert len(simulations) == 6
+    assert {item["tax_regime"] for item in simulations} == {"simples_nacional", "lucro_presumido"}
+
+    response = client.post("/api/v1/financial/taxes/simulate/batch", json={"revenues": ["0"]})
+    assert response.status_code == 422
+
+def test_tax_simulations_cursor_walks_every_page(company_user):
+    """Teste de paginação por (created_at, id) com várias simulações no mesmo segundo"""
+    created = [
+        client.post("/api/v1/financial/taxes/simulate", json={
+            "company_id": str(company_user.company_id), "revenue": str(100000 + index), "tax_regime": "simples_nacional"
+        }).json()["id"]
+        for index in range(10)
+    ]
+
+    ids = walk_pages("/api/v1/financial/taxes/simulations/", 3)
+    assert len(ids) == len(set(ids)) == 10
+    assert set(ids) == set(created)
+
+def test_tax_projection_uses_rbt12(test_db, company_user, account):
+    """Teste da projeção do Simples Nacional pela RBT12 e do cache por receitas pagas"""
+    this_month = date.today().replace(day=1)
+
+    def month_start(offset):
+        return add_months(this_month, offset)
+
+    def pay(amount, paid_on, type="income"):
+        transaction_id = client.post(
+            "/api/v1/financial/transactions/", json=transaction_payload(account, amount=amount, type=type)
+        ).json()["id"]
+        client.put(
+            f"/api/v1/financial/transactions/{transaction_id}",
+            json={"status": "paid", "payment_date": paid_on.isoformat()}
+        )
+
+    # 20 mil por mês nos 12 meses anteriores ao mês passado, 30 mil no mês passado
+    for offset in range(-13, -1):
+        pay("20000.00", month_start(offset))
+    pay("30000.00", month_start(-1))
+
+    response = client.get("/api/v1/financial/taxes/projection?months=2")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["periods"] == [month_key(month_start(-1)), month_key(this_month)]
+    assert data["revenue"] == [30000.0, 0.0]
+    assert data["rbt12"] == [240000.0, 250000.0]
+    # Anexo III, 2ª faixa: (240000 x 11,2% - 9360) / 240000 = 7,3%
+    assert data["effective_rate"][0] == 7.3
+    assert data["tax"] == [2190.0, 0.0]
+
+    with QueryCounter(engine) as counter:
+        assert client.get("/api/v1/financial/taxes/projection?months=2").json() == data
+    assert counter.count == 0
+
+    # Despesa paga não muda a projeção; receita paga invalida o cache
+    pay("500.00", this_month, type="expense")
+    with QueryCounter(engine) as counter:
+        client.get("/api/v1/financial/taxes/projection?months=2")
+    assert counter.count == 0
+
+    pay("10000.00", this_month)
+    data = client.get("/api/v1/financial/taxes/projection?months=2").json()
+    assert data["revenue"] == [30000.0, 10000.0]
+
+def test_reference_lists_cache_and_etag(company_user, account):
+    """Teste do cache das listas de cadastro, com ETag e 304"""
+    response = client.get("/api/v1/financial/categories/")
+    assert response.status_code == 200
+    assert response.json() == []
+    etag = response.headers["ETag"]
+
+    with QueryCounter(engine) as counter:
+        cached = client.get("/api/v1/financial/categories/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert counter.count == 0
+
+    # Criação, alteração e exclusão trocam o ETag
+    category = client.post("/api/v1/financial/categories/", json={
+        "name": "Vendas", "type": "income", "company_id": str(company_user.company_id)
+    })
+    assert category.status_code == 200
+    category_id = category.json()["id"]
+    created = client.get("/api/v1/financial/categories/", headers={"If-None-Match": etag})
+    assert created.status_code == 200
+    assert [item["name"] for item in created.json()] == ["Vendas"]
+
+    client.put(f"/api/v1/financial/categories/{category_id}", json={"name": "Serviços"})
+    updated = client.get("/api/v1/financial/categories/", headers={"If-None-Match": created.headers["ETag"]})
+    assert [item["name"] for item in updated.json()] == ["Serviços"]
+
+    assert client.delete(f"/api/v1/financial/categories/{category_id}").status_code == 200
+    assert client.get("/api/v1/financial/categories/").headers["ETag"] == etag
+
+    # Saldo alterado por pagamento invalida a lista de contas
+    accounts = client.get("/api/v1/financial/accounts/")
+    assert [item["name"] for item in accounts.json()] == ["Conta Teste"]
+    transaction_id = client.post(
+        "/api/v1/financial/transactions/", json=transaction_payload(account)
+    ).json()["id"]
+    client.put(f"/api/v1/financial/transactions/{transaction_id}", json={"status": "paid"})
+    paid = client.get("/api/v1/financial/accounts/", headers={"If-None-Match": accounts.headers["ETag"]})
+    assert paid.status_code == 200
+    assert Decimal(str(paid.json()[0]["balance"])) == Decimal("100.00")
+
+def test_dre_report_caches_closed_months(test_db, company_user, account):
+    """Teste da DRE por categoria e centro de custo, com cache dos meses fechados"""
+    this_month = date.today().replace(day=1)
+    sales = FinancialCategory(company_id=company_user.company_id, name="Vendas", type=CategoryType.INCOME)
+    store = CostCenter(company_id=company_user.company_id, name="Loja")
+    test_db.add_all([sales, store])
+    test_db.commit()
+
+    def pay(amount, paid_on, type="income", **fields):
+        transaction_id = client.post(
+            "/api/v1/financial/transactions/", json=transaction_payload(account, amount=amount, type=type, **fields)
+        ).json()["id"]
+        client.put(
+            f"/api/v1/financial/transactions/{transaction_id}",
+            json={"status": "paid", "payment_date": paid_on.isoformat()}
+        )
+
+    pay("1000.00", add_months(this_month, -2), category_id=str(sales.id), cost_center_id=str(store.id))
+    pay("400.00", add_months(this_month, -1), type="expense")
+    pay("250.00", this_month, category_id=str(sales.id))
+
+    params = {"from": add_months(this_month, -2).isoformat(), "to": date.today().isoformat()}
+    report = client.get("/api/v1/financial/reports/dre", params=params).json()
+    assert report["from"] == month_key(add_months(this_month, -2))
+    assert report["revenue"]["total"] == 1250.0
+    [category] = report["revenue"]["categories"]
+    assert (category["name"], category["total"]) == ("Vendas", 1250.0)
+    assert [(item["name"], item["total"]) for item in category["cost_centers"]] == [
+        ("Loja", 1000.0), ("Sem centro de custo", 250.0)
+    ]
+    assert report["expenses"]["categories"][0]["name"] == "Sem categoria"
+    assert report["net_result"] == 850.0
+
+    # Meses fechados vêm do cache: só o mês aberto e os nomes são consultados
+    pay("50.00", this_month)
+    with QueryCounter(engine) as counter:
+        report = client.get("/api/v1/financial/reports/dre", params=params).json()
+    assert counter.count == 3
+    assert report["revenue"]["total"] == 1300.0
+
+    # Pagamento retroativo descarta só o mês afetado
+    pay("100.00", add_months(this_month, -1), type="expense")
+    report = client.get("/api/v1/financial/reports/dre", params=params).json()
+    assert report["expenses"]["total"] == 500.0
+
+    previous = client.get("/api/v1/financial/reports/dre", params={
+        "from": this_month.isoformat(), "to": date.today().isoformat(), "compare": "previous"
+    }).json()
+    assert previous["comparison"]["from"] == month_key(add_months(this_month, -1))
+    assert previous["variance"] == {"revenue": 300.0, "expenses": -500.0, "net_result": 800.0}
+
+    params["to"] = add_months(this_month, -40).isoformat()
+    assert client.get("/api/v1/financial/reports/dre", params=params).status_code == 400
+
+def test_dre_uses_ledger_reference_date(test_db, company_user, account):
+    """Teste da DRE com transação paga sem data de pagamento (mês do vencimento)"""
+    last_month = add_months(date.today().replace(day=1), -1)
+    test_db.add(FinancialTransaction(
+        company_id=company_user.company_id, account_id=account.id, description="Pago sem data",
+        amount=Decimal("70.00"), type=TransactionType.INCOME, due_date=last_month + timedelta(days=4),
+        status=TransactionStatus.PAID, payment_date=None
+    ))
+    test_db.commit()
+
+    params = {"from": last_month.isoformat(), "to": last_month.isoformat()}
+    report = client.get("/api/v1/financial/reports/dre", params=params).json()
+    assert report["revenue"]["total"] == 70.0
+
+def test_dre_cache_skips_month_invalidated_during_query(company_user, monkeypatch):
+    """Teste: mês fora do cache invalidado durante a consulta não fica guardado obsoleto"""
+    last_month = month_key(add_months(date.today().replace(day=1), -1))
+    original = reports._query_month_sums
+
+    def query_with_concurrent_payment(db, company_id, first, last):
+        result = original(db, company_id, first, last)
+        # Pagamento retroativo confirmado por outra sessão enquanto a consulta rodava
+        reports.dre_period_cache.invalidate_period(company_id, last_month)
+        return result
+
+    monkeypatch.setattr(reports, "_query_month_sums", query_with_concurrent_payment)
+    db = TestingSessionLocal()
+    try:
+        reports.monthly_dre_sums(db, company_user.company_id, [last_month])
+    finally:
+        db.close()
+    assert reports.dre_period_cache.get(company_key(company_user.company_id, last_month)) is None
+
+def test_budget_vs_actual_reads_cost_center_rollups(test_db, company_user, account):
+    """Teste do orçado x realizado por centro de custo a partir dos agregados"""
+    this_month = date.today().replace(day=1)
+    last_month = add_months(this_month, -1)
+    rent = FinancialCategory(company_id=company_user.company_id, name="Aluguel", type=CategoryType.EXPENSE)
+    sales = FinancialCategory(company_id=company_user.company_id, name="Vendas", type=CategoryType.INCOME)
+    office = CostCenter(company_id=company_user.company_id, name="Escritório")
+    test_db.add_all([rent, sales, office])
+    test_db.commit()
+
+    def pay(amount, paid_on, type, category):
+        transaction_id = client.post("/api/v1/financial/transactions/", json=transaction_payload(
+            account, amount=amount, type=type, category_id=str(category.id), cost_center_id=str(office.id)
+        )).json()["id"]
+        client.put(
+            f"/api/v1/financial/transactions/{transaction_id}",
+            json={"status": "paid", "payment_date": paid_on.isoformat()}
+        )
+        return transaction_id
+
+    pay("900.00", last_month, "expense", rent)
+    refund = pay("100.00", last_month, "income", rent)
+    pay("1200.00", this_month, "expense", rent)
+    pay("5000.00", this_month, "income", sales)
+    # Pendente: não entra no realizado
+    client.post("/api/v1/financial/transactions/", json=transaction_payload(
+        account, amount="300.00", type="expense", category_id=str(rent.id), cost_center_id=str(office.id)
+    ))
+
+    items = [
+        {"cost_center_id": str(office.id), "category_id": str(rent.id), "month": month_key(month), "amount": "1000.00"}
+        for month in (last_month, this_month)
+    ]
+    response = client.put("/api/v1/financial/budgets/", json={"items": items})
+    assert response.status_code == 200
+    items[1]["amount"] = "1100.00"
+    assert len(client.put("/api/v1/financial/budgets/", json={"items": items[1:]}).json()) == 1
+
+    params = {"from": last_month.isoformat(), "to": date.today().isoformat()}
+    budgets = client.get("/api/v1/financial/budgets/", params=params).json()
+    assert [Decimal(str(budget["amount"])) for budget in budgets] == [Decimal("1000.00"), Decimal("1100.00")]
+
+    # Uma consulta agrupada (orçamentos + agregados) e os nomes; nenhuma transação lida
+    statements = []
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        report = client.get("/api/v1/financial/reports/budget-vs-actual", params=params).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert len(statements) == 3
+    assert not any("financial_transactions" in statement for statement in statements)
+
+    assert report["months"] == [month_key(last_month), month_key(this_month)]
+    rows = {row["category"]: row for row in report["rows"]}
+    assert rows["Aluguel"]["cost_center"] == "Escritório"
+    assert rows["Aluguel"]["budget"] == [1000.0, 1100.0]
+    assert rows["Aluguel"]["actual"] == [800.0, 1200.0]
+    assert rows["Aluguel"]["variance"] == [-200.0, 100.0]
+    assert rows["Vendas"]["actual"] == [0.0, 5000.0]
+    assert rows["Vendas"]["variance"] == [0.0, 5000.0]
+    assert report["totals"]["budget"] == [1000.0, 1100.0]
+
+    # Estorno do pagamento sai do realizado
+    client.put(f"/api/v1/financial/transactions/{refund}", json={"status": "pending"})
+    report = client.get("/api/v1/financial/reports/budget-vs-actual", params=params).json()
+    assert {row["category"]: row for row in report["rows"]}["Aluguel"]["actual"] == [900.0, 1200.0]
+
+    def cost_center_rollups():
+        return {
+            (row.period, row.cost_center_id, row.category_id, row.type): (Decimal(str(row.total_amount)), row.transaction_count)
+            for row in test_db.query(CostCenterMonthlyRollup).filter(
+                CostCenterMonthlyRollup.company_id == company_user.company_id,
+                CostCenterMonthlyRollup.transaction_count != 0
+            )
+        }
+
+    incremental = cost_center_rollups()
+    rebuild_cost_center_rollups(test_db, company_user.company_id)
+    test_db.commit()
+    test_db.expire_all()
+    assert cost_center_rollups() == incremental
+
+    other = FinancialCategory(company_id=uuid.uuid4(), name="Outra", type=CategoryType.EXPENSE)
+    test_db.add(other)
+    test_db.commit()
+    items[0]["category_id"] = str(other.id)
+    assert client.put("/api/v1/financial/budgets/", json={"items": items[:1]}).status_code == 404
+
+    # Mês sem zero à esquerda é normalizado para a chave YYYY-MM dos agregados
+    january = {"cost_center_id": str(office.id), "category_id": str(rent.id), "month": f"{this_month.year}-1", "amount": "10.00"}
+    assert client.put("/api/v1/financial/budgets/", json={"items": [january]}).json()[0]["month"] == f"{this_month.year}-01"
+    response = client.get("/api/v1/financial/reports/budget-vs-actual", params={
+        "from": date(this_month.year, 1, 1).isoformat(), "to": date(this_month.year, 1, 31).isoformat()
+    })
+    assert response.status_code == 200
+    assert response.json()["totals"]["budget"][0] >= 10.0
+    january["month"] = "2026-13"
+    assert client.put("/api/v1/financial/budgets/", json={"items": [january]}).status_code == 422
+
+    budget_id = budgets[0]["id"]
+    assert client.delete(f"/api/v1/financial/budgets/{budget_id}").status_code == 200
+    assert client.delete(f"/api/v1/financial/budgets/{budget_id}").status_code == 404
@@ -0,0 +1,135 @@
+import os
+import uuid
+import pytest
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from app.config.database import Base
+# Registra todas as tabelas no metadata usado pelo create_all
+from app.models import user, company, plan, customer, supplier, financial, invoice, billing, sales, integrations  # noqa: F401
+from app.models.customer import Customer
+from app.models.financial import FinancialTransaction, TransactionStatus, TransactionType
+from app.models.integrations import TaxSimulation
+from app.models.supplier import Supplier
+from app.schemas.financial import FinancialTransactionFilters, TransactionSort
+from app.utils.pagination import NEXT, encode_cursor, keyset_query
+from app.utils.transactions import filter_transactions, transaction_sort_key
+
+# Postgres é opcional: defina TEST_POSTGRES_URL para validar os planos também nele
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+COMPANY_ID = uuid.uuid4()
+
+FILTER_CASES = [
+    {},
+    {"status": TransactionStatus.PENDING},
+    {"type": TransactionType.EXPENSE},
+    {"status": TransactionStatus.PAID, "paid_from": date(2024, 1, 1), "paid_to": date(2024, 12, 31)},
+    {"due_from": date(2024, 1, 1), "due_to": date(2024, 3, 31)},
+    {"account_id": uuid.uuid4()},
+    {"category_id": uuid.uuid4()},
+    {"cost_center_id": uuid.uuid4()},
+    {"min_amount": Decimal("100"), "max_amount": Decimal("500")},
+    {"sort": TransactionSort.AMOUNT_DESC},
+    {"sort": TransactionSort.CREATED_AT},
+    {"status": TransactionStatus.PENDING, "type": TransactionType.INCOME, "sort": TransactionSort.DUE_DATE_DESC},
+]
+
+def build_queries(db):
+    """Monta as consultas exatamente como a listagem de transações"""
+    for case in FILTER_CASES:
+        filters = FinancialTransactionFilters(**case)
+        query = db.query(FinancialTransaction).filter(FinancialTransaction.company_id == COMPANY_ID)
+        query = filter_transactions(query, filters)
+        columns, descending = transaction_sort_key(filters.sort)
+        page_query, _ = keyset_query(query, columns, None, 100, descending)
+        yield case, page_query
+
+        # Página seguinte, com o filtro do cursor
+        cursor_values = {
+            FinancialTransaction.due_date: date(2024, 6, 1),
+            FinancialTransaction.amount: Decimal("250.00"),
+            FinancialTransaction.created_at: date(2024, 6, 1),
+        }
+        cursor = encode_cursor([cursor_values[columns[0]], uuid.uuid4()], NEXT)
+        page_query, _ = keyset_query(query, columns, cursor, 100, descending)
+        yield dict(case, cursor=True), page_query
+
+# Listagens paginadas por cursor: (modelo, chave de ordenação, decrescente, valor da borda)
+LISTING_CASES = [
+    (Customer, [Customer.name, Customer.id], False, "Maria"),
+    (Supplier, [Supplier.name, Supplier.id], False, "Maria"),
+    (TaxSimulation, [TaxSimulation.created_at, TaxSimulation.id], True, datetime(2024, 6, 1)),
+]
+
+def build_listing_queries(db):
+    """Monta as consultas das listagens de clientes, fornecedores e simulações"""
+    for model, columns, descending, edge in LISTING_CASES:
+        query = db.query(model).filter(model.company_id == str(COMPANY_ID))
+        page_query, _ = keyset_query(query, columns, None, 100, descending)
+        yield model.__tablename__, page_query
+
+        cursor = encode_cursor([edge, str(uuid.uuid4())], NEXT)
+        page_query, _ = keyset_query(query, columns, cursor, 100, descending)
+        yield f"{model.__tablename__} (cursor)", page_query
+
+@contextmanager
+def explain(engine, prefix, plans):
+    """Roda ``prefix`` (EXPLAIN) com a mesma instrução e parâmetros de cada consulta"""
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        cursor.execute(prefix + statement, parameters)
+        plans.append("\n".join(str(row[-1]) for row in cursor.fetchall()))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+def collect_plans(engine, prefix, builder=build_queries):
+    db = sessionmaker(bind=engine)()
+    try:
+        queries = list(builder(db))
+        plans = []
+        with engine.connect() as connection:
+            if engine.dialect.name == "postgresql":
+                connection.execute(text("SET enable_seqscan = off"))
+            with explain(engine, prefix, plans):
+                for case, query in queries:
+                    connection.execute(query.statement).fetchall()
+    finally:
+        db.close()
+    return list(zip([case for case, _ in queries], plans))
+
+def test_transaction_queries_use_indexes_sqlite():
+    """Nenhuma consulta da listagem pode varrer financial_transactions no SQLite"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+
+    for case, query_plan in collect_plans(engine, "EXPLAIN QUERY PLAN "):
+        assert "SCAN financial_transactions" not in query_plan, f"{case}: {query_plan}"
+
+def test_listing_queries_use_indexes_sqlite():
+    """As listagens por cursor leem o índice na ordem da chave, sem varrer nem ordenar a tabela"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+
+    for case, query_plan in collect_plans(engine, "EXPLAIN QUERY PLAN ", build_listing_queries):
+        table = case.split()[0]
+        assert f"SCAN {table}" not in query_plan, f"{case}: {query_plan}"
+        assert "TEMP B-TREE" not in query_plan, f"{case}: {query_plan}"
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL não definido")
+def test_transaction_queries_use_indexes_postgres():
+    """Nenhuma consulta da listagem pode usar Seq Scan no Postgres"""
+    engine = create_engine(POSTGRES_URL)
+    Base.metadata.create_all(bind=engine)
+    try:
+        for case, query_plan in collect_plans(engine, "EXPLAIN "):
+            assert "Seq Scan on financial_transactions" not in query_plan, f"{case}: {query_plan}"
+        for case, query_plan in collect_plans(engine, "EXPLAIN ", build_listing_queries):
+            assert f"Seq Scan on {case.split()[0]}" not in query_plan, f"{case}: {query_plan}"
+    finally:
+        Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,35 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils.scheduler import Scheduler, scheduler
+
+client = TestClient(app)
+
+def test_scheduler_records_job_metrics():
+    """Teste das métricas de execução, execução pulada e falha de jobs"""
+    jobs = Scheduler()
+    results = iter([3, None, 4])
+    jobs.add_job("contador", 60, lambda: next(results))
+    jobs.add_job("falha", 60, lambda: 1 / 0)
+
+    async def run():
+        for _ in range(3):
+            await jobs.run_job("contador")
+        await jobs.run_job("falha")
+
+    asyncio.run(run())
+    metrics = jobs.metrics()
+
+    assert metrics["contador"]["runs"] == 2
+    assert metrics["contador"]["skipped"] == 1
+    assert metrics["contador"]["last_rows_changed"] == 4
+    assert metrics["contador"]["rows_changed_total"] == 7
+    assert metrics["contador"]["last_run_at"] is not None
+    assert metrics["falha"]["errors"] == 1
+    assert "division by zero" in metrics["falha"]["last_error"]
+
+def test_jobs_health_endpoint():
+    """Teste do endpoint de métricas dos jobs"""
+    response = client.get("/health/jobs")
+    assert response.status_code == 200
+    assert response.json() == scheduler.metrics()
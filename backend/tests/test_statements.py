@@ -0,0 +1,282 @@
+import io
+import os
+import random
+import time
+import uuid
+import pytest
+from datetime import date, timedelta
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.config.database import get_db, Base
+from app.config.settings import settings
+from app.models.user import User
+from app.models.integrations import BankReconciliation, ReconciliationMatch
+from app.models.financial import (
+    FinancialAccount, FinancialTransaction, AccountType, TransactionType, TransactionStatus
+)
+from app.utils import statements
+from app.utils.reconciliation import CandidateTransaction, StatementEntry, match_statement_lines
+from app.utils.security import get_current_active_user
+
+# Microbenchmarks dependem da máquina: defina RUN_BENCHMARKS=1 para rodá-los
+RUN_BENCHMARKS = bool(os.environ.get("RUN_BENCHMARKS"))
+
+# Configurar banco de dados de teste
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_statements.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+client = TestClient(app)
+
+OFX_SGML = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+CHARSET:1252
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>BRL<BANKTRANLIST>
+<DTSTART>20240101<DTEND>20240131
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240105120000[-3:BRT]<TRNAMT>1500.00<FITID>A1<MEMO>PIX RECEBIDO CAFÉ</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240110<TRNAMT>-89,90<FITID>A2<NAME>Tarifa</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240131<TRNAMT>-250.00<CHECKNUM>778</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+""".encode("cp1252")
+
+@pytest.fixture(scope="module")
+def setup_database():
+    Base.metadata.create_all(bind=engine)
+    app.dependency_overrides[get_db] = override_get_db
+    yield
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_current_active_user, None)
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def company_user(setup_database):
+    user = User(
+        id=str(uuid.uuid4()),
+        email="extratos@teste.com",
+        first_name="Usuario",
+        last_name="Extratos",
+        is_active=True,
+        company_id=uuid.uuid4()
+    )
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    return user
+
+@pytest.fixture
+def account(company_user):
+    db = TestingSessionLocal()
+    account = FinancialAccount(company_id=company_user.company_id, name="Conta Extrato", type=AccountType.BANK)
+    db.add(account)
+    db.commit()
+    db.refresh(account)
+    db.close()
+    return account
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path / statements.STATEMENTS_SUBDIR
+
+def upload(account, filename, content):
+    return client.post(
+        "/api/v1/financial/statements/",
+        data={"account_id": str(account.id)},
+        files={"file": (filename, io.BytesIO(content))}
+    )
+
+def lines_of(import_id, **params):
+    response = client.get(f"/api/v1/financial/statements/{import_id}/lines", params=params)
+    assert response.status_code == 200
+    return response
+
+def test_upload_ofx_statement(account, upload_dir, monkeypatch):
+    """Teste da importação de OFX (SGML) lido em blocos pequenos"""
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 64)
+    monkeypatch.setattr(statements, "_OFX_READ_SIZE", 7)
+    monkeypatch.setattr(settings, "STATEMENT_IMPORT_BATCH_SIZE", 2)
+
+    response = upload(account, "janeiro.OFX", OFX_SGML)
+    assert response.status_code == 202
+    assert response.json()["status"] == "pending"
+    assert len(os.listdir(upload_dir)) == 1
+
+    # A tarefa em segundo plano roda ao fim da requisição no TestClient
+    import_id = response.json()["id"]
+    data = client.get(f"/api/v1/financial/statements/{import_id}").json()
+    assert data["status"] == "imported"
+    assert data["line_count"] == 3
+
+    first_page = lines_of(import_id, limit=2)
+    lines = first_page.json() + lines_of(import_id, cursor=first_page.headers["X-Next-Cursor"]).json()
+    assert [(line["posted_date"], Decimal(str(line["amount"])), line["description"], line["fit_id"]) for line in lines] == [
+        (date(2024, 1, 5).isoformat(), Decimal("1500.00"), "PIX RECEBIDO CAFÉ", "A1"),
+        (date(2024, 1, 10).isoformat(), Decimal("-89.90"), "Tarifa", "A2"),
+        (date(2024, 1, 31).isoformat(), Decimal("-250.00"), None, "778"),
+    ]
+
+def test_upload_xlsx_statement(account, upload_dir):
+    """Teste da importação de XLSX com linhas antes do cabeçalho e de saldo"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Extrato conta corrente"])
+    sheet.append(["Data", "Histórico", "Nº Documento", "Valor"])
+    sheet.append([date(2024, 2, 1), "Depósito", 123, 1000])
+    sheet.append(["02/02/2024", "Boleto", "", "-1.234,56"])
+    sheet.append([None, "Saldo do dia", None, None])
+    content = io.BytesIO()
+    workbook.save(content)
+
+    response = upload(account, "fevereiro.xlsx", content.getvalue())
+    assert response.status_code == 202
+    data = client.get(f"/api/v1/financial/statements/{response.json()['id']}").json()
+    assert data["status"] == "imported"
+    assert data["line_count"] == 2
+
+    lines = lines_of(response.json()["id"]).json()
+    assert [(line["description"], Decimal(str(line["amount"])), line["fit_id"]) for line in lines] == [
+        ("Depósito", Decimal("1000"), "123"),
+        ("Boleto", Decimal("-1234.56"), None),
+    ]
+
+def test_upload_statement_rejections(account, upload_dir, monkeypatch):
+    """Teste de tipo não suportado, arquivo grande demais e extrato inválido"""
+    assert upload(account, "extrato.csv", b"a;b").status_code == 400
+
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 100)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 16)
+    assert upload(account, "grande.ofx", OFX_SGML).status_code == 413
+    assert os.listdir(upload_dir) == []
+
+    response = upload(account, "quebrado.ofx", b"<OFX><STMTTRN><TRNAMT>10</STMTTRN></OFX>")
+    data = client.get(f"/api/v1/financial/statements/{response.json()['id']}").json()
+    assert data["status"] == "failed"
+    assert "DTPOSTED" in data["error_message"]
+
+    # Erro inesperado (ex.: falha no INSERT) também encerra a importação como falha
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 10 * 1024 * 1024)
+    def broken_insert(*args, **kwargs):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+    monkeypatch.setattr(statements, "import_statement", broken_insert)
+    response = upload(account, "janeiro.ofx", OFX_SGML)
+    data = client.get(f"/api/v1/financial/statements/{response.json()['id']}").json()
+    assert data["status"] == "failed"
+    assert "database is locked" in data["error_message"]
+
+def test_reconcile_statement(company_user, account, upload_dir):
+    """Teste da conciliação: valor exato, desempate por pontuação e tolerância de valor"""
+    db = TestingSessionLocal()
+
+    def transaction(amount, due_date, type, description, status=TransactionStatus.PENDING):
+        item = FinancialTransaction(
+            company_id=company_user.company_id, account_id=account.id, description=description,
+            amount=Decimal(amount), due_date=due_date, type=type, status=status
+        )
+        db.add(item)
+        return item
+
+    income = transaction("1500.00", date(2024, 1, 4), TransactionType.INCOME, "Pix recebido cliente")
+    other_fee = transaction("89.90", date(2024, 1, 9), TransactionType.EXPENSE, "Mensalidade software")
+    fee = transaction("89.90", date(2024, 1, 11), TransactionType.EXPENSE, "Tarifa bancária")
+    transaction("250.00", date(2024, 1, 31), TransactionType.EXPENSE, "Já pago", status=TransactionStatus.PAID)
+    rounded = transaction("250.30", date(2024, 1, 30), TransactionType.EXPENSE, "Boleto fornecedor")
+    db.commit()
+    expected = [str(income.id), str(fee.id), str(rounded.id)]
+    other_fee_id = str(other_fee.id)
+    db.close()
+
+    import_id = upload(account, "janeiro.ofx", OFX_SGML).json()["id"]
+    response = client.post(f"/api/v1/financial/statements/{import_id}/reconcile")
+    assert response.status_code == 202
+
+    summary = client.get(f"/api/v1/financial/statements/{import_id}/summary").json()
+    assert summary["status"] == "completed"
+    assert summary["counts"] == {"matched": 3, "unmatched": 0}
+    assert summary["exact"] == 2
+
+    matched = client.get(f"/api/v1/financial/statements/{import_id}/matches", params={"status": "matched"}).json()
+    assert [match["transaction_id"] for match in matched] == expected
+    assert [match["exact"] for match in matched] == [True, True, False]
+    # Duas despesas de 89,90 a um dia do lançamento: vence a que compartilha palavras com o extrato
+    assert matched[1]["candidates"] == 2
+
+    state = client.get(f"/api/v1/financial/transactions/{expected[1]}/reconciliation").json()
+    assert state["status"] == "matched"
+    assert state["line_id"] == matched[1]["line_id"]
+    assert client.get(f"/api/v1/financial/transactions/{other_fee_id}/reconciliation").json()["status"] == "unmatched"
+
+    # Conciliar de novo substitui os resultados, sem duplicá-los
+    assert client.post(f"/api/v1/financial/statements/{import_id}/reconcile").status_code == 202
+    db = TestingSessionLocal()
+    assert db.query(ReconciliationMatch).filter(ReconciliationMatch.reconciliation_id == import_id).count() == 3
+    assert db.get(BankReconciliation, import_id).reconciled_transactions is None
+    db.close()
+
+    assert client.post(f"/api/v1/financial/statements/{uuid.uuid4()}/reconcile").status_code == 404
+
+def test_matching_engine_passes_and_tie_breaks():
+    """Teste do motor de conciliação: passada exata, tolerância, desempate e uso único"""
+    day = date(2024, 3, 10)
+    rent = CandidateTransaction(uuid.uuid4(), day, -150000, "Aluguel março")
+    fee_far = CandidateTransaction(uuid.uuid4(), day + timedelta(days=3), -990, "Tarifa")
+    fee_near = CandidateTransaction(uuid.uuid4(), day + timedelta(days=1), -990, "Tarifa pacote")
+    sale = CandidateTransaction(uuid.uuid4(), day, 25000, "Venda balcão")
+    lines = [
+        StatementEntry("1", 1, day, -990, "TARIFA PACOTE"),
+        StatementEntry("2", 2, day, -990, "TARIFA"),
+        StatementEntry("3", 3, day, -150000, "ALUGUEL"),
+        StatementEntry("4", 4, day, 25030, "VENDA"),
+        StatementEntry("5", 5, day, 99999, "SEM PAR"),
+    ]
+
+    matches, unmatched = match_statement_lines(lines, [rent, fee_far, fee_near, sale], 3, 50)
+
+    assert [(match.line.id, match.transaction.id, match.exact) for match in matches] == [
+        ("1", fee_near.id, True),
+        ("2", fee_far.id, True),
+        ("3", rent.id, True),
+        ("4", sale.id, False),
+    ]
+    assert matches[0].candidates == 2
+    assert [line.id for line in unmatched] == ["5"]
+
+    # Sem tolerância de valor, a diferença de 30 centavos não concilia
+    matches, unmatched = match_statement_lines(lines, [sale], 3, 0)
+    assert matches == [] and len(unmatched) == 5
+
+@pytest.mark.skipif(not RUN_BENCHMARKS, reason="RUN_BENCHMARKS não definido")
+def test_matching_engine_scales():
+    """Benchmark: 50 mil linhas contra 200 mil transações em poucos segundos"""
+    rng = random.Random(42)
+    start = date(2024, 1, 1)
+    transactions = [
+        CandidateTransaction(uuid.uuid4(), start + timedelta(days=rng.randrange(365)),
+                             rng.choice((1, -1)) * rng.randrange(100, 500000), f"fornecedor {number}")
+        for number in range(200000)
+    ]
+    lines = [
+        StatementEntry(str(number), number + 1, item.due_date + timedelta(days=rng.randrange(-2, 3)),
+                       item.cents + rng.choice((0, 0, 0, 7)), item.description)
+        for number, item in enumerate(rng.sample(transactions, 50000))
+    ]
+
+    started = time.perf_counter()
+    matches, unmatched = match_statement_lines(lines, transactions, 3, 50)
+    elapsed = time.perf_counter() - started
+
+    assert len(matches) + len(unmatched) == len(lines)
+    assert len(matches) > 49900
+    assert len({match.transaction.id for match in matches}) == len(matches)
+    assert elapsed < 10
@@ -0,0 +1,71 @@
+import os
+import timeit
+import pytest
+from decimal import Decimal
+from app.utils.tax_tables import TAX_TABLES, simples_annex, tax_table
+from app.utils.taxes import (
+    calculate_simples_nacional, calculate_lucro_presumido, simulate_tax_grid
+)
+
+# Microbenchmarks dependem da máquina: defina RUN_BENCHMARKS=1 para rodá-los
+RUN_BENCHMARKS = bool(os.environ.get("RUN_BENCHMARKS"))
+
+def test_simples_effective_rate_uses_deduction():
+    """Teste da alíquota efetiva (RBT12 x Aliq - PD) / RBT12"""
+    assert simples_annex("III", 2024).effective_rate(Decimal("360000")) == Decimal("0.086")
+    assert simples_annex("I", 2024).effective_rate(Decimal("1000000")) == Decimal("0.0845")
+    assert simples_annex("V", 2024).effective_rate(Decimal("100000")) == Decimal("0.155")
+
+    # Limites das faixas são inclusivos
+    annex = simples_annex("III", 2024)
+    assert annex.bracket(Decimal("180000")) == 0
+    assert annex.bracket(Decimal("180000.01")) == 1
+
+    with pytest.raises(ValueError):
+        annex.effective_rate(Decimal("4800000.01"))
+    with pytest.raises(ValueError):
+        simples_annex("VI", 2024)
+
+def test_tax_table_versions():
+    """Teste da seleção da tabela vigente por ano"""
+    assert tax_table(2024).valid_from == TAX_TABLES[-1].valid_from
+    assert tax_table(TAX_TABLES[0].valid_from) is TAX_TABLES[0]
+    with pytest.raises(ValueError):
+        tax_table(TAX_TABLES[0].valid_from - 1)
+
+def test_lucro_presumido_parameters():
+    """Teste do Lucro Presumido com adicional de IRPJ sobre o excedente"""
+    result = calculate_lucro_presumido(Decimal("1000000"), "services", 2024)
+    assert result["breakdown"] == {"irpj": 56000.0, "csll": 28800.0, "pis": 6500.0, "cofins": 30000.0}
+
+    result = calculate_lucro_presumido(Decimal("1000000"), "commerce", 2024)
+    assert result["breakdown"]["irpj"] == 12000.0
+    assert result["breakdown"]["csll"] == 10800.0
+
+def test_grid_matches_single_simulation():
+    """Teste de paridade entre a simulação vetorizada e a unitária"""
+    revenues = [Decimal(value) for value in range(10000, 5000001, 10000)]
+    payload = simulate_tax_grid(revenues, "III", "services", 2024)
+
+    for index, revenue in enumerate(revenues):
+        expected = calculate_lucro_presumido(revenue, "services", 2024)["total_tax"]
+        assert payload["lucro_presumido"]["total_tax"][index] == pytest.approx(expected, abs=0.01)
+        if revenue > Decimal("4800000"):
+            assert payload["simples_nacional"]["total_tax"][index] is None
+            assert payload["best_regime"][index] == "lucro_presumido"
+        else:
+            expected = calculate_simples_nacional(revenue, "III", 2024)["total_tax"]
+            assert payload["simples_nacional"]["total_tax"][index] == pytest.approx(expected, abs=0.01)
+
+@pytest.mark.skipif(not RUN_BENCHMARKS, reason="RUN_BENCHMARKS não definido")
+def test_single_simulation_cost_is_microseconds():
+    """Microbenchmark: a consulta às tabelas compiladas não pode custar mais que alguns microssegundos"""
+    annex = simples_annex("III", 2024)
+    revenue = Decimal("1234567.89")
+    calls = 20000
+
+    lookup = min(timeit.repeat(lambda: annex.effective_rate(revenue), number=calls, repeat=3)) / calls
+    simulation = min(timeit.repeat(lambda: calculate_simples_nacional(revenue, "III", 2024), number=calls, repeat=3)) / calls
+
+    assert lookup < 20e-6
+    assert simulation < 50e-6